@@ -0,0 +1,54 @@
+"""
+Run the benchmark suites and write the results as one JSON document.
+
+    python -m benchmarks --output before.json
+    ... change something ...
+    python -m benchmarks --output after.json
+    python -m benchmarks.compare before.json after.json
+"""
+import argparse
+import json
+import sys
+from typing import Any, Dict, List
+
+from benchmarks import bench_converter, bench_encoders, bench_routes, bench_startup
+from benchmarks.harness import environment
+
+SUITES = ("converter", "encoders", "routes", "startup")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--suite", action="append", choices=SUITES, help="suite to run, repeatable; default all")
+    parser.add_argument("--repeat", type=int, default=5, help="timed repetitions of the micro-benchmarks")
+    parser.add_argument("--output", "-o", help="JSON file to write; default stdout")
+    bench_routes.add_arguments(parser)
+    args = parser.parse_args()
+
+    results: List[Dict[str, Any]] = []
+    for suite in args.suite or SUITES:
+        print(f"running {suite}...", file=sys.stderr)
+        if suite == "converter":
+            results += bench_converter.run(repeat=args.repeat)
+        elif suite == "encoders":
+            results += bench_encoders.run(repeat=args.repeat)
+        elif suite == "routes":
+            results += bench_routes.run(
+                database=args.database,
+                requests=args.requests,
+                concurrency=args.concurrency,
+                db_latency=args.db_latency,
+            )
+        elif suite == "startup":
+            results += bench_startup.run(runs=args.repeat)
+
+    document = json.dumps({"environment": environment(), "results": results}, indent=2)
+    if args.output:
+        with open(args.output, "w") as fp:
+            fp.write(document + "\n")
+    else:
+        print(document)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Throughput of the public XMLParser entry points on the synthetic corpora.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_converter
+"""
+import json
+from typing import Any, Dict, List
+
+from benchmarks.corpora import CORPORA, count_nodes, to_xml_string
+from benchmarks.harness import measure, result
+from src.core.xml_parser import XMLParser
+
+SUITE = "converter"
+
+
+def run(repeat: int = 5) -> List[Dict[str, Any]]:
+    results = []
+    for corpus, factory in CORPORA.items():
+        data = factory()
+        xml_string = to_xml_string(data)
+        element = XMLParser.parse_json_to_element(data)
+        nodes = count_nodes(element)
+        json_bytes = json.dumps(data).encode()
+        input_bytes = {
+            "parse_xml_from_string": len(xml_string.encode()),
+            "parse_json_to_element": len(json_bytes),
+            "json_bytes_to_xml": len(json_bytes),
+            "to_pretty_xml": len(xml_string.encode()),
+        }
+
+        for benchmark, func in (
+            ("parse_xml_from_string", lambda: XMLParser.parse_xml_from_string(xml_string)),
+            ("parse_json_to_element", lambda: XMLParser.parse_json_to_element(data)),
+            ("json_bytes_to_xml", lambda: XMLParser.json_bytes_to_xml(json_bytes)),
+            ("to_pretty_xml", lambda: XMLParser.to_pretty_xml(element)),
+        ):
+            stats = measure(func, repeat)
+            results.append(result(
+                SUITE, benchmark, stats["median"], "s",
+                params={"corpus": corpus},
+                nodes=nodes,
+                input_bytes=input_bytes[benchmark],
+                nodes_per_second=nodes / stats["median"],
+                megabytes_per_second=input_bytes[benchmark] / stats["median"] / 1e6,
+                **stats,
+            ))
+    return results
+
+
+def main() -> None:
+    for row in run():
+        details = row["details"]
+        print(
+            f"{row['benchmark']:<24} {row['params']['corpus']:<11} "
+            f"{row['value'] * 1000:9.2f} ms  {details['nodes_per_second']:>12,.0f} nodes/s  "
+            f"{details['megabytes_per_second']:8.1f} MB/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Cost of turning handler results into response bodies: the orjson encoder,
+`success_response` as the routers use it, and the `jsonable_encoder` +
+`JSONResponse` path it replaced as a baseline.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_encoders
+"""
+import datetime
+import uuid
+from decimal import Decimal
+from typing import Any, Callable, Dict, List
+
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import JSONResponse
+
+from benchmarks.corpora import CORPORA, wide_document
+from benchmarks.harness import measure, result
+from src.core.encoders import json_dumps
+from src.core.responses import success_response
+
+SUITE = "encoders"
+
+
+def product_rows(count: int = 1_000) -> List[Dict[str, Any]]:
+    """Rows shaped like psycopg2 returns them: UUIDs, Decimals and aware datetimes"""
+    created = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    return [
+        {
+            "id": uuid.UUID(int=i),
+            "name": f"product-{i}",
+            "description": None if i % 3 else f"description of product {i}",
+            "price": Decimal(i) / 4 + Decimal("0.99"),
+            "in_stock": i % 17,
+            "created_at": created + datetime.timedelta(seconds=i),
+        }
+        for i in range(count)
+    ]
+
+
+PAYLOADS: Dict[str, Callable[[], Any]] = {
+    "rows": product_rows,
+    "wide": lambda: wide_document(5_000),
+    "deep": CORPORA["deep"],
+}
+
+
+def run(repeat: int = 5) -> List[Dict[str, Any]]:
+    results = []
+    for payload_name, factory in PAYLOADS.items():
+        data = factory()
+        size = len(json_dumps(data))
+        for benchmark, func in (
+            ("json_dumps", lambda: json_dumps(data)),
+            ("success_response", lambda: success_response(data).body),
+            ("jsonable_encoder_baseline", lambda: JSONResponse({"success": True, "data": jsonable_encoder(data)}).body),
+        ):
+            stats = measure(func, repeat)
+            results.append(result(
+                SUITE, benchmark, stats["median"], "s",
+                params={"payload": payload_name},
+                output_bytes=size,
+                megabytes_per_second=size / stats["median"] / 1e6,
+                **stats,
+            ))
+    return results
+
+
+def main() -> None:
+    for row in run():
+        details = row["details"]
+        print(
+            f"{row['benchmark']:<26} {row['params']['payload']:<6} "
+            f"{row['value'] * 1000:9.3f} ms  {details['megabytes_per_second']:8.1f} MB/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
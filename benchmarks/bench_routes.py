@@ -0,0 +1,250 @@
+"""
+End-to-end load scenarios against the FastAPI application, driven in-process
+through ASGI by concurrent clients.
+
+With `--database fake` (the default) the routes are served from
+FakeDatabaseConnection rows; `--database postgres` imports `src.main` and runs
+its startup against the database configured in `appsettings.yaml`, which has
+to be present in the working directory and hold some products and users.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_routes --database fake --concurrency 16
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from typing import Any, AsyncIterator, Awaitable, Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlsplit
+
+from fastapi import FastAPI
+
+from benchmarks.corpora import to_xml_string, wide_document
+from benchmarks.fakes import FakeDatabaseConnection, fake_tables
+from benchmarks.harness import percentile, result
+from src.config.settings import CacheSettings, ConversionCacheSettings, ExecutorSettings
+from src.core.cache import EntityCache
+from src.core.conversion_cache import ConversionCache
+from src.core.dependencies import get_db_connection
+from src.core.executor import ConversionExecutor
+from src.core.metrics import MetricsMiddleware
+from src.core.responses import FastJSONResponse
+from src.routers import include_routers
+
+SUITE = "routes"
+
+API = "/api/v1"
+
+
+class Response(NamedTuple):
+    status: int
+    body: bytes
+
+
+async def asgi_request(
+    app: Any,
+    method: str,
+    url: str,
+    body: bytes = b"",
+    headers: Optional[Dict[str, str]] = None,
+) -> Response:
+    """Send one HTTP request straight to an ASGI application"""
+    parts = urlsplit(url)
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": parts.path,
+        "raw_path": parts.path.encode(),
+        "query_string": parts.query.encode(),
+        "root_path": "",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()],
+        "client": ("127.0.0.1", 50000),
+        "server": ("bench", 80),
+    }
+    request_sent = False
+    status = 0
+    chunks: List[bytes] = []
+
+    async def receive() -> Dict[str, Any]:
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        # the client never disconnects; streaming responses cancel this wait
+        await asyncio.Future()
+        return {"type": "http.disconnect"}
+
+    async def send(message: Dict[str, Any]) -> None:
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return Response(status, b"".join(chunks))
+
+
+def multipart(field: str, filename: str, content: bytes, content_type: str) -> Tuple[bytes, Dict[str, str]]:
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode() + content + f"\r\n--{boundary}--\r\n".encode()
+    return body, {"content-type": f"multipart/form-data; boundary={boundary}"}
+
+
+class Scenario(NamedTuple):
+    name: str
+    method: str
+    url: str
+    body: bytes = b""
+    headers: Optional[Dict[str, str]] = None
+
+    def __call__(self, app: Any) -> Awaitable[Response]:
+        return asgi_request(app, self.method, self.url, self.body, self.headers)
+
+
+def build_fake_app(db_latency: float = 0.0) -> FastAPI:
+    """The application's routers over FakeDatabaseConnection, without Postgres or appsettings.yaml"""
+    app = FastAPI(default_response_class=FastJSONResponse)
+    app.add_middleware(MetricsMiddleware)
+    include_routers(app)
+    app.state.cache = EntityCache.from_settings(CacheSettings())
+    app.state.executor = ConversionExecutor.from_settings(ExecutorSettings())
+    app.state.conversion_cache = ConversionCache.from_settings(ConversionCacheSettings())
+
+    db = FakeDatabaseConnection(fake_tables(), latency=db_latency)
+
+    async def fake_db_connection() -> AsyncIterator[FakeDatabaseConnection]:
+        yield db
+
+    app.dependency_overrides[get_db_connection] = fake_db_connection
+    return app
+
+
+async def scenarios(app: Any) -> List[Scenario]:
+    result: List[Scenario] = [
+        Scenario("health", "GET", f"{API}/health"),
+        Scenario("list_products", "GET", f"{API}/products/products?limit=50"),
+        Scenario("list_users", "GET", f"{API}/users/users?limit=50"),
+    ]
+
+    # look up real keys, so the postgres mode hits existing rows
+    products = json.loads((await asgi_request(app, "GET", f"{API}/products/products?limit=1")).body).get("data")
+    if products:
+        result.append(Scenario("get_product", "GET", f"{API}/products/products/{products[0]['id']}"))
+    users = json.loads((await asgi_request(app, "GET", f"{API}/users/users?limit=1")).body).get("data")
+    if users:
+        result.append(Scenario("get_user", "GET", f"{API}/users/users/{users[0]['email']}"))
+
+    document = wide_document(2_000)
+    body, headers = multipart("file", "document.xml", to_xml_string(document).encode(), "text/xml")
+    result.append(Scenario("xml2json", "POST", f"{API}/convert/xml2json", body, headers))
+    body, headers = multipart("file", "document.json", json.dumps(document).encode(), "application/json")
+    result.append(Scenario("json2xml", "POST", f"{API}/convert/json2xml", body, headers))
+    return result
+
+
+async def load(app: Any, scenario: Scenario, requests: int, concurrency: int) -> Dict[str, Any]:
+    """Send `requests` requests from `concurrency` concurrent clients and record latencies"""
+    latencies: List[float] = []
+    errors = 0
+    remaining = requests
+
+    async def client() -> None:
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            response = await scenario(app)
+            latencies.append(time.perf_counter() - start)
+            if response.status >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "elapsed": elapsed,
+        "throughput": requests / elapsed,
+        "p50": percentile(latencies, 0.50),
+        "p90": percentile(latencies, 0.90),
+        "p99": percentile(latencies, 0.99),
+        "max": latencies[-1],
+    }
+
+
+async def run_async(
+    database: str = "fake",
+    requests: int = 500,
+    concurrency: int = 8,
+    warmup: int = 20,
+    db_latency: float = 0.0,
+) -> List[Dict[str, Any]]:
+    if database == "postgres":
+        from src.main import app
+        await app.router.startup()
+    else:
+        app = build_fake_app(db_latency)
+
+    results = []
+    try:
+        for scenario in await scenarios(app):
+            for _ in range(warmup):
+                await scenario(app)
+            stats = await load(app, scenario, requests, concurrency)
+            results.append(result(
+                SUITE, scenario.name, stats["throughput"], "req/s",
+                params={"database": database, "concurrency": concurrency},
+                higher_is_better=True,
+                **stats,
+            ))
+    finally:
+        if database == "postgres":
+            await app.router.shutdown()
+        else:
+            app.state.executor.shutdown()
+    return results
+
+
+def run(**options: Any) -> List[Dict[str, Any]]:
+    return asyncio.run(run_async(**options))
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--database", choices=("fake", "postgres"), default="fake")
+    parser.add_argument("--requests", type=int, default=500, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent in-process clients")
+    parser.add_argument("--db-latency", type=float, default=0.0, help="seconds added per fake DB statement")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_arguments(parser)
+    args = parser.parse_args()
+    for row in run(
+        database=args.database,
+        requests=args.requests,
+        concurrency=args.concurrency,
+        db_latency=args.db_latency,
+    ):
+        details = row["details"]
+        print(
+            f"{row['benchmark']:<14} {row['value']:9.1f} req/s  "
+            f"p50 {details['p50'] * 1000:7.2f} ms  p99 {details['p99'] * 1000:7.2f} ms  "
+            f"errors {details['errors']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
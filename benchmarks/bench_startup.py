@@ -0,0 +1,186 @@
+"""
+Cold start of a worker: how long importing the application takes and what
+the time goes to, how long its startup event runs, and how soon after the
+process is spawned it answers its first health check.
+
+Each run starts a fresh interpreter in a scratch directory holding a minimal
+appsettings.yaml. The database server defaults to an address nothing listens
+on, so the numbers do not depend on one; with the pool warmed up in the
+background, start-up does not wait for it anyway. The import-time breakdown
+comes from `python -X importtime`, grouped by top-level package and, for the
+application itself, by module under `src`.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_startup
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Tuple
+
+from benchmarks.harness import percentile, result
+
+SUITE = "startup"
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_POSTGRES_SERVER = "127.0.0.1:9"
+
+SETTINGS_TEMPLATE = """\
+uvicorn: {{host: 127.0.0.1, port: 8000, log_level: warning, reload: false}}
+db_connection: {{postgres_user: bench, postgres_password: bench, postgres_database: bench, postgres_server: "{server}"}}
+api_config: {{title: bench, version: "0", docs_url: /docs}}
+"""
+
+# runs in the child; reports milestones on stdout as they are reached
+CHILD = """\
+import json, time
+start = time.perf_counter()
+import src.main
+imported = time.perf_counter()
+from starlette.testclient import TestClient
+client = TestClient(src.main.app)
+starting = time.perf_counter()
+with client:
+    started = time.perf_counter()
+    response = client.get("/api/v1/health")
+    answered = time.perf_counter()
+    print("health", response.status_code, flush=True)
+print(json.dumps({
+    "import": imported - start,
+    "startup_event": started - starting,
+    "first_health": answered - started,
+}), flush=True)
+"""
+# the breakdown covers the application's imports only, not the test client's
+IMPORT_ONLY = "import src.main"
+
+
+def _environment() -> Dict[str, str]:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, (REPOSITORY, env.get("PYTHONPATH"))))
+    return env
+
+
+def _spawn(directory: str) -> Tuple[float, Dict[str, Any]]:
+    """Start a worker once; return seconds from spawn to its first health response, and its own timings."""
+    spawned = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-c", CHILD],
+        cwd=directory,
+        env=_environment(),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    assert process.stdout is not None
+    health = process.stdout.readline()
+    to_health = time.perf_counter() - spawned
+    remaining, stderr = process.communicate(timeout=60)
+    if process.returncode != 0 or not health.startswith("health 200"):
+        raise RuntimeError(f"start-up run failed ({process.returncode}): {health}{stderr[-2000:]}")
+    return to_health, json.loads(remaining)
+
+
+def _importtime(directory: str) -> str:
+    """Import the application once under `-X importtime` and return the report."""
+    return subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", IMPORT_ONLY],
+        cwd=directory,
+        env=_environment(),
+        capture_output=True,
+        text=True,
+        check=True,
+        timeout=60,
+    ).stderr
+
+
+def parse_importtime(report: str) -> List[Tuple[str, float, float]]:
+    """(module, self seconds, cumulative seconds) per line of an `-X importtime` report"""
+    modules = []
+    for line in report.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        modules.append((name.strip(), int(self_us) / 1e6, int(cumulative_us) / 1e6))
+    return modules
+
+
+def import_breakdown(modules: List[Tuple[str, float, float]], top: int = 15) -> Dict[str, Any]:
+    """
+    Self time summed per top-level package, and per module under `src`, each
+    sorted by time and cut to the `top` largest.
+    """
+    packages: Dict[str, float] = defaultdict(float)
+    application: Dict[str, float] = defaultdict(float)
+    for name, self_seconds, _ in modules:
+        packages[name.split(".")[0]] += self_seconds
+        if name.split(".")[0] == "src":
+            application[name] += self_seconds
+
+    def largest(times: Dict[str, float]) -> Dict[str, float]:
+        return {name: round(seconds, 6) for name, seconds in sorted(times.items(), key=lambda item: -item[1])[:top]}
+
+    return {
+        "total": round(sum(packages.values()), 6),
+        "modules": len(modules),
+        "packages": largest(packages),
+        "application": largest(application),
+    }
+
+
+def run(runs: int = 5, postgres_server: str = DEFAULT_POSTGRES_SERVER) -> List[Dict[str, Any]]:
+    with tempfile.TemporaryDirectory(prefix="bench-startup-") as directory:
+        with open(os.path.join(directory, "appsettings.yaml"), "w") as fp:
+            fp.write(SETTINGS_TEMPLATE.format(server=postgres_server))
+
+        breakdown = import_breakdown(parse_importtime(_importtime(directory)))
+
+        to_health: List[float] = []
+        timings: Dict[str, List[float]] = defaultdict(list)
+        for _ in range(runs):
+            seconds, child = _spawn(directory)
+            to_health.append(seconds)
+            for name, value in child.items():
+                timings[name].append(value)
+
+    params = {"runs": runs}
+    results = [
+        result(
+            SUITE, "spawn_to_first_health", statistics.median(to_health), "s", params,
+            min=min(to_health), p90=percentile(sorted(to_health), 0.9),
+        ),
+        result(SUITE, "import_app", statistics.median(timings["import"]), "s", params, importtime=breakdown),
+    ]
+    for name in ("startup_event", "first_health"):
+        results.append(result(SUITE, name, statistics.median(timings[name]), "s", params, min=min(timings[name])))
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="cold starts to time")
+    parser.add_argument(
+        "--postgres-server", default=DEFAULT_POSTGRES_SERVER, help="host[:port] of the database the workers use"
+    )
+    args = parser.parse_args()
+
+    for row in run(runs=args.runs, postgres_server=args.postgres_server):
+        print(f"{row['benchmark']:<24} {row['value'] * 1000:9.1f} ms")
+        importtime = row["details"].get("importtime")
+        if importtime:
+            print(f"  {importtime['modules']} modules, {importtime['total'] * 1000:.1f} ms self time in total")
+            for group in ("packages", "application"):
+                print(f"  by {group}:")
+                for name, seconds in importtime[group].items():
+                    print(f"    {name:<40} {seconds * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
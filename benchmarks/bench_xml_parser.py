@@ -0,0 +1,126 @@
+"""
+Compare the iterative XMLParser converter core against the previous recursive implementation.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_xml_parser
+"""
+import json
+import time
+from typing import Any, Callable, Dict, List
+
+from lxml import etree
+from lxml.etree import _Element
+
+from benchmarks.corpora import count_nodes, deep_document, wide_document
+from src.config.annotations import JSONType
+from src.core.xml_parser import XMLElementType, XMLParseError, XMLParser
+
+
+class RecursiveXMLParser:
+    """The recursive converter core XMLParser used before the explicit-stack rewrite."""
+
+    @staticmethod
+    def _parse_etree_node_leaf(element: _Element) -> Any:
+        etype = XMLElementType(element.get("type"))
+        return etype.parse_element_value(element.get("value"))
+
+    @staticmethod
+    def parse_etree_to_json_type(node: _Element) -> JSONType:
+        children = list(node)
+        key = node.get("key")
+
+        if not children:
+            val = RecursiveXMLParser._parse_etree_node_leaf(node)
+            return {key: val} if key else val
+
+        if all(child.get("key") is None for child in children):
+            return [RecursiveXMLParser.parse_etree_to_json_type(c) for c in children]
+
+        obj: Dict[str, JSONType] = {}
+        for c in children:
+            ckey = c.get("key")
+            if not ckey:
+                raise XMLParseError("Expected 'key' on object child")
+            obj[ckey] = (
+                RecursiveXMLParser.parse_etree_to_json_type(c)
+                if c.get("type") in ("object", "list")
+                else RecursiveXMLParser._parse_etree_node_leaf(c)
+            )
+        return obj
+
+    @staticmethod
+    def parse_json_data_to_etree(data: JSONType) -> _Element:
+        etype = XMLElementType.from_value(data)
+        element = etree.Element("ITEM", type=etype.value)
+
+        if etype is XMLElementType.OBJECT:
+            for k, v in data.items():  # type: ignore
+                child = RecursiveXMLParser.parse_json_data_to_etree(v)
+                child.set("key", k)
+                element.append(child)
+        elif etype is XMLElementType.LIST:
+            for v in data:  # type: ignore
+                element.append(RecursiveXMLParser.parse_json_data_to_etree(v))
+        elif etype is not XMLElementType.NULL:
+            element.set("value", json.dumps(data) if etype is not XMLElementType.STRING else data)  # type: ignore
+        return element
+
+
+def nodes_per_second(func: Callable[[], Any], nodes: int, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return nodes / best
+
+
+def run(repeat: int = 5) -> List[Dict[str, Any]]:
+    results = []
+    corpora = (
+        ("wide", wide_document()),
+        ("deep", deep_document()),
+        # beyond the interpreter's recursion limit
+        ("very-deep", deep_document(5_000)),
+    )
+    for name, data in corpora:
+        element = XMLParser.parse_json_to_element(data)
+        nodes = count_nodes(element)
+        try:
+            # both cores must produce identical output
+            assert etree.tostring(element) == etree.tostring(RecursiveXMLParser.parse_json_data_to_etree(data))
+            assert XMLParser._parse_etree_to_json_type(element) == RecursiveXMLParser.parse_etree_to_json_type(element)
+        except RecursionError:
+            pass
+
+        row: Dict[str, Any] = {"corpus": name, "nodes": nodes}
+        for direction, iterative, recursive in (
+            ("xml2json",
+             lambda: XMLParser._parse_etree_to_json_type(element),
+             lambda: RecursiveXMLParser.parse_etree_to_json_type(element)),
+            ("json2xml",
+             lambda: XMLParser._parse_json_data_to_etree(data),
+             lambda: RecursiveXMLParser.parse_json_data_to_etree(data)),
+        ):
+            row[f"{direction}_iterative"] = nodes_per_second(iterative, nodes, repeat)
+            try:
+                row[f"{direction}_recursive"] = nodes_per_second(recursive, nodes, repeat)
+            except RecursionError:
+                row[f"{direction}_recursive"] = None
+        results.append(row)
+    return results
+
+
+def main() -> None:
+    for row in run():
+        print(f"{row['corpus']} ({row['nodes']} nodes)")
+        for direction in ("xml2json", "json2xml"):
+            iterative = row[f"{direction}_iterative"]
+            recursive = row[f"{direction}_recursive"]
+            baseline = f"{recursive:,.0f} nodes/s" if recursive else "RecursionError"
+            print(f"  {direction}: iterative {iterative:,.0f} nodes/s, recursive {baseline}")
+
+
+if __name__ == "__main__":
+    main()
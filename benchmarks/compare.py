@@ -0,0 +1,62 @@
+"""
+Compare two result files written by `python -m benchmarks`.
+
+    python -m benchmarks.compare before.json after.json --threshold 0.10
+
+Benchmarks are matched by suite, name and parameters. Exits with status 1 when
+any of them got worse by more than the threshold, so it can gate a CI job.
+"""
+import argparse
+import json
+import sys
+from typing import Any, Dict, Tuple
+
+Key = Tuple[str, str, str]
+
+
+def load(path: str) -> Dict[Key, Dict[str, Any]]:
+    with open(path) as fp:
+        document = json.load(fp)
+    return {
+        (row["suite"], row["benchmark"], json.dumps(row["params"], sort_keys=True)): row
+        for row in document["results"]
+    }
+
+
+def change(before: Dict[str, Any], after: Dict[str, Any]) -> float:
+    """Relative change, positive meaning better regardless of the unit's direction"""
+    ratio = after["value"] / before["value"] - 1.0
+    return ratio if before["higher_is_better"] else -ratio
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative slowdown reported as regression")
+    args = parser.parse_args()
+
+    before, after = load(args.before), load(args.after)
+    regressions = 0
+    for key in sorted(before.keys() & after.keys()):
+        suite, benchmark, params = key
+        delta = change(before[key], after[key])
+        flag = ""
+        if delta < -args.threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        elif delta > args.threshold:
+            flag = "  improved"
+        print(
+            f"{suite:<10} {benchmark:<26} {params:<45} "
+            f"{before[key]['value']:>12.6g} -> {after[key]['value']:>12.6g} {after[key]['unit']:<6} "
+            f"{delta:+7.1%}{flag}"
+        )
+    for key in sorted(before.keys() ^ after.keys()):
+        print(f"{key[0]:<10} {key[1]:<26} {key[2]:<45} only in {'before' if key in before else 'after'}")
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
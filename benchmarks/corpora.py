@@ -0,0 +1,49 @@
+"""
+Synthetic, deterministic documents in the shapes the converter has to handle:
+many small records (wide), heavy nesting (deep) and few big string values
+(large-leaf).
+"""
+from typing import Callable, Dict
+
+from lxml import etree
+from lxml.etree import _Element
+
+from src.config.annotations import JSONType
+from src.core.xml_parser import XMLParser
+
+
+def wide_document(width: int = 20_000) -> JSONType:
+    return [
+        {"id": i, "name": f"item-{i}", "price": i * 0.25, "active": i % 2 == 0, "note": None}
+        for i in range(width)
+    ]
+
+
+def deep_document(depth: int = 300) -> JSONType:
+    doc: JSONType = {"leaf": 1}
+    for i in range(depth):
+        doc = {"level": i, "child": [doc]}
+    return doc
+
+
+def large_leaf_document(count: int = 16, size: int = 256 * 1024) -> JSONType:
+    # characters that need escaping in both XML and JSON, spread through the text
+    chunk = "lorem ipsum <dolor> & \"sit\" amet, consectetur\n"
+    text = (chunk * (size // len(chunk) + 1))[:size]
+    return {f"blob-{i}": f"{i}:{text}" for i in range(count)}
+
+
+CORPORA: Dict[str, Callable[[], JSONType]] = {
+    "wide": wide_document,
+    # two XML levels per step, kept under libxml2's default depth limit of 256
+    "deep": lambda: deep_document(120),
+    "large-leaf": large_leaf_document,
+}
+
+
+def to_xml_string(data: JSONType) -> str:
+    return etree.tostring(XMLParser.parse_json_to_element(data), encoding="unicode")
+
+
+def count_nodes(element: _Element) -> int:
+    return sum(1 for _ in element.iter())
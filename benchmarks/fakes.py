@@ -0,0 +1,106 @@
+"""
+In-memory stand-in for AsyncDatabaseConnection, so the route benchmarks
+measure the application without a Postgres server.
+"""
+import asyncio
+import datetime
+import re
+import uuid
+from contextlib import asynccontextmanager
+from decimal import Decimal
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Sequence
+
+from src.core.conditional import ROW_VERSION_COLUMN
+from src.core.database import Params, ResultRow
+
+_TABLE = re.compile(r"\b(?:FROM|INTO|UPDATE)\s+(\w+)", re.IGNORECASE)
+
+
+def fake_tables(rows: int = 500) -> Dict[str, List[Dict[str, Any]]]:
+    created = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    products = [
+        {
+            "id": uuid.UUID(int=i + 1),
+            "name": f"product-{i:05d}",
+            "description": f"description of product {i}",
+            "price": Decimal(i % 100) + Decimal("0.99"),
+            "in_stock": 10 + i % 50,
+        }
+        for i in range(rows)
+    ]
+    users = [
+        {
+            "email": f"user{i:05d}@example.com",
+            "first_name": "First",
+            "last_name": f"Last{i}",
+            "value": str(i),
+            "is_active": True,
+            "created_at": created,
+            "updated_at": created,
+            "phone": None,
+        }
+        for i in range(rows)
+    ]
+    orders = [
+        {
+            "id": uuid.UUID(int=10_000 + i),
+            "user_email": users[i]["email"],
+            "product_ids": [products[i]["id"], products[(i + 1) % rows]["id"]],
+            "status": "pending",
+            "created_at": created - datetime.timedelta(minutes=i),
+        }
+        for i in range(rows)
+    ]
+    return {"products": products, "users": users, "orders": orders}
+
+
+class FakeDatabaseConnection:
+    """
+    Answers every statement from fixed per-table rows, picked by the first
+    table name in the query; `LIMIT %s` and the row version column are
+    honoured. `latency` seconds are awaited per statement to stand in for
+    the network round-trip.
+    """
+
+    def __init__(self, tables: Dict[str, List[Dict[str, Any]]], latency: float = 0.0) -> None:
+        self.tables = tables
+        self.latency = latency
+
+    async def _rows(self, query: str, params: Params) -> Sequence[ResultRow]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        match = _TABLE.search(query)
+        rows = self.tables.get(match.group(1).lower(), []) if match else []
+        if "LIMIT" in query and isinstance(params, Sequence) and params:
+            rows = rows[:int(params[-1])]
+        if ROW_VERSION_COLUMN in query:
+            rows = [{**row, ROW_VERSION_COLUMN: "1"} for row in rows]
+        return rows
+
+    async def query_all(self, query: str, params: Params = None) -> List[ResultRow]:
+        return list(await self._rows(query, params))
+
+    async def query_one(self, query: str, params: Params = None) -> Optional[ResultRow]:
+        rows = await self._rows(query, params)
+        return rows[0] if rows else None
+
+    async def execute(self, query: str, params: Params = None) -> None:
+        await self._rows(query, params)
+
+    async def bulk_execute(
+        self,
+        query: str,
+        rows: Iterable[Sequence[Any]],
+        template: Optional[str] = None,
+        page_size: int = 1000,
+        fetch: bool = False,
+    ) -> List[ResultRow]:
+        await self._rows(query, None)
+        return [{"id": uuid.uuid4()} for _ in rows] if fetch else []
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator["FakeDatabaseConnection"]:
+        yield self
+
+    async def close(self) -> None:
+        pass
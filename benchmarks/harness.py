@@ -0,0 +1,102 @@
+"""
+Timing, environment capture and result records shared by the benchmark modules.
+
+Every benchmark produces a result dict:
+
+    {
+        "suite": "converter",
+        "benchmark": "parse_xml_from_string",
+        "params": {"corpus": "wide"},
+        "value": 0.0123,                # the number compared between runs
+        "unit": "s",
+        "higher_is_better": false,
+        "details": {...},               # everything else worth keeping
+    }
+
+`python -m benchmarks` collects them into one JSON document together with
+`environment()`, and `python -m benchmarks.compare` diffs two such documents.
+"""
+import datetime
+import os
+import platform
+import statistics
+import subprocess
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+
+def measure(func: Callable[[], Any], repeat: int = 5, number: int = 1) -> Dict[str, float]:
+    """Time `number` calls of `func` `repeat` times; statistics are seconds per call."""
+    func()  # warm-up: imports, lazy pools, first-call caches
+    timings: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - start) / number)
+    return {
+        "repeat": repeat,
+        "number": number,
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "mean": statistics.fmean(timings),
+        "stdev": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+    }
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def result(
+    suite: str,
+    benchmark: str,
+    value: float,
+    unit: str,
+    params: Optional[Dict[str, Any]] = None,
+    higher_is_better: bool = False,
+    **details: Any,
+) -> Dict[str, Any]:
+    return {
+        "suite": suite,
+        "benchmark": benchmark,
+        "params": params or {},
+        "value": value,
+        "unit": unit,
+        "higher_is_better": higher_is_better,
+        "details": details,
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True, timeout=5,
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _version(module: str) -> Optional[str]:
+    try:
+        from importlib.metadata import version
+        return version(module)
+    except Exception:
+        return None
+
+
+def environment() -> Dict[str, Any]:
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "packages": {name: _version(name) for name in ("fastapi", "starlette", "lxml", "orjson", "psycopg2-binary")},
+    }
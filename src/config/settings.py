@@ -1,9 +1,9 @@
 from enum import Enum
 from functools import lru_cache
-from typing import Any
+from typing import Any, List, Literal, Optional
 
 import yaml
-from pydantic import BaseSettings, Field, PostgresDsn
+from pydantic import BaseSettings, Field, PostgresDsn, SecretStr
 
 
 class LogLevels(str, Enum):
@@ -42,6 +42,14 @@ class DatabaseConnectionSettings(BaseSettings):
     postgres_database: str
     postgres_server: str
 
+    pool_min_size: int = Field(1, ge=0)
+    pool_max_size: int = Field(10, ge=1)
+    pool_timeout: float = Field(30.0, gt=0, description="Seconds to wait for a free connection")
+    pool_health_check: bool = True
+    statement_cache_size: int = Field(
+        256, ge=0, description="Prepared statements kept per pooled connection, 0 disables"
+    )
+
     @property
     def postgres_uri(self) -> str:
         return PostgresDsn.build(
@@ -53,10 +61,148 @@ class DatabaseConnectionSettings(BaseSettings):
         )
 
 
+class ExecutorSettings(BaseSettings):
+    """Settings for offloading XML/JSON conversions from the event loop"""
+
+    inline_max_bytes: int = Field(256 * 1024, ge=0, description="Inputs up to this size are converted inline")
+    process_min_bytes: int = Field(4 * 1024 * 1024, ge=0, description="Inputs from this size go to the process pool")
+    thread_workers: int = Field(4, ge=1)
+    process_workers: int = Field(2, ge=0, description="0 disables the process pool")
+    max_pending: int = Field(32, ge=1, description="Offloaded conversions queued or running at once")
+    queue_timeout: float = Field(0.0, ge=0, description="Seconds to wait for a queue slot before rejecting")
+
+
+class CacheSettings(BaseSettings):
+    """Settings for the read-through entity cache"""
+
+    enabled: bool = True
+    backend: Literal["memory"] = "memory"
+    max_entries: int = Field(10_000, ge=1)
+    product_ttl: float = Field(300.0, ge=0, description="Seconds; 0 disables caching of products")
+    user_ttl: float = Field(60.0, ge=0, description="Seconds; 0 disables caching of users")
+
+
+class ConversionCacheSettings(BaseSettings):
+    """Settings for the content-addressed cache of conversion results"""
+
+    enabled: bool = True
+    max_bytes: int = Field(64 * 1024 * 1024, ge=0, description="Bytes of response bodies kept in memory")
+    max_entry_bytes: int = Field(8 * 1024 * 1024, ge=0, description="Larger bodies are not kept in memory")
+    disk_dir: Optional[str] = Field(None, description="Directory of the on-disk tier; unset disables it")
+    disk_max_bytes: int = Field(1024 * 1024 * 1024, ge=0, description="Bytes of response bodies kept on disk")
+    disk_min_bytes: int = Field(1024 * 1024, ge=1, description="Bodies from this size go to disk, when enabled")
+
+
+class ProfilerSettings(BaseSettings):
+    """Settings for the slow-request sampling profiler and slow-query EXPLAIN"""
+
+    enabled: bool = False
+    sample_interval: float = Field(0.005, gt=0, description="Seconds between stack samples")
+    slow_request_seconds: float = Field(0.5, ge=0, description="Requests slower than this get a profile")
+    slow_query_seconds: float = Field(
+        0.2, ge=0, description="Read-only queries slower than this get EXPLAINed, 0 disables"
+    )
+    output_dir: str = Field("profiles", description="Directory for the collapsed-stack files")
+    max_files: int = Field(100, ge=1, description="Newest profiles kept in output_dir")
+    buffer_size: int = Field(50_000, ge=1, description="Stack samples kept in memory")
+
+
+class AdminSettings(BaseSettings):
+    """Settings for the /admin endpoints"""
+
+    token: Optional[SecretStr] = Field(
+        None, description="Bearer token the /admin endpoints require; unset disables them"
+    )
+
+
+class CompressionSettings(BaseSettings):
+    """Settings for response compression"""
+
+    enabled: bool = True
+    minimum_size: int = Field(1024, ge=0, description="Complete bodies smaller than this are sent uncompressed")
+    gzip_level: int = Field(6, ge=1, le=9)
+    brotli_quality: int = Field(4, ge=0, le=11)
+    zstd_level: int = Field(3, ge=1, le=22)
+    offload_min_bytes: int = Field(
+        256 * 1024, ge=0, description="Chunks from this size are compressed in the thread pool"
+    )
+    encodings: List[Literal["zstd", "br", "gzip"]] = Field(
+        ["zstd", "br", "gzip"], description="Offered codings in order of preference, when installed"
+    )
+
+
+class UploadSettings(BaseSettings):
+    """Settings for uploaded files"""
+
+    spool_max_size: int = Field(
+        1024 * 1024, ge=0, description="Larger uploads are spooled to a temporary file and memory-mapped"
+    )
+    archive_max_members: int = Field(10_000, ge=1, description="Batch archives with more files are rejected")
+    archive_max_member_bytes: int = Field(
+        64 * 1024 * 1024, ge=1, description="Batch archives holding a larger file are rejected"
+    )
+    archive_max_total_bytes: int = Field(
+        256 * 1024 * 1024, ge=1, description="Batch archives expanding to more bytes are rejected"
+    )
+
+
+class XMLParsingSettings(BaseSettings):
+    """Settings for parsing uploaded XML"""
+
+    validate_schema: bool = Field(False, description="Reject documents that are not in the ITEM format")
+    max_depth: int = Field(256, ge=1, description="Deeper documents are rejected")
+    max_nodes: int = Field(10_000_000, ge=1, description="Documents with more ITEMs are rejected")
+    max_attribute_length: int = Field(
+        10 * 1024 * 1024, ge=1, description="Documents with longer 'value' or 'key' attributes are rejected"
+    )
+
+
+class JobSettings(BaseSettings):
+    """Settings for background conversion jobs"""
+
+    enabled: bool = True
+    directory: str = Field(
+        "jobs", description="Directory for job inputs and results, shared by workers that each use a subdirectory"
+    )
+    workers: int = Field(2, ge=1, description="Jobs converted at once")
+    max_queued: int = Field(16, ge=1, description="Jobs waiting at once; further submissions get 429")
+    ttl: float = Field(3600.0, ge=0, description="Seconds finished jobs and their results are kept")
+    cleanup_interval: float = Field(60.0, gt=0, description="Seconds between removals of expired jobs")
+
+
+class StartupSettings(BaseSettings):
+    """Settings for worker start-up"""
+
+    background_pool_warmup: bool = Field(
+        True, description="Open the database pool's first connections after start-up instead of before it"
+    )
+    preload_converter: bool = Field(
+        False, description="Import lxml and ijson after start-up, before the first conversion"
+    )
+    precompile_templates: bool = Field(False, description="Compile the form templates after start-up")
+    template_cache_dir: Optional[str] = Field(
+        None, description="Directory for compiled template bytecode shared by workers; none to compile in memory"
+    )
+    precompile_openapi: bool = Field(False, description="Generate the OpenAPI schema after start-up")
+    openapi_cache_file: Optional[str] = Field(
+        None, description="File the generated OpenAPI schema is kept in and reused from while the routes are unchanged"
+    )
+
+
 class Settings(BaseSettings):
     uvicorn: UvicornSettings
     db_connection: DatabaseConnectionSettings
     api_config: ApiConfigSettings
+    executor: ExecutorSettings = Field(default_factory=lambda: ExecutorSettings())
+    cache: CacheSettings = Field(default_factory=lambda: CacheSettings())
+    conversion_cache: ConversionCacheSettings = Field(default_factory=lambda: ConversionCacheSettings())
+    profiler: ProfilerSettings = Field(default_factory=lambda: ProfilerSettings())
+    admin: AdminSettings = Field(default_factory=lambda: AdminSettings())
+    compression: CompressionSettings = Field(default_factory=lambda: CompressionSettings())
+    uploads: UploadSettings = Field(default_factory=lambda: UploadSettings())
+    jobs: JobSettings = Field(default_factory=lambda: JobSettings())
+    xml_parsing: XMLParsingSettings = Field(default_factory=lambda: XMLParsingSettings())
+    startup: StartupSettings = Field(default_factory=lambda: StartupSettings())
 
 
 def load_from_yaml() -> Any:
@@ -0,0 +1,216 @@
+import json
+import logging
+import lzma
+import tarfile
+import zipfile
+import zlib
+from tempfile import SpooledTemporaryFile
+from typing import IO, Any, AsyncIterator, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple, cast
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import UploadFile
+
+from src.config.settings import UploadSettings
+from src.core.encoders import json_dumps
+
+logger = logging.getLogger(__name__)
+
+# (document name, raw document bytes)
+BatchDocument = Tuple[str, bytes]
+
+ZIP_CONTENT_TYPES = ("application/zip", "application/x-zip-compressed")
+TAR_CONTENT_TYPES = ("application/x-tar", "application/x-gtar", "application/gzip", "application/x-gzip")
+TAR_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+
+# raised while decompressing a corrupt or truncated member; zipfile raises
+# RuntimeError for encrypted and NotImplementedError for unsupported members
+ZIP_READ_ERRORS = (zipfile.BadZipFile, zlib.error, lzma.LZMAError, EOFError, OSError, RuntimeError, NotImplementedError)
+TAR_READ_ERRORS = (tarfile.TarError, zlib.error, lzma.LZMAError, EOFError, OSError)
+
+
+class BatchError(Exception):
+    """Raised when a batch container (archive, NDJSON line) cannot be read."""
+    pass
+
+
+class ArchiveLimits(NamedTuple):
+    """
+    Bounds on what an uploaded archive may expand to, checked against the sizes
+    its entries declare before any of them is read.
+    """
+
+    max_members: int = 10_000
+    max_member_bytes: int = 64 * 1024 * 1024
+    max_total_bytes: int = 256 * 1024 * 1024
+
+    @classmethod
+    def from_settings(cls, settings: UploadSettings) -> "ArchiveLimits":
+        return cls(
+            max_members=settings.archive_max_members,
+            max_member_bytes=settings.archive_max_member_bytes,
+            max_total_bytes=settings.archive_max_total_bytes,
+        )
+
+
+DEFAULT_ARCHIVE_LIMITS = ArchiveLimits()
+
+
+class _ArchiveBudget:
+    """What is left of ArchiveLimits while one archive is expanded."""
+
+    def __init__(self, limits: ArchiveLimits) -> None:
+        self.limits = limits
+        self.members = 0
+        self.total_bytes = 0
+
+    def take(self, name: str, size: int) -> None:
+        """Account for the member `name` of `size` bytes; BatchError if it breaks a limit."""
+        self.members += 1
+        self.total_bytes += size
+        if self.members > self.limits.max_members:
+            raise BatchError(f"Archive has more than {self.limits.max_members} files")
+        if size > self.limits.max_member_bytes:
+            raise BatchError(f"Archive member {name!r} is larger than {self.limits.max_member_bytes} bytes")
+        if self.total_bytes > self.limits.max_total_bytes:
+            raise BatchError(f"Archive expands to more than {self.limits.max_total_bytes} bytes")
+
+
+def is_zip_upload(file: UploadFile) -> bool:
+    return file.content_type in ZIP_CONTENT_TYPES or (file.filename or "").lower().endswith(".zip")
+
+
+def is_tar_upload(file: UploadFile) -> bool:
+    return file.content_type in TAR_CONTENT_TYPES or (file.filename or "").lower().endswith(TAR_SUFFIXES)
+
+
+def iter_zip_documents(file: Any, limits: ArchiveLimits = DEFAULT_ARCHIVE_LIMITS) -> Iterator[BatchDocument]:
+    """
+    Yield every regular file of a zip archive, up to `limits`.
+    """
+    try:
+        archive = zipfile.ZipFile(file)
+    except zipfile.BadZipFile as e:
+        raise BatchError(f"Invalid zip archive: {e}")
+    budget = _ArchiveBudget(limits)
+    with archive:
+        for info in archive.infolist():
+            if not info.is_dir():
+                # zipfile stops decompressing at the declared size
+                budget.take(info.filename, info.file_size)
+                try:
+                    content = archive.read(info)
+                except ZIP_READ_ERRORS as e:
+                    raise BatchError(f"Invalid zip archive member {info.filename!r}: {e}")
+                yield info.filename, content
+
+
+def iter_tar_documents(file: Any, limits: ArchiveLimits = DEFAULT_ARCHIVE_LIMITS) -> Iterator[BatchDocument]:
+    """
+    Yield every regular file of a (optionally compressed) tar archive, up to `limits`.
+    """
+    try:
+        archive = tarfile.open(fileobj=file, mode="r:*")
+    except TAR_READ_ERRORS as e:
+        raise BatchError(f"Invalid tar archive: {e}")
+    budget = _ArchiveBudget(limits)
+    with archive:
+        while True:
+            # headers are read as the archive is walked, so a corrupt one shows up here too
+            try:
+                member = archive.next()
+                if member is None:
+                    break
+                if not member.isfile():
+                    continue
+                budget.take(member.name, member.size)
+                extracted = archive.extractfile(member)
+                content = extracted.read() if extracted is not None else None
+            except TAR_READ_ERRORS as e:
+                raise BatchError(f"Invalid tar archive: {e}")
+            if content is not None:
+                yield member.name, content
+
+
+async def iter_upload_documents(
+    files: List[UploadFile],
+    limits: ArchiveLimits = DEFAULT_ARCHIVE_LIMITS,
+) -> AsyncIterator[BatchDocument]:
+    """
+    Yield the documents of a multipart upload, expanding zip and tar archives up to `limits`.
+    """
+    for file in files:
+        if is_zip_upload(file):
+            members = iter_zip_documents(file.file, limits)
+        elif is_tar_upload(file):
+            members = iter_tar_documents(file.file, limits)
+        else:
+            yield file.filename, cast(bytes, await file.read())
+            continue
+        while True:
+            document = await run_in_threadpool(next, members, None)
+            if document is None:
+                break
+            yield document
+
+
+async def spool_request_body(stream: AsyncIterator[bytes], max_size: Optional[int] = None) -> IO[bytes]:
+    """
+    Copy a request body into a temporary file that stays in memory up to `max_size` bytes,
+    by default the spool size of uploaded files.
+    The body has to be consumed before a streaming response starts listening for disconnects.
+    """
+    spool = SpooledTemporaryFile(max_size=UploadFile.spool_max_size if max_size is None else max_size)
+    async for chunk in stream:
+        spool.write(chunk)
+    spool.seek(0)
+    return spool
+
+
+async def iter_ndjson_documents(file: IO[bytes]) -> AsyncIterator[BatchDocument]:
+    """
+    Yield the non-empty lines of an NDJSON file, named by their 1-based line number.
+    """
+    with file:
+        for line_no, line in enumerate(file, start=1):
+            if line.strip():
+                yield f"line {line_no}", line
+
+
+def decode_ndjson_string(line: bytes) -> bytes:
+    """
+    Decode an NDJSON line holding a JSON string (e.g. an XML document) to UTF-8 bytes.
+    """
+    value = json.loads(line)
+    if not isinstance(value, str):
+        raise BatchError("Expected a JSON string on each line")
+    return value.encode("utf-8")
+
+
+async def iter_batch_results(
+    documents: AsyncIterator[BatchDocument],
+    convert: Callable[[bytes], Any],
+) -> AsyncIterator[bytes]:
+    """
+    Convert each document in a worker thread and yield one NDJSON result line per document.
+    A failing document produces an error line instead of failing the whole batch.
+    """
+    index = 0
+    try:
+        async for name, content in documents:
+            result: Dict[str, Any] = {"index": index, "name": name}
+            try:
+                data = await run_in_threadpool(convert, content)
+                result["success"] = True
+                result["data"] = data
+            except Exception as e:
+                logger.info("Batch document %r failed: %s", name, e)
+                result["success"] = False
+                result["errors"] = [str(e) or type(e).__name__]
+            yield _encode_line(result)
+            index += 1
+    except BatchError as e:
+        yield _encode_line({"index": index, "name": None, "success": False, "errors": [str(e)]})
+
+
+def _encode_line(result: Dict[str, Any]) -> bytes:
+    return json_dumps(result) + b"\n"
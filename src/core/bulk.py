@@ -0,0 +1,187 @@
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Sequence, Tuple, Type, TypeVar
+
+import orjson
+import psycopg2
+from pydantic import BaseModel, ValidationError
+from starlette.requests import Request
+
+from src.core.database import AsyncDatabaseConnection, DatabaseConnectionPool, ResultRow
+from src.core.formats import UnsupportedMediaTypeError, codec_for, media_type_of
+
+logger = logging.getLogger(__name__)
+
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonlines")
+DEFAULT_CHUNK_SIZE = 1000
+MAX_CHUNK_SIZE = 10_000
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+ResultT = TypeVar("ResultT")
+
+# (index of the row in the request body, validated row)
+IndexedRow = Tuple[int, ModelT]
+
+
+class BulkPayloadError(ValueError):
+    """Raised when a bulk request body is neither an array nor NDJSON."""
+    pass
+
+
+async def read_bulk_payload(request: Request) -> List[Any]:
+    """
+    Return the items of a bulk request body: a JSON, MessagePack or CBOR array,
+    or NDJSON with one item per line.
+    """
+    body = await request.body()
+    content_type = request.headers.get("content-type")
+    try:
+        if media_type_of(content_type) in NDJSON_CONTENT_TYPES:
+            return [orjson.loads(line) for line in body.splitlines() if line.strip()]
+        codec = codec_for(content_type)
+        items = codec.loads(body) if codec is not None else orjson.loads(body)
+    except UnsupportedMediaTypeError as e:
+        raise BulkPayloadError(str(e))
+    except (ValueError, TypeError) as e:
+        # orjson.JSONDecodeError and the msgpack and cbor2 decode errors are ValueErrors
+        raise BulkPayloadError(f"Invalid bulk payload: {e}")
+    if not isinstance(items, list):
+        raise BulkPayloadError("Expected an array or NDJSON body")
+    return items
+
+
+def validate_bulk_rows(
+    items: Sequence[Any],
+    model: Type[ModelT],
+) -> Tuple[List[IndexedRow[ModelT]], List[Dict[str, Any]]]:
+    """
+    Validate every item against `model`, returning the valid rows and one error per invalid row.
+    """
+    valid: List[IndexedRow[ModelT]] = []
+    errors: List[Dict[str, Any]] = []
+    for index, item in enumerate(items):
+        try:
+            if not isinstance(item, dict):
+                raise TypeError("Expected a JSON object")
+            valid.append((index, model(**item)))
+        except (ValidationError, TypeError) as e:
+            errors.append({"index": index, "errors": str(e)})
+    return valid, errors
+
+
+class BulkRowError(Exception):
+    """Raised by a `bulk_apply` operation to reject one row; its message is reported for the row."""
+    pass
+
+
+async def bulk_insert(
+    db: AsyncDatabaseConnection,
+    rows: Sequence[IndexedRow[ModelT]],
+    to_values: Callable[[ModelT], Sequence[Any]],
+    query: str,
+    template: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Tuple[List[ResultRow], List[Dict[str, Any]]]:
+    """
+    Insert rows with `bulk_execute`, one transaction per chunk of `chunk_size` rows.
+
+    When a chunk fails, it is split in halves that are retried the same way, down
+    to single rows whose error is reported, so a bad row costs a few transactions
+    rather than one per row of its chunk while the others still load.
+    `query` holds a single `VALUES %s` placeholder and should end in `RETURNING`.
+    """
+    inserted: List[ResultRow] = []
+    errors: List[Dict[str, Any]] = []
+
+    async def insert(chunk: Sequence[IndexedRow[ModelT]]) -> None:
+        try:
+            async with db.transaction():
+                inserted.extend(await db.bulk_execute(
+                    query, [to_values(row) for _, row in chunk], template=template,
+                    page_size=chunk_size, fetch=True,
+                ))
+            return
+        except psycopg2.Error as e:
+            if len(chunk) == 1:
+                errors.append({"index": chunk[0][0], "errors": str(e).strip()})
+                return
+            logger.info("Bulk chunk of %d rows failed, retrying its halves: %s", len(chunk), e)
+        middle = len(chunk) // 2
+        await insert(chunk[:middle])
+        await insert(chunk[middle:])
+
+    for start in range(0, len(rows), chunk_size):
+        await insert(rows[start:start + chunk_size])
+    return inserted, errors
+
+
+async def bulk_apply(
+    db: AsyncDatabaseConnection,
+    rows: Sequence[IndexedRow[ModelT]],
+    apply: Callable[[AsyncDatabaseConnection, ModelT], Awaitable[ResultT]],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Tuple[List[ResultT], List[Dict[str, Any]]]:
+    """
+    Run `apply` for each row, one transaction per chunk of `chunk_size` rows and
+    a savepoint per row, for writes that cannot be batched into one statement.
+
+    A row whose `apply` raises BulkRowError or a database error is rolled back
+    to its savepoint and reported, and the rest of its chunk carries on.
+    """
+    applied: List[ResultT] = []
+    errors: List[Dict[str, Any]] = []
+
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        chunk_applied: List[ResultT] = []
+        chunk_errors: List[Dict[str, Any]] = []
+        try:
+            async with db.transaction():
+                for index, row in chunk:
+                    try:
+                        async with db.savepoint("bulk_row"):
+                            chunk_applied.append(await apply(db, row))
+                    except (BulkRowError, psycopg2.Error) as e:
+                        chunk_errors.append({"index": index, "errors": str(e).strip()})
+        except psycopg2.Error as e:
+            # the transaction itself failed, and took every row of the chunk with it
+            logger.info("Bulk chunk of %d rows failed: %s", len(chunk), e)
+            errors.extend({"index": index, "errors": str(e).strip()} for index, _ in chunk)
+            continue
+        applied.extend(chunk_applied)
+        errors.extend(chunk_errors)
+
+    return applied, errors
+
+
+def copy_bulk_rows(
+    pool: DatabaseConnectionPool,
+    table: str,
+    columns: Sequence[str],
+    rows: Sequence[IndexedRow[ModelT]],
+    to_values: Callable[[ModelT], Sequence[Any]],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Tuple[int, List[Dict[str, Any]]]:
+    """
+    Load rows with COPY FROM STDIN, one transaction per chunk. Blocking: run it in a worker thread.
+
+    COPY is all-or-nothing, so a failing chunk reports the error for each of its rows.
+    """
+    copied = 0
+    errors: List[Dict[str, Any]] = []
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        try:
+            with pool.connection() as db:
+                copied += db.copy_from(table, columns, [to_values(row) for _, row in chunk])
+        except psycopg2.Error as e:
+            errors.extend({"index": index, "errors": str(e).strip()} for index, _ in chunk)
+    return copied, errors
+
+
+def bulk_result(inserted: int, errors: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Build the `data` of a bulk response."""
+    return {
+        "inserted": inserted,
+        "failed": len(errors),
+        "errors": sorted(errors, key=lambda error: error["index"]),
+    }
@@ -0,0 +1,140 @@
+import logging
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Mapping, Optional, Tuple
+
+from src.config.settings import CacheSettings
+from src.core.database import ResultRow
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBackend(ABC):
+    """
+    Key/value store behind EntityCache. Methods are coroutines so that
+    out-of-process stores (e.g. a local Redis) can implement the same interface.
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> Tuple[bool, Any]:
+        """Return (found, value) for `key`."""
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        """Store `value` under `key` for `ttl` seconds."""
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        """Drop `key` if present."""
+
+    @abstractmethod
+    async def clear(self) -> None:
+        """Drop every entry."""
+
+    @abstractmethod
+    def stats(self) -> Mapping[str, int]:
+        """Return hit/miss/eviction counters and the current size."""
+
+
+class InMemoryCache(CacheBackend):
+    """Process-local LRU cache with per-entry expiry and a bound on the number of entries."""
+
+    def __init__(self, max_entries: int = 10_000) -> None:
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    async def get(self, key: str) -> Tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return False, None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return False, None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return True, value
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    async def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Mapping[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+        }
+
+
+class EntityCache:
+    """
+    Read-through cache of entity rows, namespaced by entity with a TTL per entity.
+    Writers must call `invalidate` for every row they change.
+    """
+
+    def __init__(self, backend: Optional[CacheBackend], ttls: Mapping[str, float]) -> None:
+        self.backend = backend
+        self.ttls = dict(ttls)
+
+    @classmethod
+    def from_settings(cls, settings: CacheSettings) -> "EntityCache":
+        backend: Optional[CacheBackend] = None
+        if settings.enabled:
+            backend = InMemoryCache(max_entries=settings.max_entries)
+        return cls(backend, ttls={"product": settings.product_ttl, "user": settings.user_ttl})
+
+    @staticmethod
+    def _key(entity: str, key: Any) -> str:
+        return f"{entity}:{key}"
+
+    async def get_or_load(
+        self,
+        entity: str,
+        key: Any,
+        loader: Callable[[], Awaitable[Optional[ResultRow]]],
+    ) -> Optional[ResultRow]:
+        """
+        Return the cached row, or load it, cache it and return it. Missing rows are not cached.
+        """
+        ttl = self.ttls.get(entity, 0)
+        if self.backend is None or ttl <= 0:
+            return await loader()
+
+        cache_key = self._key(entity, key)
+        found, row = await self.backend.get(cache_key)
+        if found:
+            return row
+        row = await loader()
+        if row is not None:
+            await self.backend.set(cache_key, dict(row), ttl)
+        return row
+
+    async def invalidate(self, entity: str, key: Any) -> None:
+        if self.backend is not None:
+            await self.backend.delete(self._key(entity, key))
+
+    def stats(self) -> Dict[str, Any]:
+        if self.backend is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.backend.stats()}
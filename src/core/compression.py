@@ -0,0 +1,319 @@
+"""
+Response compression negotiated from Accept-Encoding: zstd, brotli and gzip.
+
+gzip is always available; brotli needs the `brotli` (or `brotlicffi`) package
+and zstd the `zstandard` package, and is only offered when it is installed.
+Bodies cached and sent many times can be compressed once up front with the
+same codings, see `ContentCodings`; the middleware passes encoded bodies through.
+"""
+import zlib
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from types import ModuleType
+from typing import Callable, Dict, NamedTuple, Optional, Sequence, Tuple
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.config.settings import CompressionSettings
+
+# None when missing; the compressors use the imported modules, which they only need once offered
+brotli: Optional[ModuleType]
+try:
+    import brotli as _brotli
+except ImportError:
+    try:
+        import brotlicffi as _brotli
+    except ImportError:
+        brotli = None
+    else:
+        brotli = _brotli
+else:
+    brotli = _brotli
+
+zstandard: Optional[ModuleType]
+try:
+    import zstandard as _zstandard
+except ImportError:
+    zstandard = None
+else:
+    zstandard = _zstandard
+
+DEFAULT_MINIMUM_SIZE = 1024
+DEFAULT_OFFLOAD_MIN_BYTES = 256 * 1024
+DEFAULT_ENCODINGS = ("zstd", "br", "gzip")
+
+# bodies that are compressed already, or gain too little to pay for the CPU
+INCOMPRESSIBLE_CONTENT_TYPES = (
+    "image/",
+    "video/",
+    "audio/",
+    "application/zip",
+    "application/gzip",
+    "application/x-gzip",
+    "application/zstd",
+    "application/x-tar",
+    "application/octet-stream",
+)
+
+
+class Compressor(ABC):
+    """
+    One response body being compressed.
+
+    `chunk` returns everything compressed so far, flushed so the client can
+    decode it before the stream ends; `finish` ends the stream.
+    """
+
+    @abstractmethod
+    def chunk(self, data: bytes) -> bytes:
+        """Compress `data` and flush it."""
+
+    @abstractmethod
+    def finish(self, data: bytes = b"") -> bytes:
+        """Compress `data` and end the stream."""
+
+
+class GzipCompressor(Compressor):
+    def __init__(self, level: int) -> None:
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_FINISH)
+
+
+class BrotliCompressor(Compressor):
+    def __init__(self, quality: int) -> None:
+        self._compressor = _brotli.Compressor(quality=quality)
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.process(data) + self._compressor.finish()
+
+
+class ZstdCompressor(Compressor):
+    def __init__(self, level: int) -> None:
+        self._compressor = _zstandard.ZstdCompressor(level=level).compressobj()
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(_zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush()
+
+
+def available_encodings() -> Tuple[str, ...]:
+    """Return the content codings whose compression package is installed."""
+    return tuple(
+        encoding for encoding, available in (
+            ("zstd", zstandard is not None),
+            ("br", brotli is not None),
+            ("gzip", True),
+        )
+        if available
+    )
+
+
+@lru_cache(maxsize=256)
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """
+    Parse an Accept-Encoding header into content codings and their q-values.
+    Malformed q-values count as 1.
+    """
+    codings: Dict[str, float] = {}
+    for part in header.split(","):
+        coding, *params = part.split(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = min(max(float(value), 0.0), 1.0)
+                except ValueError:
+                    pass
+        codings[coding] = q
+    return codings
+
+
+def choose_encoding(header: Optional[str], encodings: Sequence[str]) -> Optional[str]:
+    """
+    Return the coding of `encodings` the client prefers, or None to send the body as is.
+    Among codings with the same q-value, the earlier one in `encodings` wins.
+    """
+    if not header:
+        return None
+    codings = parse_accept_encoding(header)
+    wildcard = codings.get("*", 0.0)
+    best, best_q = None, 0.0
+    for encoding in encodings:
+        q = codings.get(encoding, wildcard)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class ContentCoding(NamedTuple):
+    """A content coding negotiated for one response, and how to compress with it"""
+
+    name: str
+    compressor: Callable[[], Compressor]
+    offload_min_bytes: int
+
+    async def compress(self, data: bytes) -> bytes:
+        """Compress a complete body, in the thread pool from `offload_min_bytes`."""
+        compressor = self.compressor()
+        if len(data) >= self.offload_min_bytes:
+            return await run_in_threadpool(compressor.finish, data)
+        return compressor.finish(data)
+
+
+class ContentCodings:
+    """
+    The content codings offered, in order of preference, and their compression levels.
+    Codings whose compression package is not installed are left out.
+    """
+
+    def __init__(
+        self,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+        zstd_level: int = 3,
+        offload_min_bytes: int = DEFAULT_OFFLOAD_MIN_BYTES,
+        encodings: Sequence[str] = DEFAULT_ENCODINGS,
+    ) -> None:
+        installed = available_encodings()
+        self.encodings = tuple(encoding for encoding in encodings if encoding in installed)
+        self.offload_min_bytes = offload_min_bytes
+        self.compressors: Dict[str, Callable[[], Compressor]] = {
+            "gzip": lambda: GzipCompressor(gzip_level),
+            "br": lambda: BrotliCompressor(brotli_quality),
+            "zstd": lambda: ZstdCompressor(zstd_level),
+        }
+
+    @classmethod
+    def from_settings(cls, settings: CompressionSettings) -> Optional["ContentCodings"]:
+        if not settings.enabled:
+            return None
+        return cls(
+            gzip_level=settings.gzip_level,
+            brotli_quality=settings.brotli_quality,
+            zstd_level=settings.zstd_level,
+            offload_min_bytes=settings.offload_min_bytes,
+            encodings=settings.encodings,
+        )
+
+    def negotiate(self, accept_encoding: Optional[str]) -> Optional[ContentCoding]:
+        """Return the coding the client prefers, or None to send bodies as they are."""
+        encoding = choose_encoding(accept_encoding, self.encodings)
+        if encoding is None:
+            return None
+        return ContentCoding(encoding, self.compressors[encoding], self.offload_min_bytes)
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing response bodies with the best coding the client accepts.
+
+    Complete bodies smaller than `minimum_size` are sent as is. Streaming bodies
+    are compressed chunk by chunk and flushed after each one. Chunks of at least
+    `offload_min_bytes` are compressed in the thread pool, off the event loop.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = DEFAULT_MINIMUM_SIZE,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+        zstd_level: int = 3,
+        offload_min_bytes: int = DEFAULT_OFFLOAD_MIN_BYTES,
+        encodings: Sequence[str] = DEFAULT_ENCODINGS,
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.offload_min_bytes = offload_min_bytes
+        self.codings = ContentCodings(gzip_level, brotli_quality, zstd_level, offload_min_bytes, encodings)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        coding = self.codings.negotiate(Headers(scope=scope).get("accept-encoding"))
+        if coding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Message = {}
+        compressor: Optional[Compressor] = None
+        passthrough = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start_message, compressor, passthrough
+            if message["type"] == "http.response.start":
+                # held back until the first body chunk shows whether to compress
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None:
+                headers = MutableHeaders(raw=start_message["headers"])
+                if not self.should_compress(start_message["status"], headers) or (
+                    not more_body and len(body) < self.minimum_size
+                ):
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+
+                compressor = coding.compressor()
+                headers["Content-Encoding"] = coding.name
+                headers.add_vary_header("Accept-Encoding")
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/"):
+                    # the compressed bytes differ from the ones the strong validator names
+                    headers["ETag"] = f"W/{etag}"
+                if more_body:
+                    del headers["Content-Length"]
+                else:
+                    body = await self.compress(compressor.finish, body)
+                    headers["Content-Length"] = str(len(body))
+                    await send(start_message)
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                await send(start_message)
+
+            compress = compressor.chunk if more_body else compressor.finish
+            await send({
+                "type": "http.response.body",
+                "body": await self.compress(compress, body),
+                "more_body": more_body,
+            })
+
+        await self.app(scope, receive, send_wrapper)
+
+    @staticmethod
+    def should_compress(status_code: int, headers: MutableHeaders) -> bool:
+        if status_code < 200 or status_code in (204, 206, 304):
+            return False
+        if "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "").lower()
+        return not content_type.startswith(INCOMPRESSIBLE_CONTENT_TYPES)
+
+    async def compress(self, func: Callable[[bytes], bytes], data: bytes) -> bytes:
+        if len(data) >= self.offload_min_bytes:
+            return await run_in_threadpool(func, data)
+        return func(data)
@@ -0,0 +1,101 @@
+"""
+HTTP validators for entity and list responses, and conditional GET handling.
+
+ETags are derived from PostgreSQL row versions (the `xmin` system column,
+which changes whenever a row is written) and the negotiated body format, not
+from the encoded body, so a request that matches can be answered with 304
+before anything is encoded.
+"""
+import datetime
+import hashlib
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, NamedTuple, Optional, Sequence
+
+from starlette import status
+from starlette.datastructures import Headers
+from starlette.responses import Response
+
+from src.core.database import ResultRow
+from src.core.encoders import json_dumps
+from src.core.formats import RESPONSE_CODEC
+
+ROW_VERSION_COLUMN = "_row_version"
+# select list entry adding the row version to `SELECT *`
+ROW_VERSION = f"xmin::text AS {ROW_VERSION_COLUMN}"
+
+# clients may keep responses, but have to revalidate them before every use
+CACHE_CONTROL = "no-cache"
+
+
+def without_row_version(row: ResultRow) -> Dict[str, Any]:
+    """Return a copy of `row` without the row version column."""
+    return {column: value for column, value in row.items() if column != ROW_VERSION_COLUMN}
+
+
+def _etag_values(header: str) -> Sequence[str]:
+    # weak comparison: W/"x" and "x" match
+    return [value.strip().removeprefix("W/") for value in header.split(",")]
+
+
+class Validators(NamedTuple):
+    etag: str
+    last_modified: Optional[datetime.datetime] = None
+
+    @classmethod
+    def for_rows(
+        cls,
+        rows: Sequence[ResultRow],
+        key_columns: Sequence[str],
+        modified_column: Optional[str] = None,
+    ) -> "Validators":
+        """
+        Build the validators of a response made of `rows`, fetched with ROW_VERSION.
+
+        The ETag covers each row's key and version, in order, and the response format.
+        Pass `modified_column` only when every change to the response bumps it,
+        which is not the case for lists, where deleted rows leave no timestamp.
+        """
+        digest = hashlib.blake2b(
+            json_dumps([[row[column] for column in key_columns] + [row[ROW_VERSION_COLUMN]] for row in rows]),
+            digest_size=12,
+        )
+        etag = f'"{RESPONSE_CODEC.get().name}-{digest.hexdigest()}"'
+        last_modified = None
+        if modified_column is not None and rows:
+            last_modified = max(row[modified_column] for row in rows)
+            if last_modified.tzinfo is None:
+                last_modified = last_modified.replace(tzinfo=datetime.timezone.utc)
+        return cls(etag, last_modified)
+
+    def headers(self) -> Dict[str, str]:
+        headers = {"ETag": self.etag, "Cache-Control": CACHE_CONTROL, "Vary": "Accept"}
+        if self.last_modified is not None:
+            headers["Last-Modified"] = format_datetime(
+                self.last_modified.astimezone(datetime.timezone.utc), usegmt=True
+            )
+        return headers
+
+    def not_modified(self, request_headers: Headers) -> bool:
+        """
+        Return whether the client's copy is current, per If-None-Match or,
+        when that is absent, If-Modified-Since.
+        """
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match is not None:
+            values = _etag_values(if_none_match)
+            return "*" in values or self.etag in values
+
+        if_modified_since = request_headers.get("if-modified-since")
+        if if_modified_since is None or self.last_modified is None:
+            return False
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=datetime.timezone.utc)
+        # HTTP dates have a resolution of one second
+        return self.last_modified.replace(microsecond=0) <= since
+
+    def not_modified_response(self) -> Response:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=self.headers())
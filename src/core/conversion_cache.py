@@ -0,0 +1,222 @@
+"""
+Content-addressed cache of converted response bodies.
+
+Keys are a BLAKE2b hash of the uploaded bytes plus the conversion direction,
+options and negotiated content coding; values are the response bodies exactly
+as they were sent, compressed already, so a hit is answered without parsing,
+encoding or compressing anything.
+"""
+import hashlib
+import logging
+import mmap
+import os
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, Optional, Tuple, Union
+
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response, StreamingResponse
+
+from src.config.settings import ConversionCacheSettings
+from src.core.xml_parser import BytesLike
+
+logger = logging.getLogger(__name__)
+
+# inputs from this size are hashed in the thread pool; hashlib releases the GIL
+HASH_OFFLOAD_MIN_BYTES = 1024 * 1024
+MMAP_CHUNK_SIZE = 1024 * 1024
+
+CachedBody = Union[bytes, mmap.mmap]
+
+
+class DiskTier:
+    """
+    Cached bodies stored as one file per key and read back through mmap,
+    bounded by the total size of the files, least recently used first out.
+
+    The index lives in memory and is rebuilt from the directory on start-up,
+    oldest files first; several processes may share a directory, each
+    bounding only the files it knows about.
+    """
+
+    def __init__(self, directory: str, max_bytes: int) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.evictions = 0
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+
+        os.makedirs(directory, exist_ok=True)
+        files = []
+        for entry in os.scandir(directory):
+            if entry.is_file() and entry.name.endswith(".bin"):
+                stat = entry.stat()
+                files.append((stat.st_mtime, entry.name[:-len(".bin")], stat.st_size))
+        for _, key, size in sorted(files):
+            self._add(key, size)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.bin")
+
+    def _add(self, key: str, size: int) -> None:
+        self.bytes += size - self._index.get(key, 0)
+        self._index[key] = size
+        self._index.move_to_end(key)
+        while self.bytes > self.max_bytes and self._index:
+            evicted, evicted_size = self._index.popitem(last=False)
+            self.bytes -= evicted_size
+            self.evictions += 1
+            try:
+                os.remove(self._path(evicted))
+            except FileNotFoundError:
+                pass
+
+    def open(self, key: str) -> Optional[mmap.mmap]:
+        if key not in self._index:
+            return None
+        try:
+            with open(self._path(key), "rb") as fp:
+                body = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            # removed by another process sharing the directory
+            self.bytes -= self._index.pop(key)
+            return None
+        self._index.move_to_end(key)
+        return body
+
+    def _write(self, key: str, body: bytes) -> None:
+        path = self._path(key)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as fp:
+            fp.write(body)
+        os.replace(temporary, path)
+
+    async def put(self, key: str, body: bytes) -> None:
+        if len(body) > self.max_bytes:
+            return
+        try:
+            await run_in_threadpool(self._write, key, body)
+        except OSError as e:
+            logger.warning("Could not write conversion cache file for %s: %s", key, e)
+            return
+        self._add(key, len(body))
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+
+class ConversionCache:
+    """
+    Two-tier cache of conversion results: a byte-bounded LRU in memory, and
+    optionally a DiskTier for bodies of at least `disk_min_bytes`, which then
+    never take memory-tier space.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 64 * 1024 * 1024,
+        max_entry_bytes: int = 8 * 1024 * 1024,
+        disk: Optional[DiskTier] = None,
+        disk_min_bytes: int = 1024 * 1024,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.disk = disk
+        self.disk_min_bytes = disk_min_bytes
+        self.bytes = 0
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_settings(cls, settings: ConversionCacheSettings) -> Optional["ConversionCache"]:
+        if not settings.enabled:
+            return None
+        disk = DiskTier(settings.disk_dir, settings.disk_max_bytes) if settings.disk_dir else None
+        return cls(
+            max_bytes=settings.max_bytes,
+            max_entry_bytes=settings.max_entry_bytes,
+            disk=disk,
+            disk_min_bytes=settings.disk_min_bytes,
+        )
+
+    @staticmethod
+    def _hash(data: BytesLike, options: Tuple[Any, ...]) -> str:
+        digest = hashlib.blake2b(data, digest_size=16)
+        for option in options:
+            digest.update(b"\0" + str(option).encode())
+        return digest.hexdigest()
+
+    async def key(self, data: BytesLike, *options: Any) -> str:
+        """
+        Return the cache key of converting `data` with `options`, such as the
+        direction, the input format and the negotiated response format.
+        """
+        if len(data) >= HASH_OFFLOAD_MIN_BYTES:
+            return await run_in_threadpool(self._hash, data, options)
+        return self._hash(data, options)
+
+    def get(self, key: str) -> Optional[CachedBody]:
+        body: Optional[CachedBody] = self._entries.get(key)
+        if body is not None:
+            self._entries.move_to_end(key)
+            self.memory_hits += 1
+            return body
+        if self.disk is not None:
+            body = self.disk.open(key)
+            if body is not None:
+                self.disk_hits += 1
+                return body
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, body: bytes) -> None:
+        if self.disk is not None and len(body) >= self.disk_min_bytes:
+            await self.disk.put(key, body)
+            return
+        if len(body) > self.max_entry_bytes:
+            return
+        self.bytes += len(body) - len(self._entries.get(key, b""))
+        self._entries[key] = body
+        self._entries.move_to_end(key)
+        while self.bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.bytes -= len(evicted)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.memory_hits + self.disk_hits
+        lookups = hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+            "evictions": self.evictions + (self.disk.evictions if self.disk is not None else 0),
+            "memory_entries": len(self._entries),
+            "memory_bytes": self.bytes,
+            "disk_entries": len(self.disk) if self.disk is not None else 0,
+            "disk_bytes": self.disk.bytes if self.disk is not None else 0,
+        }
+
+
+def cached_response(body: CachedBody, media_type: str, encoding: Optional[str] = None) -> Response:
+    """
+    Return a cached body as is: from memory in one piece, from a memory-mapped
+    file in chunks, so large bodies are never copied whole into the heap.
+    `encoding` names the content coding a precompressed body is stored in.
+    """
+    headers = {"Content-Encoding": encoding, "Vary": "Accept-Encoding"} if encoding is not None else {}
+    if isinstance(body, bytes):
+        return Response(body, media_type=media_type, headers=headers)
+
+    def chunks() -> Iterator[bytes]:
+        try:
+            for offset in range(0, len(body), MMAP_CHUNK_SIZE):
+                yield body[offset:offset + MMAP_CHUNK_SIZE]
+        finally:
+            body.close()
+
+    headers["Content-Length"] = str(len(body))
+    return StreamingResponse(chunks(), media_type=media_type, headers=headers)
@@ -1,17 +1,204 @@
-from typing import Any, List, Mapping, Optional, Sequence, Union
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from types import TracebackType
+from typing import (
+    Any, AsyncIterator, Deque, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple, Type, Union
+)
+import asyncio
+import io
+import itertools
 import logging
+import re
+import threading
+import time
+from decimal import Decimal
+from uuid import uuid4
 
 import psycopg2
-from psycopg2._psycopg import connection
-from psycopg2.extras import RealDictCursor
+from psycopg2._psycopg import connection, cursor as Cursor
+from psycopg2 import errors, sql
+from psycopg2.extensions import (
+    POLL_OK,
+    POLL_READ,
+    POLL_WRITE,
+    TRANSACTION_STATUS_IDLE,
+    TRANSACTION_STATUS_INERROR,
+    AsIs,
+    encodings,
+)
+from psycopg2.extras import RealDictCursor, execute_values, register_uuid
+
+from src.core.metrics import DB_QUERY_SECONDS, query_fingerprint
+from src.core.profiler import PROFILER, log_query_plan
 
 logger = logging.getLogger(__name__)
 
+# routers pass uuid.UUID values straight through as query parameters
+register_uuid()
+
 
 ResultRow = Mapping[str, Any]
 Params    = Union[Sequence[Any], Mapping[str, Any], None]
 
 
+DEFAULT_STATEMENT_CACHE_SIZE = 256
+
+_PLACEHOLDER = re.compile(r"%\((\w+)\)s|%s|%%")
+_PREPARABLE = ("select", "insert", "update", "delete", "with", "values")
+# errors raised by PREPARE/DEALLOCATE for statements the server cannot prepare
+_PREPARE_ERRORS = (
+    psycopg2.ProgrammingError,
+    psycopg2.DataError,
+    psycopg2.NotSupportedError,
+    errors.InvalidSqlStatementName,
+)
+# errors raised by EXECUTE when the server no longer has a usable statement
+_STALE_STATEMENT_ERRORS = (errors.InvalidSqlStatementName, errors.FeatureNotSupported)
+
+
+# COPY's NULL marker; quoted, as every string is, it is read as text
+COPY_NULL = "\\N"
+
+
+def _copy_field(value: Any) -> str:
+    """
+    Format one CSV field for COPY: None as the bare NULL marker, numbers as
+    they are, and anything else quoted, so empty strings stay empty strings.
+    """
+    if value is None:
+        return COPY_NULL
+    if isinstance(value, (int, float, Decimal)):
+        return str(value)
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no pooled connection becomes available in time."""
+    pass
+
+
+class PreparedStatement:
+    """A query registered with the server under `name`, `text` holding $n placeholders"""
+
+    __slots__ = ("key", "name", "text", "arguments", "prepared")
+
+    def __init__(self, key: Tuple[str, bool], name: str, text: str, arguments: str) -> None:
+        self.key = key
+        self.name = name
+        self.text = text
+        self.arguments = arguments
+        self.prepared = False
+
+    @property
+    def execute_sql(self) -> str:
+        return f"EXECUTE {self.name}{self.arguments}"
+
+
+class PreparedStatementCache:
+    """Per-connection LRU registry of server-side prepared statements keyed on query text.
+
+       Only the bookkeeping lives here: the owning connection issues PREPARE lazily on
+       first use, runs the query as EXECUTE with the original parameters, and
+       DEALLOCATEs the statements evicted past `max_size`."""
+
+    def __init__(self, max_size: int = DEFAULT_STATEMENT_CACHE_SIZE) -> None:
+        if max_size < 1:
+            raise ValueError(f"Invalid statement cache size: {max_size}")
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        # None marks queries the server refused to prepare
+        self._statements: "OrderedDict[Tuple[str, bool], Optional[PreparedStatement]]" = OrderedDict()
+        self._deallocate: List[str] = []
+        self._names = itertools.count(1)
+
+    def __len__(self) -> int:
+        return len(self._statements)
+
+    def get(self, query: str, params: Params) -> Optional[PreparedStatement]:
+        """Return the statement registered for `query`, or None if it is not preparable"""
+        # without parameters psycopg2 sends the query verbatim, `%` included
+        key = (query, params is None)
+        try:
+            statement = self._statements[key]
+        except KeyError:
+            statement = self._compile(key)
+            self._statements[key] = statement
+            self._evict()
+        else:
+            self._statements.move_to_end(key)
+        if statement is not None:
+            if statement.prepared:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return statement
+
+    def prepare_sql(self, statement: PreparedStatement) -> Tuple[str, bool]:
+        """Build the PREPARE for `statement`, preceded by the pending DEALLOCATEs;
+           also returns whether any were included"""
+        deallocate, self._deallocate = self._deallocate, []
+        commands = [f"DEALLOCATE {name}" for name in deallocate]
+        commands.append(f"PREPARE {statement.name} AS {statement.text}")
+        return "; ".join(commands), bool(deallocate)
+
+    def reject(self, statement: PreparedStatement) -> None:
+        """Remember that the server cannot prepare this query"""
+        if statement.key in self._statements:
+            self._statements[statement.key] = None
+
+    def invalidate(self, statement: PreparedStatement, deallocate: bool) -> None:
+        """Forget the server-side copy of `statement` so it is prepared again on next use"""
+        if deallocate and statement.prepared:
+            self._deallocate.append(statement.name)
+        statement.name = self._next_name()
+        statement.prepared = False
+
+    def stats(self) -> Mapping[str, int]:
+        return {"size": len(self._statements), "hits": self.hits, "misses": self.misses}
+
+    def _next_name(self) -> str:
+        return f"stmt_{next(self._names)}"
+
+    def _compile(self, key: Tuple[str, bool]) -> Optional[PreparedStatement]:
+        query, verbatim = key
+        if not query.lstrip().lower().startswith(_PREPARABLE):
+            return None
+        if verbatim:
+            return PreparedStatement(key, self._next_name(), query, "")
+
+        positional = 0
+        named: "OrderedDict[str, int]" = OrderedDict()
+
+        def to_parameter(match: "re.Match[str]") -> str:
+            nonlocal positional
+            if match.group(0) == "%%":
+                return "%"
+            name = match.group(1)
+            if name is None:
+                positional += 1
+                return f"${positional}"
+            return f"${named.setdefault(name, len(named) + 1)}"
+
+        text = _PLACEHOLDER.sub(to_parameter, query)
+        if positional and named:
+            # psycopg2 rejects the mix, let it raise on the plain query
+            return None
+        if positional:
+            arguments = "(" + ", ".join(["%s"] * positional) + ")"
+        elif named:
+            arguments = "(" + ", ".join(f"%({name})s" for name in named) + ")"
+        else:
+            arguments = ""
+        return PreparedStatement(key, self._next_name(), text, arguments)
+
+    def _evict(self) -> None:
+        while len(self._statements) > self.max_size:
+            _, statement = self._statements.popitem(last=False)
+            if statement is not None and statement.prepared:
+                self._deallocate.append(statement.name)
+
+
 class DatabaseConnection:
     """Database connection class with context manager, rollback on error,
        and RealDictCursor-typing."""
@@ -22,23 +209,126 @@ class DatabaseConnection:
         self,
         conn: Optional[connection] = None,
         dsn: Optional[str] = None,
-        autocommit: bool = False
+        autocommit: bool = False,
+        pool: Optional["DatabaseConnectionPool"] = None,
+        statement_cache_size: int = DEFAULT_STATEMENT_CACHE_SIZE,
     ) -> None:
         self.conn = conn or psycopg2.connect(dsn, cursor_factory=RealDictCursor)
         self.conn.autocommit = autocommit
+        self.pool = pool
+        # lives as long as the underlying connection, across pool checkouts
+        self.statements = PreparedStatementCache(statement_cache_size) if statement_cache_size else None
 
     def __enter__(self) -> "DatabaseConnection":
         return self
 
-    def __exit__(self, exc_type, exc, tb) -> None:
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc: Optional[BaseException],
+        tb: Optional[TracebackType],
+    ) -> None:
         if exc:
-            logger.exception("Exception occurred, rolling back transaction")
+            # GeneratorExit: the rows of `iter_query` were abandoned, nothing failed
+            if not isinstance(exc, GeneratorExit):
+                logger.exception("Exception occurred, rolling back transaction")
             self.conn.rollback()
         else:
             if not self.conn.autocommit:
                 self.conn.commit()
         self.close()
 
+    def _execute(self, cursor: Cursor, query: str, params: Params) -> None:
+        """Run `query` through its prepared statement when it has one"""
+        status = self.conn.get_transaction_status()
+        statements = self.statements
+        statement = None
+        if statements is not None and status != TRANSACTION_STATUS_INERROR:
+            statement = statements.get(query, params)
+        if statement is None:
+            cursor.execute(query, params)
+            return
+        assert statements is not None
+
+        idle = status == TRANSACTION_STATUS_IDLE
+        if not statement.prepared and not self._prepare(cursor, statements, statement, idle):
+            cursor.execute(query, params)
+            return
+        try:
+            cursor.execute(statement.execute_sql, params)
+        except _STALE_STATEMENT_ERRORS as e:
+            # dropped by a session reset, or its plan outdated by a schema change
+            statements.invalidate(statement, deallocate=isinstance(e, errors.FeatureNotSupported))
+            if not idle:
+                raise
+            if not self.conn.autocommit:
+                self.conn.rollback()
+            cursor.execute(query, params)
+
+    def _prepare(
+        self,
+        cursor: Cursor,
+        statements: PreparedStatementCache,
+        statement: PreparedStatement,
+        idle: bool,
+    ) -> bool:
+        command, deallocated = statements.prepare_sql(statement)
+        if not idle:
+            # keep a refused PREPARE from aborting the caller's transaction; the
+            # savepoint goes first on its own as a syntax error skips the whole string
+            cursor.execute("SAVEPOINT prepare_statement")
+            command += "; RELEASE SAVEPOINT prepare_statement"
+        try:
+            cursor.execute(command)
+        except _PREPARE_ERRORS:
+            logger.debug("Could not prepare query, running it unprepared: %s", statement.text, exc_info=True)
+            if not idle:
+                cursor.execute("ROLLBACK TO SAVEPOINT prepare_statement")
+            elif not self.conn.autocommit:
+                self.conn.rollback()
+            if not deallocated:
+                statements.reject(statement)
+            return False
+        statement.prepared = True
+        return True
+
+    def _query(self, operation: str, query: str, params: Params, fetch: Optional[str]) -> Any:
+        """Execute and time a statement, EXPLAINing it when it is slow and profiling is on"""
+        start = time.perf_counter()
+        try:
+            with self.conn.cursor() as cursor:
+                self._execute(cursor, query, params)
+                if fetch == "all":
+                    result = cursor.fetchall()
+                elif fetch == "one":
+                    result = cursor.fetchone()
+                else:
+                    result = None
+        finally:
+            elapsed = time.perf_counter() - start
+            DB_QUERY_SECONDS.observe(elapsed, operation=operation, query=query_fingerprint(query))
+        if PROFILER.should_explain(query, elapsed):
+            self._explain(query, params, elapsed)
+        return result
+
+    def _explain(self, query: str, params: Params, elapsed: float) -> None:
+        # a failing EXPLAIN must not abort the caller's transaction
+        in_transaction = self.conn.get_transaction_status() != TRANSACTION_STATUS_IDLE
+        with self.conn.cursor() as cursor:
+            try:
+                if in_transaction:
+                    cursor.execute("SAVEPOINT explain_query")
+                cursor.execute("EXPLAIN (ANALYZE, BUFFERS) " + query, params)
+                plan = cursor.fetchall()
+                if in_transaction:
+                    cursor.execute("RELEASE SAVEPOINT explain_query")
+            except psycopg2.Error:
+                logger.warning("EXPLAIN of slow query failed: %s", query, exc_info=True)
+                if in_transaction:
+                    cursor.execute("ROLLBACK TO SAVEPOINT explain_query")
+                return
+        log_query_plan(query, elapsed, plan)
+
     def query_all(
         self,
         query: str,
@@ -46,9 +336,7 @@ class DatabaseConnection:
     ) -> List[ResultRow]:
         """Execute a query and return all rows as list of dicts"""
         logger.debug("Executing query_all: %s %s", query, params)
-        with self.conn.cursor() as cursor:
-            cursor.execute(query, params)
-            return cursor.fetchall()
+        return self._query("query_all", query, params, "all")
 
     def query_one(
         self,
@@ -57,9 +345,7 @@ class DatabaseConnection:
     ) -> Optional[ResultRow]:
         """Execute a query and return a single row as dict"""
         logger.debug("Executing query_one: %s %s", query, params)
-        with self.conn.cursor() as cursor:
-            cursor.execute(query, params)
-            return cursor.fetchone()
+        return self._query("query_one", query, params, "one")
 
     def execute(
         self,
@@ -68,13 +354,674 @@ class DatabaseConnection:
     ) -> None:
         """Execute a modifying query (INSERT/UPDATE/DELETE)"""
         logger.debug("Executing execute: %s %s", query, params)
+        self._query("execute", query, params, None)
+
+    def bulk_execute(
+        self,
+        query: str,
+        rows: Iterable[Sequence[Any]],
+        template: Optional[str] = None,
+        page_size: int = 1000,
+        fetch: bool = False
+    ) -> List[ResultRow]:
+        """Execute a multi-row INSERT, `query` holding a single `VALUES %s` placeholder,
+           sending `page_size` rows per statement; returns the RETURNING rows if `fetch`"""
+        logger.debug("Executing bulk_execute: %s", query)
+        with DB_QUERY_SECONDS.time(operation="bulk_execute", query=query_fingerprint(query)):
+            with self.conn.cursor() as cursor:
+                return execute_values(cursor, query, rows, template=template, page_size=page_size, fetch=fetch) or []
+
+    def copy_from(
+        self,
+        table: str,
+        columns: Sequence[str],
+        rows: Iterable[Sequence[Any]]
+    ) -> int:
+        """Load rows with COPY FROM STDIN in CSV format; returns the number of rows copied"""
+        logger.debug("Executing copy_from: %s %s", table, columns)
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write(",".join(_copy_field(value) for value in row))
+            buffer.write("\n")
+        buffer.seek(0)
+        query = sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT csv, NULL '\\N')").format(
+            sql.Identifier(table),
+            sql.SQL(", ").join(sql.Identifier(column) for column in columns),
+        )
         with self.conn.cursor() as cursor:
+            cursor.copy_expert(query, buffer)
+            return cursor.rowcount
+
+    def iter_query(
+        self,
+        query: str,
+        params: Params = None,
+        itersize: int = 2000
+    ) -> Iterator[ResultRow]:
+        """Execute a query through a named server-side cursor and yield rows
+           as they are fetched, `itersize` rows per round-trip"""
+        logger.debug("Executing iter_query: %s %s", query, params)
+        with self.conn.cursor(name=f"iter_{uuid4().hex}") as cursor:
+            cursor.itersize = itersize
             cursor.execute(query, params)
+            yield from cursor
+
+    def is_healthy(self) -> bool:
+        """Check that the connection is open and answers a trivial query"""
+        if self.conn.closed:
+            return False
+        try:
+            with self.conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            if not self.conn.autocommit:
+                self.conn.rollback()
+            return True
+        except psycopg2.Error:
+            logger.warning("Database connection failed health check", exc_info=True)
+            return False
 
     def close(self) -> None:
-        """Close the connection"""
+        """Return the connection to its pool, or close it if it is not pooled"""
+        if self.pool is not None:
+            self.pool.release(self)
+            return
+        self.disconnect()
+
+    def disconnect(self) -> None:
+        """Close the underlying connection"""
         try:
             self.conn.close()
             logger.debug("Database connection closed")
         except Exception:
             logger.exception("Error closing the database connection")
+
+
+class DatabaseConnectionPool:
+    """Thread-safe pool of DatabaseConnection objects with bounded size,
+       checkout timeout and health-check on borrow."""
+
+    def __init__(
+        self,
+        dsn: str,
+        min_size: int = 1,
+        max_size: int = 10,
+        timeout: float = 30.0,
+        health_check: bool = True,
+        autocommit: bool = False,
+        statement_cache_size: int = DEFAULT_STATEMENT_CACHE_SIZE,
+    ) -> None:
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError(f"Invalid pool size: min={min_size} max={max_size}")
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check = health_check
+        self.autocommit = autocommit
+        self.statement_cache_size = statement_cache_size
+
+        self._idle: List[DatabaseConnection] = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._in_use = 0
+        self._closed = False
+
+    def _connect(self) -> DatabaseConnection:
+        return DatabaseConnection(
+            dsn=self.dsn,
+            autocommit=self.autocommit,
+            pool=self,
+            statement_cache_size=self.statement_cache_size,
+        )
+
+    def open(self) -> None:
+        """Open `min_size` connections up front"""
+        with self._lock:
+            missing = self.min_size - len(self._idle) - self._in_use
+        for _ in range(max(missing, 0)):
+            db = self._connect()
+            with self._lock:
+                self._idle.append(db)
+        logger.debug("Database pool opened with %d idle connections", len(self._idle))
+
+    def acquire(self, timeout: Optional[float] = None) -> DatabaseConnection:
+        """Borrow a healthy connection, waiting up to `timeout` seconds for a free slot"""
+        if self._closed:
+            raise PoolTimeoutError("Database pool is closed")
+        wait = self.timeout if timeout is None else timeout
+        if not self._slots.acquire(timeout=wait):
+            raise PoolTimeoutError(f"No database connection available after {wait}s")
+
+        try:
+            while True:
+                with self._lock:
+                    db = self._idle.pop() if self._idle else None
+                if db is None:
+                    db = self._connect()
+                    break
+                if not self.health_check and not db.conn.closed:
+                    break
+                if self.health_check and db.is_healthy():
+                    break
+                db.disconnect()
+        except BaseException:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._in_use += 1
+        return db
+
+    def release(self, db: DatabaseConnection) -> None:
+        """Return a borrowed connection, discarding it if it is broken or the pool is closed"""
+        reusable = not self._closed and not db.conn.closed
+        if reusable and not db.conn.autocommit:
+            try:
+                # never hand out a connection with a dangling transaction
+                db.conn.rollback()
+            except psycopg2.Error:
+                reusable = False
+
+        with self._lock:
+            self._in_use -= 1
+            if reusable:
+                self._idle.append(db)
+        if not reusable:
+            db.disconnect()
+        self._slots.release()
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None) -> Iterator[DatabaseConnection]:
+        """Borrow a connection for the duration of the block, committing on success"""
+        db = self.acquire(timeout)
+        with db:
+            yield db
+
+    def iter_query(
+        self,
+        query: str,
+        params: Params = None,
+        itersize: int = 2000
+    ) -> Iterator[ResultRow]:
+        """Borrow a connection for as long as the rows of a server-side cursor are consumed"""
+        with self.connection() as db:
+            yield from db.iter_query(query, params, itersize)
+
+    def stats(self) -> Mapping[str, int]:
+        with self._lock:
+            return {
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+                "max_size": self.max_size,
+            }
+
+    def close(self) -> None:
+        """Close all idle connections; borrowed ones are closed when released"""
+        self._closed = True
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for db in idle:
+            db.disconnect()
+        logger.debug("Database pool closed")
+
+
+async def _wait_fd(fd: int, writer: bool) -> None:
+    loop = asyncio.get_running_loop()
+    ready = loop.create_future()
+
+    def on_ready() -> None:
+        if not ready.done():
+            ready.set_result(None)
+
+    if writer:
+        loop.add_writer(fd, on_ready)
+    else:
+        loop.add_reader(fd, on_ready)
+    try:
+        await ready
+    finally:
+        if writer:
+            loop.remove_writer(fd)
+        else:
+            loop.remove_reader(fd)
+
+
+async def _wait(conn: connection) -> None:
+    """Drive an asynchronous psycopg2 connection until its pending operation completes"""
+    while True:
+        state = conn.poll()
+        if state == POLL_OK:
+            return
+        if state == POLL_READ:
+            await _wait_fd(conn.fileno(), writer=False)
+        elif state == POLL_WRITE:
+            await _wait_fd(conn.fileno(), writer=True)
+        else:
+            raise psycopg2.OperationalError(f"Unexpected poll state: {state}")
+
+
+class AsyncDatabaseConnection:
+    """Asyncio-native counterpart of DatabaseConnection built on psycopg2's
+       asynchronous mode. Statements run in autocommit mode unless wrapped
+       in `transaction()`."""
+
+    conn: connection
+
+    def __init__(
+        self,
+        conn: connection,
+        pool: Optional["AsyncDatabaseConnectionPool"] = None,
+        statement_cache_size: int = DEFAULT_STATEMENT_CACHE_SIZE,
+    ) -> None:
+        self.conn = conn
+        self.pool = pool
+        self.broken = False
+        self._in_transaction = False
+        # lives as long as the underlying connection, across pool checkouts
+        self.statements = PreparedStatementCache(statement_cache_size) if statement_cache_size else None
+
+    @classmethod
+    async def connect(
+        cls,
+        dsn: str,
+        pool: Optional["AsyncDatabaseConnectionPool"] = None,
+        statement_cache_size: int = DEFAULT_STATEMENT_CACHE_SIZE,
+    ) -> "AsyncDatabaseConnection":
+        conn = psycopg2.connect(dsn, async_=True, cursor_factory=RealDictCursor)
+        try:
+            await _wait(conn)
+        except BaseException:
+            conn.close()
+            raise
+        return cls(conn, pool=pool, statement_cache_size=statement_cache_size)
+
+    @property
+    def in_transaction(self) -> bool:
+        """Whether a `transaction()` block is open on this connection"""
+        return self._in_transaction
+
+    async def __aenter__(self) -> "AsyncDatabaseConnection":
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc: Optional[BaseException],
+        tb: Optional[TracebackType],
+    ) -> None:
+        await self.close()
+
+    async def _execute(self, cursor: Cursor, query: str, params: Params) -> None:
+        """Run `query` through its prepared statement when it has one"""
+        statements = self.statements
+        statement = None
+        if statements is not None and self.conn.get_transaction_status() != TRANSACTION_STATUS_INERROR:
+            statement = statements.get(query, params)
+        if statement is None:
+            cursor.execute(query, params)
+            await _wait(self.conn)
+            return
+        assert statements is not None
+
+        idle = not self._in_transaction
+        if not statement.prepared and not await self._prepare(cursor, statements, statement, idle):
+            cursor.execute(query, params)
+            await _wait(self.conn)
+            return
+        try:
+            cursor.execute(statement.execute_sql, params)
+            await _wait(self.conn)
+        except _STALE_STATEMENT_ERRORS as e:
+            # dropped by a session reset, or its plan outdated by a schema change
+            statements.invalidate(statement, deallocate=isinstance(e, errors.FeatureNotSupported))
+            if not idle:
+                raise
+            cursor.execute(query, params)
+            await _wait(self.conn)
+
+    async def _prepare(
+        self,
+        cursor: Cursor,
+        statements: PreparedStatementCache,
+        statement: PreparedStatement,
+        idle: bool,
+    ) -> bool:
+        command, deallocated = statements.prepare_sql(statement)
+        if not idle:
+            # keep a refused PREPARE from aborting the caller's transaction; the
+            # savepoint goes first on its own as a syntax error skips the whole string
+            cursor.execute("SAVEPOINT prepare_statement")
+            await _wait(self.conn)
+            command += "; RELEASE SAVEPOINT prepare_statement"
+        try:
+            cursor.execute(command)
+            await _wait(self.conn)
+        except _PREPARE_ERRORS:
+            logger.debug("Could not prepare query, running it unprepared: %s", statement.text, exc_info=True)
+            if not idle:
+                cursor.execute("ROLLBACK TO SAVEPOINT prepare_statement")
+                await _wait(self.conn)
+            if not deallocated:
+                statements.reject(statement)
+            return False
+        statement.prepared = True
+        return True
+
+    async def _run(self, query: str, params: Params, fetch: Optional[str], prepare: bool = True) -> Any:
+        cursor = self.conn.cursor()
+        try:
+            if prepare:
+                await self._execute(cursor, query, params)
+            else:
+                cursor.execute(query, params)
+                await _wait(self.conn)
+            if fetch == "all":
+                return cursor.fetchall()
+            if fetch == "one":
+                return cursor.fetchone()
+            return None
+        except asyncio.CancelledError:
+            # the server may still be running the statement: ask it to stop and
+            # never hand this connection out again
+            self.broken = True
+            try:
+                self.conn.cancel()
+            except psycopg2.Error:
+                logger.warning("Failed to cancel running query", exc_info=True)
+            raise
+        except psycopg2.OperationalError:
+            self.broken = True
+            raise
+        finally:
+            cursor.close()
+
+    async def _query(self, operation: str, query: str, params: Params, fetch: Optional[str]) -> Any:
+        """Execute and time a statement, EXPLAINing it when it is slow and profiling is on"""
+        start = time.perf_counter()
+        try:
+            result = await self._run(query, params, fetch)
+        finally:
+            elapsed = time.perf_counter() - start
+            DB_QUERY_SECONDS.observe(elapsed, operation=operation, query=query_fingerprint(query))
+        if PROFILER.should_explain(query, elapsed):
+            await self._explain(query, params, elapsed)
+        return result
+
+    async def _explain(self, query: str, params: Params, elapsed: float) -> None:
+        # a failing EXPLAIN must not abort the caller's transaction
+        in_transaction = self._in_transaction
+        try:
+            if in_transaction:
+                await self._run("SAVEPOINT explain_query", None, None, prepare=False)
+            plan = await self._run("EXPLAIN (ANALYZE, BUFFERS) " + query, params, "all", prepare=False)
+            if in_transaction:
+                await self._run("RELEASE SAVEPOINT explain_query", None, None, prepare=False)
+        except psycopg2.Error:
+            logger.warning("EXPLAIN of slow query failed: %s", query, exc_info=True)
+            if in_transaction and not self.broken:
+                await self._run("ROLLBACK TO SAVEPOINT explain_query", None, None, prepare=False)
+            return
+        log_query_plan(query, elapsed, plan)
+
+    async def query_all(
+        self,
+        query: str,
+        params: Params = None
+    ) -> List[ResultRow]:
+        """Execute a query and return all rows as list of dicts"""
+        logger.debug("Executing query_all: %s %s", query, params)
+        return await self._query("query_all", query, params, "all")
+
+    async def query_one(
+        self,
+        query: str,
+        params: Params = None
+    ) -> Optional[ResultRow]:
+        """Execute a query and return a single row as dict"""
+        logger.debug("Executing query_one: %s %s", query, params)
+        return await self._query("query_one", query, params, "one")
+
+    async def execute(
+        self,
+        query: str,
+        params: Params = None
+    ) -> None:
+        """Execute a modifying query (INSERT/UPDATE/DELETE)"""
+        logger.debug("Executing execute: %s %s", query, params)
+        await self._query("execute", query, params, None)
+
+    async def bulk_execute(
+        self,
+        query: str,
+        rows: Iterable[Sequence[Any]],
+        template: Optional[str] = None,
+        page_size: int = 1000,
+        fetch: bool = False
+    ) -> List[ResultRow]:
+        """Execute a multi-row INSERT, `query` holding a single `VALUES %s` placeholder,
+           sending `page_size` rows per statement; returns the RETURNING rows if `fetch`"""
+        logger.debug("Executing bulk_execute: %s", query)
+        rows = list(rows)
+        if not rows:
+            return []
+        template = template or "(" + ", ".join(["%s"] * len(rows[0])) + ")"
+        encoding = encodings[self.conn.encoding]
+        # execute_values cannot wait on an asynchronous connection, so build
+        # the same statements with client-side mogrify and run them here
+        cursor = self.conn.cursor()
+        try:
+            pages = [
+                b",".join(cursor.mogrify(template, row) for row in rows[start:start + page_size])
+                for start in range(0, len(rows), page_size)
+            ]
+        finally:
+            cursor.close()
+
+        result: List[ResultRow] = []
+        with DB_QUERY_SECONDS.time(operation="bulk_execute", query=query_fingerprint(query)):
+            for values in pages:
+                # the VALUES list differs per page, nothing to gain from preparing it
+                page = await self._run(
+                    query, (AsIs(values.decode(encoding)),), "all" if fetch else None, prepare=False
+                )
+                if fetch:
+                    result.extend(page)
+        return result
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator["AsyncDatabaseConnection"]:
+        """
+        Run the block in a transaction: commit on success, roll back on error
+        or task cancellation.
+        """
+        if self._in_transaction:
+            raise RuntimeError("Nested transactions are not supported")
+        await self._run("BEGIN", None, None, prepare=False)
+        self._in_transaction = True
+        try:
+            yield self
+        except BaseException:
+            await self._rollback()
+            raise
+        else:
+            await self._run("COMMIT", None, None, prepare=False)
+        finally:
+            self._in_transaction = False
+
+    @asynccontextmanager
+    async def savepoint(self, name: str = "block") -> AsyncIterator["AsyncDatabaseConnection"]:
+        """
+        Run the block in a savepoint of the current transaction: an error rolls
+        back only what the block did, and the transaction stays usable.
+        """
+        if not self._in_transaction:
+            raise RuntimeError("Savepoints need a transaction")
+        await self._run(f"SAVEPOINT {name}", None, None, prepare=False)
+        try:
+            yield self
+        except BaseException:
+            if not self.broken and not self.conn.closed:
+                await self._run(f"ROLLBACK TO SAVEPOINT {name}", None, None, prepare=False)
+            raise
+        else:
+            await self._run(f"RELEASE SAVEPOINT {name}", None, None, prepare=False)
+
+    async def _rollback(self) -> None:
+        if self.broken or self.conn.closed:
+            # the server rolls back when the connection is dropped
+            return
+        try:
+            await asyncio.shield(self._run("ROLLBACK", None, None, prepare=False))
+        except (psycopg2.Error, asyncio.CancelledError):
+            logger.exception("Rollback failed, discarding connection")
+            self.broken = True
+
+    async def is_healthy(self) -> bool:
+        """Check that the connection is open and answers a trivial query"""
+        if self.broken or self.conn.closed:
+            return False
+        try:
+            await self._run("SELECT 1", None, None, prepare=False)
+            return True
+        except psycopg2.Error:
+            logger.warning("Database connection failed health check", exc_info=True)
+            return False
+
+    async def close(self) -> None:
+        """Return the connection to its pool, or close it if it is not pooled"""
+        if self.pool is not None:
+            await self.pool.release(self)
+            return
+        self.disconnect()
+
+    def disconnect(self) -> None:
+        """Close the underlying connection"""
+        try:
+            self.conn.close()
+            logger.debug("Database connection closed")
+        except Exception:
+            logger.exception("Error closing the database connection")
+
+
+class AsyncDatabaseConnectionPool:
+    """Asyncio pool of AsyncDatabaseConnection objects with bounded size,
+       checkout timeout and health-check on borrow."""
+
+    def __init__(
+        self,
+        dsn: str,
+        min_size: int = 1,
+        max_size: int = 10,
+        timeout: float = 30.0,
+        health_check: bool = True,
+        statement_cache_size: int = DEFAULT_STATEMENT_CACHE_SIZE,
+    ) -> None:
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError(f"Invalid pool size: min={min_size} max={max_size}")
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check = health_check
+        self.statement_cache_size = statement_cache_size
+
+        self._idle: Deque[AsyncDatabaseConnection] = deque()
+        self._slots = asyncio.Semaphore(max_size)
+        self._in_use = 0
+        self._closed = False
+
+    async def _connect(self) -> AsyncDatabaseConnection:
+        return await AsyncDatabaseConnection.connect(
+            self.dsn, pool=self, statement_cache_size=self.statement_cache_size
+        )
+
+    async def open(self) -> None:
+        """
+        Open connections up front until `min_size` are idle or in use. Safe to run
+        while requests use the pool, which then counts their connections too.
+        """
+        while not self._closed and len(self._idle) + self._in_use < self.min_size:
+            # the pool may be closed while this connects
+            self._keep_idle(await self._connect())
+        logger.debug("Async database pool opened with %d idle connections", len(self._idle))
+
+    async def acquire(self, timeout: Optional[float] = None) -> AsyncDatabaseConnection:
+        """Borrow a healthy connection, waiting up to `timeout` seconds for a free slot"""
+        if self._closed:
+            raise PoolTimeoutError("Database pool is closed")
+        wait = self.timeout if timeout is None else timeout
+        try:
+            await self._acquire_slot(wait)
+        except asyncio.TimeoutError:
+            raise PoolTimeoutError(f"No database connection available after {wait}s")
+
+        try:
+            while True:
+                db = self._idle.popleft() if self._idle else None
+                if db is None:
+                    db = await self._connect()
+                    break
+                if not self.health_check and not db.conn.closed:
+                    break
+                if self.health_check and await db.is_healthy():
+                    break
+                db.disconnect()
+        except BaseException:
+            self._slots.release()
+            raise
+
+        self._in_use += 1
+        return db
+
+    async def _acquire_slot(self, wait: float) -> None:
+        """Take a slot within `wait` seconds; a timeout or cancellation never leaves one taken"""
+        acquire = asyncio.ensure_future(self._slots.acquire())
+        try:
+            # shielded, so the outcome of the acquire is known whatever ends the wait
+            await asyncio.wait_for(asyncio.shield(acquire), wait)
+        except BaseException:
+            if acquire.done() and not acquire.cancelled():
+                # granted as the wait ended; before Python 3.12 wait_for drops the slot
+                self._slots.release()
+            else:
+                acquire.cancel()
+            raise
+
+    async def release(self, db: AsyncDatabaseConnection) -> None:
+        """Return a borrowed connection, discarding it if it is broken or the pool is closed"""
+        self._in_use -= 1
+        if db.broken or db.conn.closed or db.in_transaction:
+            db.disconnect()
+        else:
+            self._keep_idle(db)
+        self._slots.release()
+
+    def _keep_idle(self, db: AsyncDatabaseConnection) -> None:
+        """Keep a connection for reuse, or close it if the pool is closed"""
+        if self._closed:
+            db.disconnect()
+        else:
+            self._idle.append(db)
+
+    @asynccontextmanager
+    async def connection(self, timeout: Optional[float] = None) -> AsyncIterator[AsyncDatabaseConnection]:
+        """Borrow a connection for the duration of the block"""
+        db = await self.acquire(timeout)
+        try:
+            yield db
+        finally:
+            await self.release(db)
+
+    def stats(self) -> Mapping[str, int]:
+        return {
+            "idle": len(self._idle),
+            "in_use": self._in_use,
+            "max_size": self.max_size,
+        }
+
+    async def close(self) -> None:
+        """Close all idle connections; borrowed ones are closed when released"""
+        self._closed = True
+        while self._idle:
+            self._idle.popleft().disconnect()
+        logger.debug("Async database pool closed")
@@ -1,10 +1,95 @@
-from contextlib import asynccontextmanager
-from typing import AsyncIterator, Literal, Optional
+import hmac
+from functools import lru_cache
+from typing import AsyncIterator, Literal, NamedTuple, Optional, Sequence, Tuple
 
 from starlette.requests import Request
-from fastapi import HTTPException, status
+from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
-from src.core.database import DatabaseConnection
+from src.core.batch import DEFAULT_ARCHIVE_LIMITS, ArchiveLimits
+from src.core.cache import EntityCache
+from src.core.compression import ContentCoding, ContentCodings
+from src.core.conversion_cache import ConversionCache
+from src.core.database import (
+    AsyncDatabaseConnection,
+    AsyncDatabaseConnectionPool,
+    DatabaseConnectionPool,
+    PoolTimeoutError,
+)
+from src.core.executor import ConversionExecutor
+from src.core.formats import AVAILABLE_CODECS, RESPONSE_CODEC, Codec, codec_for_media_type
+from src.core.jobs import JobQueue
+from src.core.startup import StartupProfile
+from src.core.xml_parser import DEFAULT_PARSE_OPTIONS, ParseOptions
+
+# auto_error=False: a missing token gets the same 401 as a wrong one
+ADMIN_BEARER = HTTPBearer(auto_error=False)
+
+# media types `get_response_codec` can produce, JSON first so it wins ties and `*/*`
+RESPONSE_MEDIA_TYPES: Tuple[str, ...] = tuple(
+    media_type for codec in AVAILABLE_CODECS for media_type in codec.media_types
+)
+
+
+class MediaRange(NamedTuple):
+    type: str
+    subtype: str
+    q: float
+
+    @property
+    def specificity(self) -> int:
+        # an exact type outranks type/*, which outranks */*
+        return (self.type != "*") + (self.subtype != "*")
+
+    def matches(self, media_type: str) -> bool:
+        type_, _, subtype = media_type.partition("/")
+        return self.type in ("*", type_) and self.subtype in ("*", subtype)
+
+
+@lru_cache(maxsize=256)
+def parse_accept(header: str) -> Tuple[MediaRange, ...]:
+    """
+    Parse an Accept header into media ranges with their q-values.
+    Malformed ranges are skipped and malformed q-values count as 1.
+    """
+    ranges = []
+    for part in header.split(","):
+        media_type, *params = part.split(";")
+        type_, slash, subtype = media_type.strip().lower().partition("/")
+        if not slash or not type_ or not subtype:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = min(max(float(value), 0.0), 1.0)
+                except ValueError:
+                    pass
+        ranges.append(MediaRange(type_, subtype, q))
+    return tuple(ranges)
+
+
+def negotiate(accept: Optional[str], offers: Sequence[str]) -> Optional[str]:
+    """
+    Return the offered media type the client prefers, or None when it accepts none of them.
+
+    Each offer takes the q-value of the most specific range matching it; among
+    offers with the same q-value, the earlier offer wins. A missing or empty
+    Accept header accepts anything, so the first offer is returned.
+    """
+    ranges = parse_accept(accept) if accept else ()
+    if not ranges:
+        return offers[0] if offers else None
+    best, best_q = None, 0.0
+    for offer in offers:
+        matching = [r for r in ranges if r.matches(offer)]
+        if not matching:
+            continue
+        q = max(matching, key=lambda r: (r.specificity, r.q)).q
+        if q > best_q:
+            best, best_q = offer, q
+    return best
 
 
 async def get_accept_request_header(request: Request) -> Literal["*/*"] | str:
@@ -14,18 +99,135 @@ async def get_accept_request_header(request: Request) -> Literal["*/*"] | str:
     return request.headers.get("accept", "*/*")
 
 
-@asynccontextmanager
-async def get_db_connection(request: Request) -> AsyncIterator[DatabaseConnection]:
+async def get_response_codec(request: Request) -> Codec:
+    """
+    Negotiate the body format of the response from the Accept header and make
+    `success_response` and `error_response` use it for the rest of the request.
+    Falls back to JSON when the client accepts none of the formats.
+    """
+    media_type = negotiate(request.headers.get("accept"), RESPONSE_MEDIA_TYPES)
+    codec = codec_for_media_type(media_type or RESPONSE_MEDIA_TYPES[0])
+    RESPONSE_CODEC.set(codec)
+    return codec
+
+
+async def get_conversion_executor(request: Request) -> ConversionExecutor:
+    """
+    Return the executor used to offload XML/JSON conversions.
+    """
+    return request.app.state.executor
+
+
+async def get_entity_cache(request: Request) -> EntityCache:
+    """
+    Return the read-through cache for entity lookups.
+    """
+    return request.app.state.cache
+
+
+async def get_conversion_cache(request: Request) -> Optional[ConversionCache]:
+    """
+    Return the cache of conversion results, or None when it is disabled.
+    """
+    return getattr(request.app.state, "conversion_cache", None)
+
+
+async def get_content_coding(request: Request) -> Optional[ContentCoding]:
+    """
+    Return the content coding negotiated from the Accept-Encoding header for bodies
+    compressed up front, or None when compression is disabled or nothing is accepted.
+    """
+    codings: Optional[ContentCodings] = getattr(request.app.state, "content_codings", None)
+    if codings is None:
+        return None
+    return codings.negotiate(request.headers.get("accept-encoding"))
+
+
+async def get_parse_options(request: Request) -> ParseOptions:
     """
-    Yield a per-request database connection, and close it on teardown.
+    Return the validation and limits applied to uploaded XML.
     """
-    db: Optional[DatabaseConnection] = request.app.state.db_connection
-    if db is None:
+    return getattr(request.app.state, "parse_options", DEFAULT_PARSE_OPTIONS)
+
+
+async def get_archive_limits(request: Request) -> ArchiveLimits:
+    """
+    Return the bounds on what uploaded batch archives may expand to.
+    """
+    return getattr(request.app.state, "archive_limits", DEFAULT_ARCHIVE_LIMITS)
+
+
+async def get_job_queue(request: Request) -> JobQueue:
+    """
+    Return the queue of background conversion jobs; 404 when jobs are disabled.
+    """
+    jobs = getattr(request.app.state, "job_queue", None)
+    if jobs is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Conversion jobs are disabled")
+    return jobs
+
+
+async def require_admin_token(
+    request: Request,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(ADMIN_BEARER),
+) -> None:
+    """
+    Let a request through only with the configured admin bearer token; 404 when none is configured.
+    """
+    token: Optional[str] = getattr(request.app.state, "admin_token", None)
+    if token is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Admin endpoints are disabled")
+    if credentials is None or not hmac.compare_digest(credentials.credentials.encode(), token.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or missing admin token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+async def get_startup_profile(request: Request) -> StartupProfile:
+    """
+    Return how long this worker's start-up phases took; 404 before it has started.
+    """
+    profile = getattr(request.app.state, "startup_profile", None)
+    if profile is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No start-up profile recorded")
+    return profile
+
+
+async def get_db_connection(request: Request) -> AsyncIterator[AsyncDatabaseConnection]:
+    """
+    Yield a pooled asynchronous database connection, and return it to the pool on teardown.
+    Statements autocommit; use `db.transaction()` to group writes.
+    """
+    pool: Optional[AsyncDatabaseConnectionPool] = getattr(request.app.state, "db_pool", None)
+    if pool is None:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="Database connection not initialized"
         )
+    try:
+        db = await pool.acquire()
+    except PoolTimeoutError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e)
+        )
     try:
         yield db
     finally:
-        db.close()
+        await db.close()
+
+
+async def get_sync_db_pool(request: Request) -> DatabaseConnectionPool:
+    """
+    Return the blocking connection pool, for psycopg2 features the asynchronous
+    connections lack (server-side cursors, COPY). Use it from worker threads only.
+    """
+    pool: Optional[DatabaseConnectionPool] = getattr(request.app.state, "sync_db_pool", None)
+    if pool is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Database connection not initialized"
+        )
+    return pool
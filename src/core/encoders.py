@@ -0,0 +1,29 @@
+from decimal import Decimal
+from typing import Any
+
+import orjson
+from pydantic import BaseModel
+
+# UUID, datetime/date/time, enums and dict subclasses such as psycopg2's
+# RealDictRow are serialized natively by orjson
+JSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj: Any) -> Any:
+    """Encode the types orjson does not handle, the way `jsonable_encoder` does."""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, BaseModel):
+        return obj.dict()
+    if isinstance(obj, bytes):
+        return obj.decode()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def json_dumps(obj: Any) -> bytes:
+    """
+    Serialize `obj` straight to compact UTF-8 JSON bytes in a single pass.
+    """
+    return orjson.dumps(obj, default=_default, option=JSON_OPTIONS)
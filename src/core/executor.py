@@ -0,0 +1,139 @@
+import asyncio
+import logging
+import mmap
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from enum import Enum
+from functools import partial
+from typing import Any, Callable, Optional, TypeVar
+
+from src.config.settings import ExecutorSettings
+from src.core.metrics import CONVERSION_SECONDS
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class ExecutorRejectedError(Exception):
+    """Raised when the conversion queue is full."""
+    pass
+
+
+class ExecutionTier(str, Enum):
+    INLINE = "inline"
+    THREAD = "thread"
+    PROCESS = "process"
+
+
+class ConversionExecutor:
+    """
+    Run CPU-heavy conversions by input size: small inputs inline on the event loop,
+    medium ones in a thread pool (lxml releases the GIL while parsing and serializing)
+    and large ones in a process pool, where the Python-level tree walk does not
+    compete with the event loop for the GIL.
+
+    At most `max_pending` offloaded jobs are queued or running at once; further
+    submissions wait up to `queue_timeout` seconds and are then rejected.
+    """
+
+    def __init__(
+        self,
+        inline_max_bytes: int = 256 * 1024,
+        process_min_bytes: int = 4 * 1024 * 1024,
+        thread_workers: int = 4,
+        process_workers: int = 2,
+        max_pending: int = 32,
+        queue_timeout: float = 0.0,
+    ) -> None:
+        self.inline_max_bytes = inline_max_bytes
+        self.process_min_bytes = process_min_bytes
+        self.thread_workers = thread_workers
+        self.process_workers = process_workers
+        self.max_pending = max_pending
+        self.queue_timeout = queue_timeout
+
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._slots = asyncio.Semaphore(max_pending)
+        self.pending = 0
+        self.rejected = 0
+
+    @classmethod
+    def from_settings(cls, settings: ExecutorSettings) -> "ConversionExecutor":
+        return cls(
+            inline_max_bytes=settings.inline_max_bytes,
+            process_min_bytes=settings.process_min_bytes,
+            thread_workers=settings.thread_workers,
+            process_workers=settings.process_workers,
+            max_pending=settings.max_pending,
+            queue_timeout=settings.queue_timeout,
+        )
+
+    def tier_for(self, size: int) -> ExecutionTier:
+        if size <= self.inline_max_bytes:
+            return ExecutionTier.INLINE
+        if self.process_workers > 0 and size >= self.process_min_bytes:
+            return ExecutionTier.PROCESS
+        return ExecutionTier.THREAD
+
+    def _get_pool(self, tier: ExecutionTier) -> Executor:
+        # pools are created on first use so short-lived workers never spawn processes
+        if tier is ExecutionTier.PROCESS:
+            if self._process_pool is None:
+                self._process_pool = ProcessPoolExecutor(
+                    max_workers=self.process_workers,
+                    # forking a process that already runs threads can deadlock
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._process_pool
+        if self._thread_pool is None:
+            self._thread_pool = ThreadPoolExecutor(
+                max_workers=self.thread_workers,
+                thread_name_prefix="conversion",
+            )
+        return self._thread_pool
+
+    async def _acquire_slot(self) -> None:
+        if self.queue_timeout <= 0:
+            if self._slots.locked():
+                self.rejected += 1
+                raise ExecutorRejectedError("Conversion queue is full")
+            await self._slots.acquire()
+            return
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise ExecutorRejectedError(f"Conversion queue is still full after {self.queue_timeout}s")
+
+    async def run(self, func: Callable[..., T], *args: Any, size: int) -> T:
+        """
+        Call `func(*args)` in the tier chosen for an input of `size` bytes.
+        `func` and its arguments must be picklable to be sent to the process pool;
+        calls passing memory maps or memoryviews run in the thread pool instead,
+        as sending them would copy the whole buffer.
+        """
+        tier = self.tier_for(size)
+        if tier is ExecutionTier.PROCESS and any(isinstance(arg, (mmap.mmap, memoryview)) for arg in args):
+            tier = ExecutionTier.THREAD
+        if tier is ExecutionTier.INLINE:
+            return func(*args)
+
+        with CONVERSION_SECONDS.time(tier=tier.value):
+            await self._acquire_slot()
+            self.pending += 1
+            try:
+                logger.debug("Offloading %s (%d bytes) to %s pool", func.__qualname__, size, tier.value)
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self._get_pool(tier), partial(func, *args))
+            finally:
+                self.pending -= 1
+                self._slots.release()
+
+    def shutdown(self) -> None:
+        for pool in (self._thread_pool, self._process_pool):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        self._thread_pool = None
+        self._process_pool = None
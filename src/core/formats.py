@@ -0,0 +1,206 @@
+"""
+Body formats the API speaks besides JSON: MessagePack and CBOR.
+
+Each format is a Codec keyed by its media types. MessagePack needs the
+`msgpack` package and CBOR the `cbor2` package; a format whose package is
+missing is not offered in content negotiation, and request bodies in it are
+answered with 415 Unsupported Media Type.
+"""
+import datetime
+import mmap
+import uuid
+from contextvars import ContextVar
+from decimal import Decimal
+from enum import Enum
+from types import ModuleType
+from typing import Any, Callable, Coroutine, Dict, NamedTuple, Optional, Tuple
+
+import orjson
+from fastapi import HTTPException, status
+from fastapi.routing import APIRoute
+from pydantic import BaseModel
+from starlette.requests import Request
+from starlette.responses import Response
+
+from src.core.encoders import json_dumps
+from src.core.xml_parser import BytesLike
+
+# the modules themselves are only used once their codec is known to be available
+msgpack: Optional[ModuleType]
+try:
+    import msgpack as _msgpack
+except ImportError:
+    msgpack = None
+else:
+    msgpack = _msgpack
+
+cbor2: Optional[ModuleType]
+try:
+    import cbor2 as _cbor2
+except ImportError:
+    cbor2 = None
+else:
+    cbor2 = _cbor2
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+CBOR_MEDIA_TYPES = ("application/cbor",)
+
+
+class Codec(NamedTuple):
+    name: str
+    # the first media type is the one responses are labelled with
+    media_types: Tuple[str, ...]
+    dumps: Callable[[Any], bytes]
+    loads: Callable[[BytesLike], Any]
+
+    @property
+    def media_type(self) -> str:
+        return self.media_types[0]
+
+
+class UnsupportedMediaTypeError(LookupError):
+    """Raised for a known binary media type whose codec package is not installed."""
+    pass
+
+
+def _msgpack_default(obj: Any) -> Any:
+    """Encode the types MessagePack has no representation for as their JSON counterparts."""
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, Enum):
+        return obj.value
+    if isinstance(obj, BaseModel):
+        return obj.dict()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not MessagePack serializable")
+
+
+def _cbor_default(encoder: Any, obj: Any) -> None:
+    """Encode the types cbor2 does not handle; UUID, datetime and Decimal have CBOR tags."""
+    if isinstance(obj, Enum):
+        encoder.encode(obj.value)
+    elif isinstance(obj, BaseModel):
+        encoder.encode(obj.dict())
+    else:
+        raise TypeError(f"Object of type {type(obj).__name__} is not CBOR serializable")
+
+
+def _json_loads(data: BytesLike) -> Any:
+    if isinstance(data, mmap.mmap):
+        # orjson reads memoryviews, not memory maps, without copying them
+        with memoryview(data) as view:
+            return orjson.loads(view)
+    return orjson.loads(data)
+
+
+def _msgpack_dumps(obj: Any) -> bytes:
+    return _msgpack.packb(obj, default=_msgpack_default)
+
+
+def _msgpack_loads(data: BytesLike) -> Any:
+    return _msgpack.unpackb(data)
+
+
+def _cbor_dumps(obj: Any) -> bytes:
+    # psycopg2 returns naive datetimes for `timestamp` columns
+    return _cbor2.dumps(obj, default=_cbor_default, timezone=datetime.timezone.utc)
+
+
+def _cbor_loads(data: BytesLike) -> Any:
+    return _cbor2.loads(data)
+
+
+JSON_CODEC = Codec("json", (JSON_MEDIA_TYPE,), json_dumps, _json_loads)
+MSGPACK_CODEC = Codec("msgpack", MSGPACK_MEDIA_TYPES, _msgpack_dumps, _msgpack_loads)
+CBOR_CODEC = Codec("cbor", CBOR_MEDIA_TYPES, _cbor_dumps, _cbor_loads)
+
+# codecs whose package is installed, in the server's order of preference
+AVAILABLE_CODECS: Tuple[Codec, ...] = tuple(
+    codec for codec, available in (
+        (JSON_CODEC, True),
+        (MSGPACK_CODEC, msgpack is not None),
+        (CBOR_CODEC, cbor2 is not None),
+    )
+    if available
+)
+
+_CODECS_BY_MEDIA_TYPE: Dict[str, Codec] = {
+    media_type: codec for codec in AVAILABLE_CODECS for media_type in codec.media_types
+}
+_UNAVAILABLE_MEDIA_TYPES = frozenset(
+    media_type
+    for codec in (MSGPACK_CODEC, CBOR_CODEC) if codec not in AVAILABLE_CODECS
+    for media_type in codec.media_types
+)
+
+# set per request by `get_response_codec`; read by `success_response` and `error_response`
+RESPONSE_CODEC: ContextVar[Codec] = ContextVar("response_codec", default=JSON_CODEC)
+
+
+def media_type_of(content_type: Optional[str]) -> str:
+    """Return the lowercased media type of a Content-Type header, without parameters."""
+    return (content_type or "").split(";", 1)[0].strip().lower()
+
+
+def codec_for(content_type: Optional[str]) -> Optional[Codec]:
+    """
+    Return the codec for a Content-Type header, or None when it is not a format of this module.
+    """
+    media_type = media_type_of(content_type)
+    if media_type in _UNAVAILABLE_MEDIA_TYPES:
+        raise UnsupportedMediaTypeError(f"'{media_type}' bodies are not supported by this server")
+    return _CODECS_BY_MEDIA_TYPE.get(media_type)
+
+
+def codec_for_media_type(media_type: str) -> Codec:
+    """Return the available codec producing `media_type`, as chosen by content negotiation."""
+    return _CODECS_BY_MEDIA_TYPE[media_type]
+
+
+class CodecRoute(APIRoute):
+    """
+    APIRoute that accepts MessagePack and CBOR bodies for its body model.
+
+    The body is decoded here and handed to FastAPI as already-parsed JSON, so
+    validation runs on the decoded document without re-encoding it.
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+        if self.body_field is None:
+            return handler
+
+        async def route_handler(request: Request) -> Response:
+            try:
+                codec = codec_for(request.headers.get("content-type"))
+            except UnsupportedMediaTypeError as e:
+                raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail=str(e))
+            if codec is None or codec is JSON_CODEC:
+                return await handler(request)
+
+            body = await request.body()
+            if not body:
+                return await handler(request)
+            try:
+                document = codec.loads(body)
+            except (ValueError, TypeError):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST, detail="There was an error parsing the body"
+                )
+
+            scope = dict(request.scope)
+            scope["headers"] = [
+                (name, value) for name, value in request.scope["headers"] if name != b"content-type"
+            ] + [(b"content-type", JSON_MEDIA_TYPE.encode())]
+            decoded = Request(scope, request.receive)
+            decoded._body = body
+            decoded._json = document
+            return await handler(decoded)
+
+        return route_handler
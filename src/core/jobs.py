@@ -0,0 +1,344 @@
+"""
+Background conversion jobs.
+
+A job is submitted with its uploaded input, which is copied to the job
+directory, and answered with a job id right away. A bounded pool of workers
+runs the conversions in threads and writes each result next to its input;
+clients poll the job for its progress and fetch or stream the result once it
+has succeeded. Finished jobs and their files are removed `ttl` seconds later.
+
+The job index lives in the memory of the worker process that accepted a job,
+so a job id is only valid on that worker: behind a load balancer spreading
+requests over several workers, jobs need sticky routing.
+"""
+import asyncio
+import datetime
+import logging
+import mmap
+import os
+import shutil
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+from typing import Any, Callable, Dict, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import UploadFile
+
+from src.config.settings import JobSettings
+
+logger = logging.getLogger(__name__)
+
+COPY_CHUNK_SIZE = 1024 * 1024
+# files other queues wrote more recently than this are never taken as left over, however short the ttl
+STALE_MIN_AGE = 3600.0
+
+# (input buffer, progress callback taking the finished fraction) -> result body
+Conversion = Callable[[Any, Callable[[float], None]], bytes]
+
+
+class JobQueueFullError(Exception):
+    """Raised when the job queue already holds `max_queued` jobs."""
+    pass
+
+
+class JobCancelledError(Exception):
+    """Raised from the progress callback of a job that was cancelled while running."""
+    pass
+
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+FINISHED_STATUSES = (JobStatus.SUCCEEDED, JobStatus.FAILED, JobStatus.CANCELLED)
+
+
+class Job:
+    """One conversion job; workers update it in place."""
+
+    __slots__ = (
+        "id", "operation", "media_type", "convert", "status", "progress", "error",
+        "result_bytes", "created_at", "finished_at", "expires_at", "cancel_requested",
+    )
+
+    def __init__(self, operation: str, media_type: str, convert: Conversion) -> None:
+        self.id = uuid.uuid4().hex
+        self.operation = operation
+        self.media_type = media_type
+        self.convert = convert
+        self.status = JobStatus.QUEUED
+        self.progress = 0.0
+        self.error: Optional[str] = None
+        self.result_bytes: Optional[int] = None
+        self.created_at = datetime.datetime.now(datetime.timezone.utc)
+        self.finished_at: Optional[datetime.datetime] = None
+        # time.monotonic() after which a finished job is removed
+        self.expires_at: Optional[float] = None
+        self.cancel_requested = False
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATUSES
+
+    def report(self, progress: float) -> None:
+        """Progress callback of the conversion; aborts it once the job is cancelled."""
+        if self.cancel_requested:
+            raise JobCancelledError(f"Job {self.id} was cancelled")
+        self.progress = min(max(progress, 0.0), 1.0)
+
+    def finish(self, status: JobStatus, ttl: float, error: Optional[str] = None) -> None:
+        self.status = status
+        self.error = error
+        self.finished_at = datetime.datetime.now(datetime.timezone.utc)
+        self.expires_at = time.monotonic() + ttl
+        if status is JobStatus.SUCCEEDED:
+            self.progress = 1.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "operation": self.operation,
+            "status": self.status.value,
+            "progress": round(self.progress, 4),
+            "media_type": self.media_type,
+            "result_bytes": self.result_bytes,
+            "error": self.error,
+            "created_at": self.created_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at is not None else None,
+        }
+
+
+class JobQueue:
+    """
+    Jobs waiting for, or run by, `workers` worker threads.
+
+    At most `max_queued` jobs wait at once; further submissions raise
+    JobQueueFullError. Each queue keeps its files in a subdirectory of its own
+    under `directory`, which several worker processes may share; on start,
+    files other queues left there more than `ttl` seconds ago (and at least
+    STALE_MIN_AGE) are removed.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        workers: int = 2,
+        max_queued: int = 16,
+        ttl: float = 3600.0,
+        cleanup_interval: float = 60.0,
+    ) -> None:
+        self.root = directory
+        # unique per queue, so workers sharing `directory` never touch each other's files
+        self.directory = os.path.join(directory, f"{os.getpid()}-{uuid.uuid4().hex[:8]}")
+        self.workers = workers
+        self.max_queued = max_queued
+        self.ttl = ttl
+        self.cleanup_interval = cleanup_interval
+        self.rejected = 0
+
+        self._jobs: Dict[str, Job] = {}
+        self._queue: "asyncio.Queue[Job]" = asyncio.Queue()
+        # queued jobs, counted before their input is written so concurrent submissions cannot overshoot
+        self._queued = 0
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._tasks: List["asyncio.Task[None]"] = []
+
+    @classmethod
+    def from_settings(cls, settings: JobSettings) -> Optional["JobQueue"]:
+        if not settings.enabled:
+            return None
+        return cls(
+            directory=settings.directory,
+            workers=settings.workers,
+            max_queued=settings.max_queued,
+            ttl=settings.ttl,
+            cleanup_interval=settings.cleanup_interval,
+        )
+
+    def _path(self, job_id: str, suffix: str) -> str:
+        return os.path.join(self.directory, f"{job_id}.{suffix}")
+
+    def _remove_files(self, job_id: str) -> None:
+        for suffix in ("input", "result"):
+            try:
+                os.remove(self._path(job_id, suffix))
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def _remove_stale_files(directory: str, cutoff: float) -> None:
+        for entry in os.scandir(directory):
+            if entry.is_file() and entry.name.endswith((".input", ".result", ".tmp")):
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+
+    def _remove_stale(self) -> None:
+        """Remove the files other queues left in `root` long ago, and their directories once unused."""
+        cutoff = time.time() - max(self.ttl, STALE_MIN_AGE)
+        for directory in os.scandir(self.root):
+            if not directory.is_dir() or directory.path == self.directory:
+                continue
+            try:
+                # a directory's mtime changes with every file written to or removed from it
+                unused = directory.stat().st_mtime < cutoff
+                self._remove_stale_files(directory.path, cutoff)
+                if unused:
+                    os.rmdir(directory.path)
+            except OSError:
+                # still in use, or cleaned up by another queue starting at the same time
+                pass
+
+    async def start(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        self._remove_stale()
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job")
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._cleanup()))
+
+    async def stop(self) -> None:
+        for job in self._jobs.values():
+            job.cancel_requested = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        # the job index goes with this process, so its files can go too
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    async def submit(self, upload: UploadFile, operation: str, media_type: str, convert: Conversion) -> Job:
+        """
+        Queue `convert` over the content of `upload` and return the job;
+        its result is sent as `media_type`.
+        """
+        if self._queued >= self.max_queued:
+            self.rejected += 1
+            raise JobQueueFullError(f"Job queue is full ({self.max_queued} jobs waiting)")
+        self._queued += 1
+
+        job = Job(operation, media_type, convert)
+        try:
+            # removed by another worker's start-up after a long idle spell
+            os.makedirs(self.directory, exist_ok=True)
+            await upload.seek(0)
+            with open(self._path(job.id, "input"), "wb") as fp:
+                await run_in_threadpool(shutil.copyfileobj, upload.file, fp, COPY_CHUNK_SIZE)
+        except BaseException:
+            self._queued -= 1
+            self._remove_files(job.id)
+            raise
+
+        self._jobs[job.id] = job
+        self._queue.put_nowait(job)
+        return job
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """
+        Cancel a queued or running job, or remove a finished one and its result.
+        A running job stops at its next progress report.
+        """
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        if job.status is JobStatus.QUEUED:
+            # left in the queue; the worker that takes it skips it
+            self._queued -= 1
+            job.finish(JobStatus.CANCELLED, self.ttl)
+            self._remove_files(job.id)
+        elif job.status is JobStatus.RUNNING:
+            job.cancel_requested = True
+        else:
+            del self._jobs[job.id]
+            self._remove_files(job.id)
+        return job
+
+    def open_result(self, job: Job) -> Optional[mmap.mmap]:
+        """Return the result of a succeeded job as a memory map, None when it is empty or gone."""
+        try:
+            with open(self._path(job.id, "result"), "rb") as fp:
+                return mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _run(self, job: Job) -> int:
+        with open(self._path(job.id, "input"), "rb") as fp:
+            size = os.fstat(fp.fileno()).st_size
+            source = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        try:
+            result = job.convert(source, job.report)
+        finally:
+            if isinstance(source, mmap.mmap):
+                source.close()
+
+        path = self._path(job.id, "result")
+        with open(f"{path}.tmp", "wb") as fp:
+            fp.write(result)
+        os.replace(f"{path}.tmp", path)
+        return len(result)
+
+    async def _work(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self._queue.get()
+            if job.status is not JobStatus.QUEUED:
+                continue
+            self._queued -= 1
+
+            job.status = JobStatus.RUNNING
+            try:
+                job.result_bytes = await loop.run_in_executor(self._pool, self._run, job)
+            except JobCancelledError:
+                job.finish(JobStatus.CANCELLED, self.ttl)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Conversion job %s failed: %s", job.id, e)
+                job.finish(JobStatus.FAILED, self.ttl, error=str(e))
+            else:
+                if job.cancel_requested:
+                    # cancelled after its last progress report; its result is removed below
+                    job.result_bytes = None
+                    job.finish(JobStatus.CANCELLED, self.ttl)
+                else:
+                    job.finish(JobStatus.SUCCEEDED, self.ttl)
+            finally:
+                try:
+                    os.remove(self._path(job.id, "input"))
+                except FileNotFoundError:
+                    pass
+            if job.status is JobStatus.CANCELLED:
+                self._remove_files(job.id)
+
+    def expire(self) -> int:
+        """Remove finished jobs past their TTL and their files; return how many."""
+        now = time.monotonic()
+        expired = [job for job in self._jobs.values() if job.expires_at is not None and job.expires_at <= now]
+        for job in expired:
+            del self._jobs[job.id]
+            self._remove_files(job.id)
+        return len(expired)
+
+    async def _cleanup(self) -> None:
+        while True:
+            await asyncio.sleep(self.cleanup_interval)
+            try:
+                self.expire()
+            except OSError as e:
+                logger.warning("Conversion job cleanup failed: %s", e)
+
+    def stats(self) -> Dict[str, Any]:
+        counts = {status.value: 0 for status in JobStatus}
+        for job in self._jobs.values():
+            counts[job.status.value] += 1
+        return {"jobs": counts, "rejected": self.rejected}
@@ -0,0 +1,48 @@
+"""
+Modules imported on first use.
+
+Heavy optional subsystems, such as lxml for the XML converter, are only
+needed by some requests; a LazyModule stands in for the module at import
+time and imports it the first time one of its attributes is read, so
+workers that never convert XML never pay for it.
+"""
+import importlib
+import threading
+from types import ModuleType
+from typing import Any, Optional
+
+
+class LazyModule:
+    """Proxy importing `name` on first attribute access."""
+
+    def __init__(self, name: str) -> None:
+        self.__name = name
+        self.__module: Optional[ModuleType] = None
+        self.__lock = threading.Lock()
+
+    def load(self) -> ModuleType:
+        """Import the module now, if it is not yet, and return it."""
+        module = self.__module
+        if module is None:
+            with self.__lock:
+                if self.__module is None:
+                    self.__module = importlib.import_module(self.__name)
+                module = self.__module
+        return module
+
+    @property
+    def loaded(self) -> bool:
+        return self.__module is not None
+
+    def __getattr__(self, attr: str) -> Any:
+        if attr.startswith("_LazyModule__"):
+            # the proxy's own state, missing while it is copied or unpickled
+            raise AttributeError(attr)
+        value = getattr(self.load(), attr)
+        # found on the instance from now on, without going through __getattr__
+        setattr(self, attr, value)
+        return value
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.loaded else "not loaded"
+        return f"<LazyModule {self.__name!r} ({state})>"
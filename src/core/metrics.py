@@ -0,0 +1,422 @@
+import functools
+import itertools
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import (
+    Any, Callable, Dict, Iterable, Iterator, List, Mapping, NamedTuple, Optional, Sequence, Tuple, TypeVar
+)
+
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+T = TypeVar("T")
+M = TypeVar("M", bound="_Metric")
+
+# seconds; fine-grained at the low end where DB lookups and small conversions land
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+FINGERPRINT_MAX_LENGTH = 160
+
+# starlette appends the charset to text/* media types
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+LabelValues = Tuple[str, ...]
+
+
+class Sample(NamedTuple):
+    suffix: str
+    labels: Dict[str, str]
+    value: float
+
+
+class MetricFamily(NamedTuple):
+    name: str
+    kind: str
+    help: str
+    samples: List[Sample]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels.items()) + "}"
+
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: LabelValues) -> Dict[str, str]:
+        return dict(zip(self.labelnames, key))
+
+    @abstractmethod
+    def collect(self) -> MetricFamily:
+        """Return the current samples of every label set."""
+
+
+class Counter(_Metric):
+    """Monotonically increasing value per label set"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def collect(self) -> MetricFamily:
+        with self._lock:
+            values = list(self._values.items())
+        # the text format types the sample name, so the family carries the suffix too
+        return MetricFamily(
+            f"{self.name}_total", self.kind, self.help,
+            [Sample("", self._labels(key), value) for key, value in values],
+        )
+
+
+class Gauge(_Metric):
+    """Value per label set that can go up and down"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+    def collect(self) -> MetricFamily:
+        with self._lock:
+            values = list(self._values.items())
+        return MetricFamily(
+            self.name, self.kind, self.help,
+            [Sample("", self._labels(key), value) for key, value in values],
+        )
+
+
+class Histogram(_Metric):
+    """Distribution of observed values per label set, in cumulative buckets"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [per-bucket counts..., overflow count], sum
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            entry[0][index] += 1
+            entry[1][0] += value
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        """Observe the wall-clock duration of the block, also when it raises"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def timed(self, **labels: Any) -> Callable[[Callable[..., T]], Callable[..., T]]:
+        """Decorator observing the duration of every call"""
+        def decorator(func: Callable[..., T]) -> Callable[..., T]:
+            @functools.wraps(func)
+            def wrapper(*args: Any, **kwargs: Any) -> T:
+                with self.time(**labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def collect(self) -> MetricFamily:
+        with self._lock:
+            values = [(key, list(counts), total[0]) for key, (counts, total) in self._values.items()]
+        samples: List[Sample] = []
+        for key, counts, total in values:
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                samples.append(Sample("_bucket", {**labels, "le": _format_value(bound)}, cumulative))
+            samples.append(Sample("_sum", labels, total))
+            samples.append(Sample("_count", labels, cumulative))
+        return MetricFamily(self.name, self.kind, self.help, samples)
+
+
+class MetricsRegistry:
+    """Holds the process metrics and renders them in the Prometheus text format."""
+
+    def __init__(self) -> None:
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: M) -> M:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def collect(self) -> Iterator[MetricFamily]:
+        for metric in self._metrics:
+            yield metric.collect()
+
+    def render(self, extra: Iterable[MetricFamily] = ()) -> str:
+        """Render all metrics, followed by `extra` families read at scrape time"""
+        lines: List[str] = []
+        for family in itertools.chain(self.collect(), extra):
+            lines.append(f"# HELP {family.name} {_escape(family.help)}")
+            lines.append(f"# TYPE {family.name} {family.kind}")
+            for sample in family.samples:
+                lines.append(
+                    f"{family.name}{sample.suffix}{_format_labels(sample.labels)} {_format_value(sample.value)}"
+                )
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ("method", "route", "status"),
+)
+HTTP_REQUESTS_IN_FLIGHT = REGISTRY.gauge(
+    "http_requests_in_flight",
+    "HTTP requests currently being served",
+)
+DB_QUERY_SECONDS = REGISTRY.histogram(
+    "db_query_duration_seconds",
+    "Database statement latency by operation and query fingerprint",
+    ("operation", "query"),
+)
+XML_PARSER_SECONDS = REGISTRY.histogram(
+    "xml_parser_duration_seconds",
+    "XMLParser parse and serialize time by operation",
+    ("operation",),
+)
+CONVERSION_SECONDS = REGISTRY.histogram(
+    "conversion_duration_seconds",
+    "Offloaded conversion latency, queueing included, by execution tier",
+    ("tier",),
+)
+RESPONSE_ENCODE_SECONDS = REGISTRY.histogram(
+    "response_encode_duration_seconds",
+    "JSON response body encoding time",
+)
+
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"(?<![\w$])-?\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s|\$\d+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@functools.lru_cache(maxsize=1024)
+def query_fingerprint(query: str) -> str:
+    """
+    Normalize a statement into a low-cardinality label: literals and
+    placeholders become `?`, whitespace is collapsed and the result is
+    truncated to FINGERPRINT_MAX_LENGTH characters.
+    """
+    fingerprint = _STRING_LITERAL.sub("?", query)
+    fingerprint = _PLACEHOLDER.sub("?", fingerprint)
+    fingerprint = _NUMBER_LITERAL.sub("?", fingerprint)
+    fingerprint = _WHITESPACE.sub(" ", fingerprint).strip()
+    if len(fingerprint) > FINGERPRINT_MAX_LENGTH:
+        fingerprint = fingerprint[:FINGERPRINT_MAX_LENGTH - 3] + "..."
+    return fingerprint
+
+
+def route_template(scope: Scope) -> str:
+    """Return the path template of the route serving `scope`, e.g. `/api/v1/users/users/{email}`"""
+    app = scope.get("app")
+    for route in getattr(app, "routes", ()):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            path = getattr(route, "path", None)
+            return path if isinstance(path, str) else str(scope["path"])
+    # never label by raw path, unmatched URLs would explode the cardinality
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording the latency of every HTTP request, streaming bodies included"""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            HTTP_REQUEST_SECONDS.observe(
+                elapsed,
+                method=scope["method"],
+                route=route_template(scope),
+                status=status_code,
+            )
+
+
+def runtime_families(
+    pools: Mapping[str, Any],
+    cache: Optional[Any] = None,
+    executor: Optional[Any] = None,
+    conversion_cache: Optional[Any] = None,
+    jobs: Optional[Any] = None,
+) -> List[MetricFamily]:
+    """Read pool, entity cache, conversion executor, conversion cache and job queue state at scrape time"""
+    families = [
+        MetricFamily(
+            "db_pool_connections", "gauge", "Database pool connections by state",
+            [
+                Sample("", {"pool": name, "state": state}, pool.stats()[state])
+                for name, pool in pools.items() if pool is not None
+                for state in ("idle", "in_use")
+            ],
+        ),
+        MetricFamily(
+            "db_pool_max_connections", "gauge", "Database pool size limit",
+            [Sample("", {"pool": name}, pool.stats()["max_size"]) for name, pool in pools.items() if pool is not None],
+        ),
+    ]
+
+    stats = cache.stats() if cache is not None else {}
+    if stats.get("enabled"):
+        for counter in ("hits", "misses", "evictions", "expirations"):
+            families.append(MetricFamily(
+                f"entity_cache_{counter}_total", "counter", f"Entity cache {counter}",
+                [Sample("", {}, stats[counter])],
+            ))
+        families.append(MetricFamily(
+            "entity_cache_entries", "gauge", "Entries held by the entity cache",
+            [Sample("", {}, stats["size"])],
+        ))
+
+    if executor is not None:
+        families.append(MetricFamily(
+            "conversion_executor_pending", "gauge", "Offloaded conversions queued or running",
+            [Sample("", {}, executor.pending)],
+        ))
+        families.append(MetricFamily(
+            "conversion_executor_rejected_total", "counter", "Conversions rejected because the queue was full",
+            [Sample("", {}, executor.rejected)],
+        ))
+
+    if conversion_cache is not None:
+        stats = conversion_cache.stats()
+        families.append(MetricFamily(
+            "conversion_cache_lookups_total", "counter", "Conversion cache lookups by result",
+            [
+                Sample("", {"result": "memory_hit"}, stats["memory_hits"]),
+                Sample("", {"result": "disk_hit"}, stats["disk_hits"]),
+                Sample("", {"result": "miss"}, stats["misses"]),
+            ],
+        ))
+        families.append(MetricFamily(
+            "conversion_cache_hit_ratio", "gauge", "Share of conversion cache lookups that were hits",
+            [Sample("", {}, stats["hit_ratio"])],
+        ))
+        families.append(MetricFamily(
+            "conversion_cache_evictions_total", "counter", "Conversion results evicted from either tier",
+            [Sample("", {}, stats["evictions"])],
+        ))
+        families.append(MetricFamily(
+            "conversion_cache_bytes", "gauge", "Bytes of conversion results held by tier",
+            [
+                Sample("", {"tier": "memory"}, stats["memory_bytes"]),
+                Sample("", {"tier": "disk"}, stats["disk_bytes"]),
+            ],
+        ))
+
+    if jobs is not None:
+        stats = jobs.stats()
+        families.append(MetricFamily(
+            "conversion_jobs", "gauge", "Background conversion jobs by status",
+            [Sample("", {"status": status}, count) for status, count in stats["jobs"].items()],
+        ))
+        families.append(MetricFamily(
+            "conversion_jobs_rejected_total", "counter", "Job submissions rejected because the queue was full",
+            [Sample("", {}, stats["rejected"])],
+        ))
+    return families
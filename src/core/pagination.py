@@ -0,0 +1,145 @@
+import base64
+import itertools
+import threading
+from typing import Any, Iterator, List, Optional, Sequence, Tuple
+
+import orjson
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import StreamingResponse
+
+from src.core.conditional import ROW_VERSION, without_row_version
+from src.core.database import DatabaseConnectionPool, ResultRow
+from src.core.encoders import json_dumps
+from src.core.responses import ndjson_response
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor token cannot be decoded."""
+    pass
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """
+    Return an opaque, URL-safe token for the sort-key values of a row.
+    """
+    return base64.urlsafe_b64encode(json_dumps(list(values))).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(token: str, size: int) -> List[Any]:
+    """
+    Return the sort-key values stored in a token created by `encode_cursor`.
+    """
+    try:
+        values = orjson.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except (ValueError, TypeError):
+        raise InvalidCursorError("Invalid pagination cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursorError("Invalid pagination cursor")
+    return values
+
+
+class Keyset:
+    """
+    Keyset (seek) pagination over a table in a fixed, unique sort order.
+
+    Pages continue strictly after the row a cursor was taken from, so the cost of
+    a page does not depend on how far into the table it is.
+    """
+
+    def __init__(self, table: str, columns: Sequence[str], descending: bool = False) -> None:
+        self.table = table
+        self.columns = tuple(columns)
+        self.descending = descending
+
+    def query(
+        self,
+        cursor: Optional[str] = None,
+        limit: Optional[int] = None,
+        row_version: bool = False,
+    ) -> Tuple[str, List[Any]]:
+        """
+        Build the SELECT for the rows after `cursor`, at most `limit` of them,
+        with their ROW_VERSION column when `row_version` is set.
+        """
+        columns = ", ".join(self.columns)
+        direction = " DESC" if self.descending else ""
+        query = f"SELECT *, {ROW_VERSION} FROM {self.table}" if row_version else f"SELECT * FROM {self.table}"
+        params: List[Any] = []
+
+        if cursor is not None:
+            placeholders = ", ".join(["%s"] * len(self.columns))
+            query += f" WHERE ({columns}) {'<' if self.descending else '>'} ({placeholders})"
+            params.extend(decode_cursor(cursor, len(self.columns)))
+
+        query += " ORDER BY " + ", ".join(f"{column}{direction}" for column in self.columns)
+        if limit is not None:
+            query += " LIMIT %s"
+            params.append(limit)
+        return query, params
+
+    def page_query(self, cursor: Optional[str], limit: int) -> Tuple[str, List[Any]]:
+        """
+        Build the SELECT for a page, fetching one extra row to detect whether another page follows.
+        Rows come with their ROW_VERSION column, for `Validators.for_rows`.
+        """
+        return self.query(cursor, limit + 1, row_version=True)
+
+    def page(self, rows: List[ResultRow], limit: int) -> Tuple[List[ResultRow], Optional[str]]:
+        """
+        Trim rows fetched with `page_query` to the page, without their row versions,
+        and return it with the next page's cursor.
+        """
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor([rows[-1][column] for column in self.columns])
+        return [without_row_version(row) for row in rows], next_cursor
+
+
+class _ClosingRows:
+    """
+    Rows of a generator that can be closed from another thread while one of
+    them is being fetched: closing waits for that fetch to return first.
+    """
+
+    def __init__(self, rows: Iterator[ResultRow]) -> None:
+        self._rows = rows
+        self._lock = threading.Lock()
+
+    def __iter__(self) -> "_ClosingRows":
+        return self
+
+    def __next__(self) -> ResultRow:
+        with self._lock:
+            return next(self._rows)
+
+    def close(self) -> None:
+        with self._lock:
+            close = getattr(self._rows, "close", None)
+            if close is not None:
+                close()
+
+
+async def keyset_export_response(
+    pool: DatabaseConnectionPool,
+    keyset: Keyset,
+    cursor: Optional[str] = None,
+) -> StreamingResponse:
+    """
+    Stream every row after `cursor` as NDJSON from a server-side cursor,
+    so exports never hold the whole table in the API process.
+    """
+    query, params = keyset.query(cursor)
+    rows = _ClosingRows(pool.iter_query(query, params))
+    # borrow the connection and start the query before the response does,
+    # so pool timeouts and SQL errors still get a proper status code
+    first = await run_in_threadpool(next, rows, None)
+    if first is None:
+        return ndjson_response(())
+    # a client disconnecting stops the response without closing its body, which
+    # would keep the cursor open and the connection borrowed until garbage collection
+    return ndjson_response(itertools.chain((first,), rows), background=BackgroundTask(rows.close))
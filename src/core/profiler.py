@@ -0,0 +1,254 @@
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from types import FrameType
+from collections import Counter, deque
+from typing import Any, Deque, Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.config.settings import ProfilerSettings
+from src.core.metrics import route_template
+
+logger = logging.getLogger(__name__)
+
+PROFILE_SUFFIX = ".folded"
+
+# innermost frames of threads that are waiting for work rather than doing any
+_IDLE_FRAMES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+    ("process.py", "_queue_management_worker"),
+    ("connection.py", "wait"),
+}
+
+_READ_ONLY = re.compile(r"\s*(select|with)\b", re.IGNORECASE)
+_WRITES = re.compile(r"\b(insert|update|delete|merge|into)\b", re.IGNORECASE)
+_UNSAFE_FILENAME = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+class StackSample(NamedTuple):
+    timestamp: float
+    thread: str
+    stack: str
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler for slow requests.
+
+    While enabled, a daemon thread snapshots the Python stack of every thread
+    each `sample_interval` seconds into a bounded ring buffer. When a request
+    ends after more than `slow_request_seconds`, the samples taken during it
+    are written as collapsed stacks (`frame;frame;frame count`, the input
+    format of flamegraph.pl and speedscope) to `output_dir`, keeping the
+    newest `max_files` profiles.
+
+    Samples are per thread, not per request: requests served concurrently on
+    the event loop thread share its samples. Threads idle in select() or a
+    queue wait are skipped, so time spent awaiting the database shows up in
+    the slow-query EXPLAIN logs rather than in the profile.
+    """
+
+    def __init__(
+        self,
+        sample_interval: float = 0.005,
+        slow_request_seconds: float = 0.5,
+        slow_query_seconds: float = 0.2,
+        output_dir: str = "profiles",
+        max_files: int = 100,
+        buffer_size: int = 50_000,
+    ) -> None:
+        self.sample_interval = sample_interval
+        self.slow_request_seconds = slow_request_seconds
+        self.slow_query_seconds = slow_query_seconds
+        self.output_dir = output_dir
+        self.max_files = max_files
+
+        self._samples: Deque[StackSample] = deque(maxlen=buffer_size)
+        self._labels: Dict[Any, str] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def load_settings(self, settings: ProfilerSettings) -> None:
+        """Apply the configured options; the profiler is started separately"""
+        self.configure(
+            sample_interval=settings.sample_interval,
+            slow_request_seconds=settings.slow_request_seconds,
+            slow_query_seconds=settings.slow_query_seconds,
+            output_dir=settings.output_dir,
+            max_files=settings.max_files,
+        )
+        if settings.buffer_size != self._samples.maxlen:
+            self._samples = deque(self._samples, maxlen=settings.buffer_size)
+
+    @property
+    def enabled(self) -> bool:
+        return self._thread is not None
+
+    def configure(self, **options: Any) -> None:
+        """Update thresholds and output options; unknown names raise AttributeError"""
+        for name, value in options.items():
+            if name not in ("sample_interval", "slow_request_seconds", "slow_query_seconds", "output_dir", "max_files"):
+                raise AttributeError(f"Unknown profiler option: {name}")
+            setattr(self, name, value)
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+        logger.info("Sampling profiler started, interval %.1f ms", self.sample_interval * 1000)
+
+    def stop(self) -> None:
+        with self._lock:
+            thread, self._thread = self._thread, None
+            if thread is None:
+                return
+            self._stop.set()
+        thread.join()
+        self._samples.clear()
+        logger.info("Sampling profiler stopped")
+
+    def status(self) -> Mapping[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "sample_interval": self.sample_interval,
+            "slow_request_seconds": self.slow_request_seconds,
+            "slow_query_seconds": self.slow_query_seconds,
+            "output_dir": self.output_dir,
+            "max_files": self.max_files,
+            "buffered_samples": len(self._samples),
+        }
+
+    def is_slow_request(self, elapsed: float) -> bool:
+        return self.enabled and elapsed >= self.slow_request_seconds
+
+    def should_explain(self, query: str, elapsed: float) -> bool:
+        """Whether a query is worth an EXPLAIN ANALYZE, which runs it again"""
+        return (
+            self.enabled
+            and 0 < self.slow_query_seconds <= elapsed
+            and _READ_ONLY.match(query) is not None
+            and _WRITES.search(query) is None
+        )
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.sample_interval):
+            try:
+                self._sample(own)
+            except Exception:
+                logger.exception("Stack sampling failed")
+
+    def _label(self, code: Any) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            name = getattr(code, "co_qualname", code.co_name)
+            label = self._labels[code] = f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+        return label
+
+    def _sample(self, own: int) -> None:
+        now = time.perf_counter()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            code = frame.f_code
+            if (os.path.basename(code.co_filename), code.co_name) in _IDLE_FRAMES:
+                continue
+            frames: List[str] = []
+            current: Optional[FrameType] = frame
+            while current is not None:
+                frames.append(self._label(current.f_code))
+                current = current.f_back
+            frames.reverse()
+            self._samples.append(StackSample(now, names.get(ident, str(ident)), ";".join(frames)))
+
+    def collapse(self, start: float, end: float) -> "Counter[str]":
+        """Count the distinct stacks sampled between two `time.perf_counter()` readings"""
+        stacks: "Counter[str]" = Counter()
+        for sample in self._samples.copy():
+            if start <= sample.timestamp <= end:
+                stacks[f"{sample.thread};{sample.stack}"] += 1
+        return stacks
+
+    def dump(self, start: float, end: float, name: str) -> Optional[str]:
+        """Write the stacks sampled between `start` and `end`; returns the file path"""
+        stacks = self.collapse(start, end)
+        if not stacks:
+            return None
+        os.makedirs(self.output_dir, exist_ok=True)
+        filename = f"{time.strftime('%Y%m%dT%H%M%S')}-{int((end - start) * 1000)}ms-{_UNSAFE_FILENAME.sub('_', name)}"
+        path = os.path.join(self.output_dir, filename.strip("_")[:200] + PROFILE_SUFFIX)
+        with open(path, "w") as fp:
+            for stack, count in stacks.most_common():
+                fp.write(f"{stack} {count}\n")
+        self._rotate()
+        return path
+
+    def _rotate(self) -> None:
+        profiles: List[Tuple[float, str]] = []
+        for entry in os.scandir(self.output_dir):
+            if entry.is_file() and entry.name.endswith(PROFILE_SUFFIX):
+                profiles.append((entry.stat().st_mtime, entry.path))
+        profiles.sort()
+        for _, path in profiles[:max(len(profiles) - self.max_files, 0)]:
+            try:
+                os.remove(path)
+            except OSError:
+                logger.warning("Could not remove old profile %s", path, exc_info=True)
+
+
+def log_query_plan(query: str, elapsed: float, plan: List[Mapping[str, Any]]) -> None:
+    """Log the EXPLAIN output of a slow query"""
+    lines = "\n".join(str(next(iter(row.values()))) for row in plan)
+    logger.warning("Slow query took %.1f ms: %s\n%s", elapsed * 1000, query.strip(), lines)
+
+
+# process-wide, so the database layer and the middleware see the same switch
+PROFILER = SamplingProfiler()
+
+
+class ProfilingMiddleware:
+    """ASGI middleware saving a profile of every request slower than the profiler threshold"""
+
+    def __init__(self, app: ASGIApp, profiler: SamplingProfiler = PROFILER) -> None:
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.profiler.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            end = time.perf_counter()
+            if self.profiler.is_slow_request(end - start):
+                name = f"{scope['method']}-{route_template(scope)}-{status_code}"
+                # the response is complete, writing the file only delays the teardown
+                path = await run_in_threadpool(self.profiler.dump, start, end, name)
+                logger.warning(
+                    "Slow request %s %s took %.1f ms, profile: %s",
+                    scope["method"], scope["path"], (end - start) * 1000, path,
+                )
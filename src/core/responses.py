@@ -1,8 +1,48 @@
-from typing import Any, Mapping, Optional
+from typing import Any, Iterable, Iterator, Mapping, Optional
 
-from fastapi.encoders import jsonable_encoder
 from starlette import status
-from starlette.responses import JSONResponse
+from starlette.background import BackgroundTask
+from starlette.responses import JSONResponse, Response, StreamingResponse
+
+from src.core.encoders import json_dumps
+from src.core.formats import JSON_CODEC, RESPONSE_CODEC, Codec
+from src.core.metrics import RESPONSE_ENCODE_SECONDS
+
+NDJSON_CHUNK_SIZE = 64 * 1024
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse that serializes its content directly to bytes with orjson,
+    without a `jsonable_encoder` pass over the payload first.
+    """
+
+    def render(self, content: Any) -> bytes:
+        with RESPONSE_ENCODE_SECONDS.time():
+            return json_dumps(content)
+
+
+class CodecResponse(Response):
+    """
+    Response whose content is serialized with a binary Codec, such as MessagePack or CBOR.
+    """
+
+    def __init__(self, content: Any, codec: Codec, **kwargs: Any) -> None:
+        self.codec = codec
+        self.media_type = codec.media_type
+        super().__init__(content, **kwargs)
+
+    def render(self, content: Any) -> bytes:
+        with RESPONSE_ENCODE_SECONDS.time():
+            return self.codec.dumps(content)
+
+
+def _encoded_response(payload: Any, status_code: int, headers: Optional[Mapping[str, str]]) -> Response:
+    """Encode `payload` in the format negotiated for the current request, JSON by default."""
+    codec = RESPONSE_CODEC.get()
+    if codec is JSON_CODEC:
+        return FastJSONResponse(content=payload, status_code=status_code, headers=headers)
+    return CodecResponse(payload, codec, status_code=status_code, headers=headers)
 
 
 def success_response(
@@ -10,9 +50,11 @@ def success_response(
     message: Optional[str] = None,
     status_code: int = status.HTTP_200_OK,
     headers: Optional[Mapping[str, str]] = None,
-) -> JSONResponse:
+    next_cursor: Optional[str] = None,
+) -> Response:
     """
-    Return a JSONResponse with success=True, optional data and message.
+    Return a response with success=True, optional data, message and pagination
+    cursor, in the format negotiated for the request (FastJSONResponse by default).
     """
     payload: dict[str, Any] = {"success": True}
 
@@ -20,9 +62,12 @@ def success_response(
         payload["message"] = message
 
     if data is not None:
-        payload["data"] = jsonable_encoder(data)
+        payload["data"] = data
 
-    return JSONResponse(content=payload, status_code=status_code, headers=headers)
+    if next_cursor is not None:
+        payload["next_cursor"] = next_cursor
+
+    return _encoded_response(payload, status_code, headers)
 
 
 def error_response(
@@ -30,9 +75,10 @@ def error_response(
     message: Optional[str] = None,
     status_code: int = status.HTTP_500_INTERNAL_SERVER_ERROR,
     headers: Optional[Mapping[str, str]] = None,
-) -> JSONResponse:
+) -> Response:
     """
-    Return a JSONResponse with success=False, optional errors list and message.
+    Return a response with success=False, optional errors list and message,
+    in the format negotiated for the request (FastJSONResponse by default).
     """
     payload: dict[str, Any] = {"success": False}
 
@@ -40,6 +86,51 @@ def error_response(
         payload["message"] = message
 
     if errors is not None:
-        payload["errors"] = jsonable_encoder(errors)
+        payload["errors"] = errors
+
+    return _encoded_response(payload, status_code, headers)
+
+
+def streaming_success_response(
+    data_chunks: Iterable[str],
+    status_code: int = status.HTTP_200_OK,
+    headers: Optional[Mapping[str, str]] = None,
+) -> StreamingResponse:
+    """
+    Return a StreamingResponse with the success=True envelope around
+    already JSON-encoded `data` chunks.
+    """
+    def body() -> Iterator[bytes]:
+        yield b'{"success":true,"data":'
+        for chunk in data_chunks:
+            yield chunk.encode("utf-8")
+        yield b"}"
+
+    return StreamingResponse(body(), status_code=status_code, headers=headers, media_type="application/json")
+
+
+def ndjson_response(
+    rows: Iterable[Any],
+    status_code: int = status.HTTP_200_OK,
+    headers: Optional[Mapping[str, str]] = None,
+    background: Optional[BackgroundTask] = None,
+) -> StreamingResponse:
+    """
+    Return a StreamingResponse with one JSON document per line, encoded as rows arrive.
+    `background` runs once the response is sent, or the client has disconnected.
+    """
+    def body() -> Iterator[bytes]:
+        buffer = bytearray()
+        for row in rows:
+            buffer += json_dumps(row)
+            buffer += b"\n"
+            if len(buffer) >= NDJSON_CHUNK_SIZE:
+                yield bytes(buffer)
+                buffer.clear()
+        if buffer:
+            yield bytes(buffer)
 
-    return JSONResponse(content=payload, status_code=status_code, headers=headers)
+    response = StreamingResponse(body(), status_code=status_code, headers=headers, media_type="application/x-ndjson")
+    if background is not None:
+        response.background = background
+    return response
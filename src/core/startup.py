@@ -0,0 +1,148 @@
+"""
+Start-up work kept off the critical path.
+
+A worker answers requests, health checks included, as soon as its startup
+event returns. Opening the database pool's first connections and warming
+optional subsystems (the XML converter, templates, the OpenAPI schema) run
+afterwards in a background task; requests arriving before a subsystem is
+warm load it themselves, as they would with warm-up switched off.
+
+How long each phase took is kept in a StartupProfile, served by
+/admin/startup. For the import-time breakdown of a cold worker, see
+`python -m benchmarks.bench_startup`.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import FastAPI
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+# (phase name, callable run in the thread pool)
+WarmUpStep = Tuple[str, Callable[[], Any]]
+
+# the schema is generated from these sources; a cached one is reused while they are unchanged
+OPENAPI_SOURCE_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class StartupProfile:
+    """Start offset and duration of each start-up phase, relative to the startup event."""
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.phases: Dict[str, Dict[str, Any]] = {}
+        self.ready: Optional[float] = None
+
+    def _record(self, name: str, start: float, error: Optional[BaseException] = None) -> None:
+        end = time.perf_counter()
+        self.phases[name] = {
+            "offset": round(start - self.started, 6),
+            "seconds": round(end - start, 6),
+            "error": f"{type(error).__name__}: {error}" if error is not None else None,
+        }
+
+    def mark_ready(self) -> None:
+        """Record that the worker accepts requests."""
+        self.ready = time.perf_counter() - self.started
+
+    def run(self, name: str, func: Callable[[], Any]) -> None:
+        start = time.perf_counter()
+        try:
+            func()
+        except Exception as e:
+            logger.warning("Start-up phase %s failed: %s", name, e)
+            self._record(name, start, e)
+        else:
+            self._record(name, start)
+
+    async def run_async(self, name: str, awaitable: Awaitable[Any]) -> None:
+        start = time.perf_counter()
+        try:
+            await awaitable
+        except Exception as e:
+            logger.warning("Start-up phase %s failed: %s", name, e)
+            self._record(name, start, e)
+        else:
+            self._record(name, start)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "ready_seconds": round(self.ready, 6) if self.ready is not None else None,
+            "phases": self.phases,
+        }
+
+
+def openapi_fingerprint(app: FastAPI) -> str:
+    """Hash of what the OpenAPI schema is generated from: the application's metadata and sources."""
+    from fastapi import __version__ as fastapi_version
+
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(json.dumps([fastapi_version, app.title, app.version, app.description]).encode())
+    for directory, subdirectories, files in os.walk(OPENAPI_SOURCE_DIRECTORY):
+        subdirectories.sort()
+        for name in sorted(files):
+            if name.endswith(".py"):
+                path = os.path.join(directory, name)
+                digest.update(os.path.relpath(path, OPENAPI_SOURCE_DIRECTORY).encode())
+                with open(path, "rb") as fp:
+                    digest.update(fp.read())
+    return digest.hexdigest()
+
+
+def load_openapi(app: FastAPI, cache_file: Optional[str] = None) -> None:
+    """
+    Generate the application's OpenAPI schema now rather than on the first
+    request for it. With `cache_file`, a schema cached there by an earlier
+    worker is reused while the sources are unchanged, and written otherwise.
+    """
+    if cache_file is None:
+        app.openapi()
+        return
+
+    fingerprint = openapi_fingerprint(app)
+    try:
+        with open(cache_file, "rb") as fp:
+            cached = json.load(fp)
+        if cached.get("fingerprint") == fingerprint:
+            app.openapi_schema = cached["schema"]
+            return
+    except (FileNotFoundError, ValueError, KeyError, AttributeError):
+        pass
+
+    schema = app.openapi()
+    temporary = f"{cache_file}.{os.getpid()}.tmp"
+    try:
+        with open(temporary, "w") as fp:
+            json.dump({"fingerprint": fingerprint, "schema": schema}, fp)
+        os.replace(temporary, cache_file)
+    except OSError as e:
+        logger.warning("Could not write the OpenAPI cache file %s: %s", cache_file, e)
+
+
+def _run_steps(profile: StartupProfile, steps: Sequence[WarmUpStep]) -> None:
+    for name, func in steps:
+        profile.run(name, func)
+
+
+async def warm_up(
+    profile: StartupProfile,
+    pool_open: Optional[Awaitable[Any]] = None,
+    steps: Sequence[WarmUpStep] = (),
+) -> None:
+    """
+    Open the database pool with `pool_open` while `steps` run one after the
+    other in the thread pool. Failures are logged and recorded, not raised:
+    the pool still connects on demand and every subsystem still loads on use.
+    """
+    tasks: List[Awaitable[Any]] = []
+    if pool_open is not None:
+        tasks.append(profile.run_async("db_pool", pool_open))
+    if steps:
+        tasks.append(run_in_threadpool(_run_steps, profile, steps))
+    await asyncio.gather(*tasks)
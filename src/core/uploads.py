@@ -0,0 +1,58 @@
+"""
+Zero-copy access to uploaded files.
+
+Multipart uploads are spooled by Starlette: kept in memory up to
+`UploadFile.spool_max_size` bytes, rolled over to a temporary file beyond.
+Rolled-over uploads are read back through a read-only memory map of that
+file instead of being copied into a `bytes` object, so converting a large
+upload does not hold its content in memory twice.
+"""
+import io
+import mmap
+import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Union, cast
+
+from starlette.datastructures import UploadFile
+
+# what `upload_buffer` yields; parsers accepting it take any bytes-like object
+UploadBuffer = Union[bytes, mmap.mmap]
+
+
+def configure_spooling(spool_max_size: int) -> None:
+    """Set the size from which uploads are spooled to a temporary file instead of memory."""
+    UploadFile.spool_max_size = spool_max_size
+
+
+def _spooled_fileno(upload: UploadFile) -> int:
+    """Return the descriptor of the file an upload was rolled over to, or -1 if it is in memory."""
+    file = upload.file
+    # SpooledTemporaryFile.fileno() would roll an in-memory upload over to disk
+    if not getattr(file, "_rolled", True):
+        return -1
+    try:
+        return file.fileno()
+    except (AttributeError, io.UnsupportedOperation, OSError):
+        return -1
+
+
+@asynccontextmanager
+async def upload_buffer(upload: UploadFile) -> AsyncIterator[UploadBuffer]:
+    """
+    Yield the content of an upload: a memory map of its temporary file when it
+    was spooled to disk, its bytes otherwise. The map is closed on exit.
+    """
+    fileno = _spooled_fileno(upload)
+    if fileno >= 0:
+        upload.file.flush()
+        if os.fstat(fileno).st_size > 0:
+            buffer = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+            try:
+                yield buffer
+            finally:
+                buffer.close()
+            return
+
+    await upload.seek(0)
+    # UploadFile.read is typed for text files too; uploads are always binary
+    yield cast(bytes, await upload.read())
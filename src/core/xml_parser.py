@@ -1,15 +1,41 @@
+import io
 import json
 import logging
+import mmap
+import re
+from array import array
+from decimal import Decimal
 from enum import Enum
-from typing import Any, Dict, Optional, Union, Mapping, Sequence, TypeAlias
-
-from lxml import etree
-from lxml.etree import _Element, parse, fromstring
+from functools import lru_cache
+from typing import (
+    TYPE_CHECKING, Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple, Union, Mapping, Sequence, TypeAlias
+)
 
 from src.config.annotations import JSONType  # consider replacing with local TypeAlias
+from src.config.settings import XMLParsingSettings
+from src.core.lazy import LazyModule
+from src.core.metrics import XML_PARSER_SECONDS
+
+if TYPE_CHECKING:
+    from lxml import etree
+    from lxml.etree import _Element
+
+# imported by the first conversion; see `load_converter`. Annotations name the
+# real modules, which are only imported for type checking
+_etree = LazyModule("lxml.etree")
+_ijson = LazyModule("ijson")
 
 logger = logging.getLogger(__name__)
 
+STREAM_CHUNK_SIZE = 64 * 1024
+# XML is fed to lxml in slices of this size: an error raised by the parser target
+# stops the parse at the end of the current slice, not of the document
+FEED_CHUNK_SIZE = 64 * 1024
+
+BytesLike = Union[bytes, bytearray, memoryview, mmap.mmap]
+
+_END = object()
+
 
 # (1) Define your JSONType if you want clarity here:
 JSONType: TypeAlias = Union[
@@ -28,6 +54,144 @@ class XMLParseError(Exception):
     pass
 
 
+# no DTD loading or network access; libxml2's own limits on text size and nesting
+# stay on (no huge_tree). Documents with a DOCTYPE are rejected before any entity
+# they declare can be expanded, so only the predefined entities (&amp; ...) are.
+_PARSER_OPTIONS: Dict[str, Any] = {
+    "no_network": True,
+    "load_dtd": False,
+    "huge_tree": False,
+}
+
+_ITEM_ATTRIBUTES = frozenset(("type", "value", "key"))
+
+# the ITEM format. libxml2 validates only while building a tree and reports at the
+# end of the document, so `_check_item` applies the same rules as each ITEM opens
+ITEM_SCHEMA = """\
+<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema">
+  <xs:simpleType name="ItemType">
+    <xs:restriction base="xs:string">
+      <xs:enumeration value="float"/>
+      <xs:enumeration value="integer"/>
+      <xs:enumeration value="string"/>
+      <xs:enumeration value="boolean"/>
+      <xs:enumeration value="object"/>
+      <xs:enumeration value="list"/>
+      <xs:enumeration value="null"/>
+    </xs:restriction>
+  </xs:simpleType>
+  <xs:complexType name="Item">
+    <xs:sequence>
+      <xs:element name="ITEM" type="Item" minOccurs="0" maxOccurs="unbounded"/>
+    </xs:sequence>
+    <xs:attribute name="type" type="ItemType" use="required"/>
+    <xs:attribute name="value" type="xs:string"/>
+    <xs:attribute name="key" type="xs:string"/>
+  </xs:complexType>
+  <xs:element name="ITEM" type="Item"/>
+</xs:schema>
+"""
+
+
+@lru_cache(maxsize=None)
+def item_schema() -> "etree.XMLSchema":
+    """Return the compiled ITEM_SCHEMA, compiling it on first use."""
+    return _etree.XMLSchema(_etree.fromstring(ITEM_SCHEMA.encode()))
+
+
+class ParseOptions(NamedTuple):
+    """
+    Checks applied while XML is parsed, each failing the parse as soon as it is
+    violated. Plain data, so it can be sent to the process pool with a conversion.
+    """
+
+    # validate against ITEM_SCHEMA
+    validate: bool = False
+    max_depth: int = 256
+    max_nodes: int = 10_000_000
+    # characters of a `value` or `key` attribute
+    max_attribute_length: int = 10 * 1024 * 1024
+
+    @classmethod
+    def from_settings(cls, settings: XMLParsingSettings) -> "ParseOptions":
+        return cls(
+            validate=settings.validate_schema,
+            max_depth=settings.max_depth,
+            max_nodes=settings.max_nodes,
+            max_attribute_length=settings.max_attribute_length,
+        )
+
+
+DEFAULT_PARSE_OPTIONS = ParseOptions()
+
+
+def load_converter() -> None:
+    """Import lxml and ijson now rather than in the first conversion."""
+    _etree.load()
+    _ijson.load()
+
+
+def _check_item(tag: str, attrib: Mapping[str, str], depth: int, nodes: int, options: ParseOptions) -> None:
+    """Fail on an ITEM that breaks `options` as soon as it opens."""
+    if depth > options.max_depth:
+        raise XMLParseError(f"Document is nested deeper than {options.max_depth} levels")
+    if nodes > options.max_nodes:
+        raise XMLParseError(f"Document has more than {options.max_nodes} nodes")
+    for name in ("value", "key"):
+        value = attrib.get(name)
+        if value is not None and len(value) > options.max_attribute_length:
+            raise XMLParseError(f"'{name}' attribute is longer than {options.max_attribute_length} characters")
+    if options.validate:
+        if tag != "ITEM":
+            raise XMLParseError(f"Unexpected element <{tag}>, expected <ITEM>")
+        type_name = attrib.get("type")
+        if type_name not in _VALID_TYPES:
+            raise XMLParseError(f"Invalid 'type' attribute: {type_name!r}")
+        if len(attrib) > 1 + ("value" in attrib) + ("key" in attrib):
+            unexpected = sorted(set(attrib.keys()) - _ITEM_ATTRIBUTES)
+            raise XMLParseError(f"Unexpected attributes on <ITEM>: {', '.join(unexpected)}")
+
+
+def json_loads(data: BytesLike) -> JSONType:
+    """Read JSON with every digit of its numbers; orjson reads integers past 64 bits as floats"""
+    # json.loads reads bytes and bytearray only
+    return json.loads(data if isinstance(data, (bytes, bytearray)) else bytes(data))
+
+
+def _reject_doctype(*args: Any) -> None:
+    raise XMLParseError("DOCTYPE declarations are not allowed")
+
+
+def _check_text(text: Optional[str]) -> None:
+    if text is not None and not text.isspace():
+        raise XMLParseError("Unexpected text content in <ITEM>")
+
+
+def _invalid_leaf(type_name: Optional[str], raw: str) -> XMLParseError:
+    return XMLParseError(f"Invalid {type_name} value: {raw[:64]!r}")
+
+
+def _exact_json_events(file: Any) -> Iterator[Tuple[str, str, Any]]:
+    """
+    Parse events of ijson's pure-Python backend, which reads integers of any size.
+    Other numbers come as Decimal and are turned into floats the way json.loads reads them.
+    """
+    for prefix, event, value in _ijson.get_backend("python").parse(file):
+        if event == "number" and isinstance(value, Decimal):
+            value = float(value)
+        yield prefix, event, value
+
+
+def _skip_bytes(chunks: Iterator[bytes], count: int) -> Iterator[bytes]:
+    """Yield `chunks` without their first `count` bytes"""
+    for chunk in chunks:
+        if count >= len(chunk):
+            count -= len(chunk)
+            continue
+        yield chunk[count:]
+        count = 0
+
+
 class XMLElementType(str, Enum):
     FLOAT   = "float"
     INTEGER = "integer"
@@ -39,6 +203,10 @@ class XMLElementType(str, Enum):
 
     @staticmethod
     def from_value(value: Any) -> "XMLElementType":
+        etype = _VALUE_TYPES.get(type(value))
+        if etype is not None:
+            return etype
+        # subclasses of the JSON types (e.g. RealDictRow, IntEnum)
         if isinstance(value, str):
             return XMLElementType.STRING
         elif isinstance(value, bool):
@@ -66,114 +234,774 @@ class XMLElementType(str, Enum):
             raise XMLParseError("Invalid XML schema for non-leaf node")
 
         # parse based on type
-        if self is XMLElementType.STRING:
-            return value
-        if self is XMLElementType.INTEGER:
-            return int(value)
-        if self is XMLElementType.FLOAT:
-            return float(value)
-        if self is XMLElementType.BOOLEAN:
-            val = value.strip().lower()
-            if val in ("true", "1", "yes"):
-                return True
-            if val in ("false", "0", "no"):
-                return False
-            raise XMLParseError(f"Invalid boolean value: {value}")
-        raise XMLParseError(f"Unsupported leaf type: {self.value}")
+        parser = _LEAF_PARSERS.get(self.value)
+        if parser is None:
+            raise XMLParseError(f"Unsupported leaf type: {self.value}")
+        return parser(value)
+
+
+def _parse_boolean(value: str) -> bool:
+    val = value.strip().lower()
+    if val in ("true", "1", "yes"):
+        return True
+    if val in ("false", "0", "no"):
+        return False
+    raise XMLParseError(f"Invalid boolean value: {value}")
+
+
+def _format_boolean(value: bool) -> str:
+    return "true" if value else "false"
+
+
+def _format_float(value: float) -> str:
+    # what json.dumps writes, without its per-call overhead
+    if value != value:
+        return "NaN"
+    if value in (float("inf"), float("-inf")):
+        return "Infinity" if value > 0 else "-Infinity"
+    return float.__repr__(value)
+
+
+# dispatch tables keyed on the raw `type` attribute / the exact Python type,
+# so the hot paths skip enum construction and isinstance chains
+_LEAF_PARSERS: Dict[str, Callable[[str], Any]] = {
+    XMLElementType.STRING.value: str,
+    XMLElementType.INTEGER.value: int,
+    XMLElementType.FLOAT.value: float,
+    XMLElementType.BOOLEAN.value: _parse_boolean,
+}
+
+_VALUE_TYPES: Dict[type, XMLElementType] = {
+    str: XMLElementType.STRING,
+    bool: XMLElementType.BOOLEAN,
+    int: XMLElementType.INTEGER,
+    float: XMLElementType.FLOAT,
+    dict: XMLElementType.OBJECT,
+    list: XMLElementType.LIST,
+    type(None): XMLElementType.NULL,
+}
+
+# JSON-encode non-string leaves to preserve type
+_VALUE_FORMATTERS: Dict[type, Callable[[Any], Optional[str]]] = {
+    str: str,
+    bool: _format_boolean,
+    int: int.__repr__,
+    float: _format_float,
+    type(None): lambda value: None,
+}
+
+_CONTAINER_TYPES = (XMLElementType.OBJECT.value, XMLElementType.LIST.value)
+_VALID_TYPES = frozenset(etype.value for etype in XMLElementType)
+
+# Document node kinds: the XMLElementType members in declaration order, plus
+# integers beyond 64 bits, which are kept as decimal strings
+_FLOAT, _INTEGER, _STRING, _BOOLEAN, _OBJECT, _LIST, _NULL, _BIG_INTEGER = range(8)
+_KIND_NAMES: Tuple[str, ...] = tuple(etype.value for etype in XMLElementType) + (XMLElementType.INTEGER.value,)
+_KINDS: Dict[str, int] = {etype.value: kind for kind, etype in enumerate(XMLElementType)}
+_CONTAINER_KINDS = (_OBJECT, _LIST)
+_VALUE_KINDS: Dict[type, int] = {value_type: _KINDS[etype.value] for value_type, etype in _VALUE_TYPES.items()}
+
+# attribute escaping as lxml serializes it
+_ATTRIBUTE_ESCAPES = (
+    ("&", "&amp;"), ("<", "&lt;"), (">", "&gt;"), ('"', "&quot;"), ("\n", "&#10;"), ("\r", "&#13;"), ("\t", "&#9;"),
+)
+_INVALID_XML_CHARS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ud800-\udfff\ufffe\uffff]")
+
+
+def _escape_attribute(value: str) -> str:
+    # chained replace is much faster than str.translate with a mapping
+    for char, escaped in _ATTRIBUTE_ESCAPES:
+        if char in value:
+            value = value.replace(char, escaped)
+    # with whitespace escaped, a printable string holds none of the invalid characters
+    if not value.isprintable() and _INVALID_XML_CHARS.search(value):
+        raise ValueError("All strings must be XML compatible: Unicode or ASCII, no NULL bytes or control characters")
+    return value
+
+
+class Document:
+    """
+    Columnar ITEM tree: one entry per node, in document order, across typed arrays.
+
+    `kinds` holds each node's type, `parents` the index of its parent (-1 for the
+    root) and `keys` an index into the interned `key_table` (-1 for none).
+    Leaf values live in one column per type (`ints` for integers and booleans,
+    `floats`, `strings`) and `values` holds each node's index in its column.
+    A numeric leaf takes about 21 bytes instead of an lxml element or a boxed
+    Python object in a dict.
+
+    A node's children follow it directly, so a node is a leaf when the next node
+    is not its child.
+    """
+
+    __slots__ = ("kinds", "parents", "keys", "values", "ints", "floats", "strings", "key_table", "_key_ids")
+
+    def __init__(self) -> None:
+        self.kinds = array("b")
+        self.parents = array("i")
+        self.keys = array("i")
+        self.values = array("i")
+        self.ints = array("q")
+        self.floats = array("d")
+        self.strings: List[str] = []
+        self.key_table: List[str] = []
+        self._key_ids: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the typed arrays, without the strings they refer to."""
+        return sum(
+            column.itemsize * len(column)
+            for column in (self.kinds, self.parents, self.keys, self.values, self.ints, self.floats)
+        )
+
+    def _key_id(self, key: Optional[str]) -> int:
+        if key is None:
+            return -1
+        key_id = self._key_ids.get(key)
+        if key_id is None:
+            if not isinstance(key, str):
+                raise XMLParseError(f"Unsupported key type: {type(key)}")
+            key_id = self._key_ids[key] = len(self.key_table)
+            self.key_table.append(key)
+        return key_id
+
+    def _add_node(self, kind: int, parent: int, key: Optional[str]) -> int:
+        index = len(self.kinds)
+        self.kinds.append(kind)
+        self.parents.append(parent)
+        self.keys.append(self._key_id(key))
+        self.values.append(-1)
+        return index
+
+    def _set_value(self, index: int, kind: int, value: Any) -> None:
+        if kind == _INTEGER:
+            try:
+                self.ints.append(value)
+            except OverflowError:
+                kind = _BIG_INTEGER
+                self.strings.append(int.__repr__(value))
+                self.values[index] = len(self.strings) - 1
+            else:
+                self.values[index] = len(self.ints) - 1
+        elif kind == _BOOLEAN:
+            self.ints.append(1 if value else 0)
+            self.values[index] = len(self.ints) - 1
+        elif kind == _FLOAT:
+            self.floats.append(value)
+            self.values[index] = len(self.floats) - 1
+        elif kind == _STRING:
+            self.strings.append(value)
+            self.values[index] = len(self.strings) - 1
+        self.kinds[index] = kind
+
+    def _leaf_value(self, index: int) -> Any:
+        kind = self.kinds[index]
+        if kind == _INTEGER:
+            return self.ints[self.values[index]]
+        if kind == _FLOAT:
+            return self.floats[self.values[index]]
+        if kind == _STRING:
+            return self.strings[self.values[index]]
+        if kind == _BOOLEAN:
+            return self.ints[self.values[index]] == 1
+        if kind == _BIG_INTEGER:
+            return int(self.strings[self.values[index]])
+        if kind == _OBJECT:
+            return {}
+        if kind == _LIST:
+            return []
+        return None
+
+    def _value_attribute(self, index: int) -> str:
+        """The ` value="..."` attribute of a leaf as lxml serializes it; empty for nulls and containers."""
+        kind = self.kinds[index]
+        if kind == _INTEGER:
+            return f' value="{self.ints[self.values[index]]}"'
+        if kind == _FLOAT:
+            return f' value="{_format_float(self.floats[self.values[index]])}"'
+        if kind == _STRING:
+            return f' value="{_escape_attribute(self.strings[self.values[index]])}"'
+        if kind == _BOOLEAN:
+            return ' value="true"' if self.ints[self.values[index]] else ' value="false"'
+        if kind == _BIG_INTEGER:
+            return f' value="{self.strings[self.values[index]]}"'
+        return ""
+
+    def is_leaf(self, index: int) -> bool:
+        return index + 1 == len(self.parents) or self.parents[index + 1] != index
+
+    def add_json(self, value: Any, parent: int = -1, key: Optional[str] = None) -> int:
+        """Append a node for a JSON value, without its children, and return its index."""
+        kind = _VALUE_KINDS.get(type(value))
+        if kind is None:
+            kind = _KINDS[XMLElementType.from_value(value).value]
+        index = self._add_node(kind, parent, key)
+        if kind != _OBJECT and kind != _LIST and kind != _NULL:
+            self._set_value(index, kind, value)
+        return index
+
+    @classmethod
+    def from_json(cls, data: JSONType) -> "Document":
+        """Build a Document from a JSONType object."""
+        document = cls()
+        add_json = document.add_json
+        stack: List[Tuple[int, Iterator[Any], bool]] = []
+
+        root = add_json(data)
+        if document.kinds[root] == _OBJECT:
+            stack.append((root, iter(data.items()), True))  # type: ignore
+        elif document.kinds[root] == _LIST:
+            stack.append((root, iter(data), False))  # type: ignore
+
+        kinds = document.kinds
+        while stack:
+            parent, items, is_object = stack[-1]
+            item: Any = next(items, _END)
+            if item is _END:
+                stack.pop()
+                continue
+
+            key, value = item if is_object else (None, item)
+            index = add_json(value, parent, key)
+            kind = kinds[index]
+            if kind == _OBJECT:
+                stack.append((index, iter(value.items()), True))
+            elif kind == _LIST:
+                stack.append((index, iter(value), False))
+
+        return document
+
+    def to_json(self) -> JSONType:
+        """
+        Build the JSONType object, with the rules of `XMLParser._parse_etree_to_json_type`:
+        a keyed leaf outside an object becomes a one-entry object, as does an empty
+        container inside one, and every child of an object needs a key.
+        """
+        kinds, parents, keys, key_table = self.kinds, self.parents, self.keys, self.key_table
+        leaf_value = self._leaf_value
+        count = len(kinds)
+        result: JSONType = None
+        # (index, container) of the open containers
+        stack: List[Tuple[int, Any]] = []
+
+        for index in range(count):
+            parent = parents[index]
+            while stack and stack[-1][0] != parent:
+                stack.pop()
+
+            has_children = index + 1 < count and parents[index + 1] == index
+            if has_children:
+                value: Any = {} if kinds[index] == _OBJECT else []
+            else:
+                value = leaf_value(index)
+            key_id = keys[index]
+
+            container = stack[-1][1] if stack else None
+            if type(container) is dict:
+                if key_id < 0 or not key_table[key_id]:
+                    raise XMLParseError("Expected 'key' on object child")
+                key = key_table[key_id]
+                if not has_children and kinds[index] in _CONTAINER_KINDS:
+                    # as in `_parse_etree_to_json_type`, an empty container is read as a keyed leaf
+                    value = {key: value}
+                container[key] = value
+            else:
+                item = value
+                if not has_children and key_id >= 0 and key_table[key_id]:
+                    item = {key_table[key_id]: value}
+                if container is None:
+                    result = item
+                else:
+                    container.append(item)
+
+            if has_children:
+                stack.append((index, value))
+
+        return result
+
+
+class _DocumentBuilder:
+    """
+    lxml parser target filling a Document from start/end events, so no element
+    tree is built. A node with children is an object when any child has a key,
+    a list otherwise; a node without children is a leaf of its `type`.
+
+    Every ITEM is checked against the ParseOptions as it opens, so a document
+    breaking them fails before the rest of it is parsed.
+    """
+
+    def __init__(self, options: ParseOptions = DEFAULT_PARSE_OPTIONS) -> None:
+        document = self.document = Document()
+        self.kinds, self.parents = document.kinds, document.parents
+        self.keys, self.values = document.keys, document.values
+        self.key_id = document._key_id
+        self.options = options
+        # one frame per open element: [index, attributes, has children, has a keyed child]
+        self.stack: List[List[Any]] = []
+
+    def start(self, tag: str, attrib: Mapping[str, str]) -> None:
+        stack = self.stack
+        index = len(self.kinds)
+        _check_item(tag, attrib, len(stack) + 1, index + 1, self.options)
+
+        key = attrib.get("key")
+        if stack:
+            frame = stack[-1]
+            frame[2] = True
+            if key is not None:
+                frame[3] = True
+            parent = frame[0]
+        else:
+            parent = -1
+        self.kinds.append(_NULL)
+        self.parents.append(parent)
+        self.keys.append(-1 if key is None else self.key_id(key))
+        self.values.append(-1)
+        stack.append([index, attrib, False, False])
+
+    def end(self, tag: str) -> None:
+        index, attrib, has_children, has_keyed_child = self.stack.pop()
+        if has_children:
+            self.kinds[index] = _OBJECT if has_keyed_child else _LIST
+            return
+
+        # mirrors XMLParser._parse_etree_node_leaf
+        type_name = attrib.get("type")
+        raw = attrib.get("value")
+        parser = _LEAF_PARSERS.get(type_name) if raw is not None else None
+        if parser is None:
+            etype = XMLElementType(type_name)
+            etype.parse_element_value(raw)
+            self.kinds[index] = _KINDS[etype.value]
+            return
+        try:
+            value = parser(raw)
+        except (ValueError, OverflowError) as e:
+            raise _invalid_leaf(type_name, raw) from e
+        self.document._set_value(index, _KINDS[type_name], value)
+
+    doctype = staticmethod(_reject_doctype)
+
+    def data(self, data: str) -> None:
+        if self.options.validate:
+            _check_text(data)
+
+    def close(self) -> Document:
+        return self.document
+
+
+class _JSONStreamWriter:
+    """
+    Turns the iterparse start/end events of `XMLParser.iter_json_from_file`
+    into JSON text, checking every ITEM against the ParseOptions as it opens.
+    """
+
+    def __init__(self, options: ParseOptions = DEFAULT_PARSE_OPTIONS) -> None:
+        self.options = options
+        # one frame per open element: [element, container type or None, has children]
+        self.stack: List[List[Any]] = []
+        self.parts: List[str] = []
+        self.buffered = 0
+        self.nodes = 0
+
+    def start(self, element: "_Element") -> None:
+        stack, parts = self.stack, self.parts
+        self.nodes += 1
+        if self.nodes == 1 and element.getroottree().docinfo.doctype:
+            _reject_doctype()
+        _check_item(element.tag, element.attrib, len(stack) + 1, self.nodes, self.options)
+        if stack:
+            parent = stack[-1]
+            key = element.get("key")
+            if not parent[2]:
+                parent[1] = XMLElementType.LIST if key is None else XMLElementType.OBJECT
+                parent[2] = True
+                parts.append("[" if parent[1] is XMLElementType.LIST else "{")
+            else:
+                parts.append(",")
+            if parent[1] is XMLElementType.OBJECT:
+                if not key:
+                    raise XMLParseError("Expected 'key' on object child")
+                parts.append(XMLParser._dump_json(key))
+                parts.append(":")
+            elif key is not None:
+                raise XMLParseError("Unexpected 'key' on list child")
+        stack.append([element, None, False])
+
+    def end(self, element: "_Element") -> None:
+        validate = self.options.validate
+        _, container, has_children = self.stack.pop()
+        if validate:
+            # the text before the first child, and after the last one not dropped yet
+            _check_text(element.text)
+            for child in element:
+                _check_text(child.tail)
+        if has_children:
+            self.parts.append("]" if container is XMLElementType.LIST else "}")
+        else:
+            self.parts.append(XMLParser._dump_json(self._leaf_value(element)))
+
+        # drop the converted subtree and everything before it
+        element.clear()
+        while element.getprevious() is not None:
+            if validate:
+                _check_text(element.getparent()[0].tail)
+            del element.getparent()[0]
+        self.buffered += len(self.parts[-1])
+
+    def _leaf_value(self, element: "_Element") -> Any:
+        # mirrors the leaf handling of `_parse_etree_to_json_type`
+        key = element.get("key")
+        in_object = bool(self.stack) and self.stack[-1][1] is XMLElementType.OBJECT
+        val = XMLParser._parse_etree_node_leaf(element)
+        if in_object and element.get("type") not in _CONTAINER_TYPES:
+            return val
+        return {key: val} if key else val
+
+    def flush(self) -> str:
+        """Return the JSON text written since the last flush"""
+        text = "".join(self.parts)
+        self.parts.clear()
+        self.buffered = 0
+        return text
 
 
 class XMLParser:
     """Robust XML↔JSONType parser with error handling and logging."""
 
     @staticmethod
-    def _parse_etree_node_leaf(element: _Element) -> Any:
-        etype = XMLElementType(element.get("type"))
+    def _parse_etree_node_leaf(element: "_Element") -> Any:
+        type_name = element.get("type")
         raw = element.get("value")
+        parser = _LEAF_PARSERS.get(type_name) if raw is not None else None
+        if parser is None:
+            # null and empty-object leaves, and invalid input
+            return XMLElementType(type_name).parse_element_value(raw)
         try:
-            return etype.parse_element_value(raw)
-        except Exception as e:
-            logger.exception("Leaf parse failed: %r type=%s", element, etype)
-            raise
+            return parser(raw)
+        except (ValueError, OverflowError) as e:
+            raise _invalid_leaf(type_name, raw) from e
 
     @staticmethod
-    def _parse_etree_to_json_type(node: _Element) -> JSONType:
+    def _open_etree_node(node: "_Element") -> Tuple[JSONType, Optional[List[Any]]]:
+        """
+        Convert a leaf node, or create the empty container for a non-leaf node.
+        Returns the value and, for containers, the frame to fill it from.
+        """
         children = list(node)
-        key = node.get("key")
-
-        # Leaf node
         if not children:
             val = XMLParser._parse_etree_node_leaf(node)
-            return {key: val} if key else val
+            key = node.get("key")
+            return ({key: val} if key else val), None
 
         # List vs Object
-        if all(child.get("key") is None for child in children):
-            return [XMLParser._parse_etree_to_json_type(c) for c in children]
-
-        obj: Dict[str, JSONType] = {}
-        for c in children:
-            ckey = c.get("key")
-            if not ckey:
-                raise XMLParseError("Expected 'key' on object child")
-            obj[ckey] = (
-                XMLParser._parse_etree_to_json_type(c)
-                if c.get("type") in ("object", "list")
-                else XMLParser._parse_etree_node_leaf(c)
-            )
-        return obj
+        container: Union[List[JSONType], Dict[str, JSONType]]
+        if any(child.get("key") is not None for child in children):
+            container = {}
+        else:
+            container = []
+        # keep `node` referenced: lxml walks up to the nearest live proxy
+        # whenever a child proxy is freed
+        return container, [node, iter(children), container]
 
     @staticmethod
-    def _parse_json_data_to_etree(data: JSONType) -> _Element:
-        etype = XMLElementType.from_value(data)
-        element = etree.Element("ITEM", type=etype.value)
+    def _parse_etree_to_json_type(node: "_Element") -> JSONType:
+        result, frame = XMLParser._open_etree_node(node)
+        stack = [frame] if frame is not None else []
 
-        if etype is XMLElementType.OBJECT:
-            for k, v in data.items():  # type: ignore
-                child = XMLParser._parse_json_data_to_etree(v)
-                child.set("key", k)
-                element.append(child)
+        while stack:
+            _, children, container = stack[-1]
+            child = next(children, None)
+            if child is None:
+                stack.pop()
+                continue
+
+            if type(container) is list:
+                value, frame = XMLParser._open_etree_node(child)
+                container.append(value)
+            else:
+                ckey = child.get("key")
+                if not ckey:
+                    raise XMLParseError("Expected 'key' on object child")
+                if child.get("type") in _CONTAINER_TYPES:
+                    value, frame = XMLParser._open_etree_node(child)
+                else:
+                    value, frame = XMLParser._parse_etree_node_leaf(child), None
+                container[ckey] = value
+
+            if frame is not None:
+                stack.append(frame)
 
+        return result
+
+    @staticmethod
+    def _json_item_attrib(value: Any, key: Optional[str]) -> Tuple[Dict[str, str], XMLElementType]:
+        value_type = type(value)
+        etype = _VALUE_TYPES.get(value_type) or XMLElementType.from_value(value)
+        attrib = {"type": etype.value}
+        if etype is not XMLElementType.OBJECT and etype is not XMLElementType.LIST:
+            formatter = _VALUE_FORMATTERS.get(value_type)
+            formatted = formatter(value) if formatter is not None else (
+                value if etype is XMLElementType.STRING else json.dumps(value)
+            )
+            if formatted is not None:
+                attrib["value"] = formatted
+        if key is not None:
+            attrib["key"] = key
+        return attrib, etype
+
+    @staticmethod
+    def _parse_json_data_to_etree(data: JSONType) -> "_Element":
+        attrib, etype = XMLParser._json_item_attrib(data, None)
+        root = _etree.Element("ITEM", attrib)
+        stack: List[Tuple["_Element", Iterator[Any], bool]] = []
+        if etype is XMLElementType.OBJECT:
+            stack.append((root, iter(data.items()), True))  # type: ignore
         elif etype is XMLElementType.LIST:
-            for v in data:  # type: ignore
-                element.append(XMLParser._parse_json_data_to_etree(v))
+            stack.append((root, iter(data), False))  # type: ignore
 
-        elif etype in (XMLElementType.STRING, XMLElementType.INTEGER,
-                       XMLElementType.FLOAT, XMLElementType.BOOLEAN):
-            # JSON-encode non-string leaves to preserve type
-            element.set("value", json.dumps(data) if etype is not XMLElementType.STRING else data)  # type: ignore
+        while stack:
+            parent, items, is_object = stack[-1]
+            item: Any = next(items, _END)
+            if item is _END:
+                stack.pop()
+                continue
 
-        # NULL: no value attribute
+            key, value = item if is_object else (None, item)
+            attrib, etype = XMLParser._json_item_attrib(value, key)
+            element = _etree.SubElement(parent, "ITEM", attrib)
+            if etype is XMLElementType.OBJECT:
+                stack.append((element, iter(value.items()), True))
+            elif etype is XMLElementType.LIST:
+                stack.append((element, iter(value), False))
 
-        return element
+        return root
 
     @staticmethod
-    def parse_xml_from_file(file: Any) -> JSONType:
+    @XML_PARSER_SECONDS.timed(operation="parse_xml_from_file")
+    def parse_xml_from_file(file: Any, options: ParseOptions = DEFAULT_PARSE_OPTIONS) -> JSONType:
         """
         Parse XML file to JSONType object.
         """
-        tree = parse(file)
-        return XMLParser._parse_etree_to_json_type(tree.getroot())
+        parser = _etree.XMLParser(target=_DocumentBuilder(options), **_PARSER_OPTIONS)
+        return _etree.parse(file, parser).to_json()
+
+    @staticmethod
+    def _dump_json(value: Any) -> str:
+        # same encoding options as starlette's JSONResponse
+        return json.dumps(value, ensure_ascii=False, allow_nan=False, separators=(",", ":"))
 
     @staticmethod
-    def parse_xml_from_string(xml_str: str) -> JSONType:
+    def iter_json_from_file(
+        file: Any,
+        chunk_size: int = STREAM_CHUNK_SIZE,
+        options: ParseOptions = DEFAULT_PARSE_OPTIONS,
+    ) -> Iterator[str]:
+        """
+        Incrementally convert an XML file to JSON text chunks.
+
+        Every ITEM is emitted as soon as it is closed and then cleared, so memory
+        is bounded by the depth of the document rather than by its size.
+        A container is a list when its first child has no `key`, an object otherwise.
+        """
+        writer = _JSONStreamWriter(options)
+        # the schema only reports at the end of the document; the writer's checks fail first
+        schema = item_schema() if options.validate else None
+        for event, element in _etree.iterparse(file, events=("start", "end"), schema=schema, **_PARSER_OPTIONS):
+            if event == "start":
+                writer.start(element)
+                continue
+            writer.end(element)
+            if writer.buffered >= chunk_size:
+                yield writer.flush()
+
+        if writer.parts:
+            yield writer.flush()
+
+    @staticmethod
+    @XML_PARSER_SECONDS.timed(operation="parse_xml_from_bytes")
+    def parse_xml_from_bytes(xml_bytes: BytesLike, options: ParseOptions = DEFAULT_PARSE_OPTIONS) -> JSONType:
+        """
+        Parse XML bytes to JSONType object.
+        """
+        return XMLParser.parse_xml_to_document(xml_bytes, options=options).to_json()
+
+    @staticmethod
+    @XML_PARSER_SECONDS.timed(operation="parse_xml_from_string")
+    def parse_xml_from_string(xml_str: str, options: ParseOptions = DEFAULT_PARSE_OPTIONS) -> JSONType:
         """
         Parse XML string to JSONType object.
         """
-        root = fromstring(xml_str.encode())
-        return XMLParser._parse_etree_to_json_type(root)
+        return XMLParser.parse_xml_to_document(xml_str.encode(), options=options).to_json()
 
     @staticmethod
-    def parse_json_to_element(data: JSONType) -> _Element:
+    def iter_xml_from_json_file(file: Any, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+        """
+        Incrementally convert a JSON file to XML byte chunks.
+
+        The input is consumed as a stream of parse events and every ITEM is written
+        through an incremental XML writer as soon as it is known, so memory stays
+        roughly constant regardless of the document size.
+        """
+        exact = _ijson.backend == "python"
+        try:
+            start = file.tell()
+        except (AttributeError, OSError):
+            start = None
+        events = _exact_json_events(file) if exact else _ijson.parse(file, use_float=True)
+        sent = 0
+        try:
+            for chunk in XMLParser._iter_xml_from_json_events(events, chunk_size):
+                sent += len(chunk)
+                yield chunk
+        except _ijson.IncompleteJSONError as e:
+            # the C backends read numbers into 64-bit integers and doubles
+            if exact or start is None or "overflow" not in str(e):
+                raise
+            # start over with the exact parser; the output up to the number is the
+            # same, so the part already sent is skipped
+            file.seek(start)
+            yield from _skip_bytes(XMLParser._iter_xml_from_json_events(_exact_json_events(file), chunk_size), sent)
+
+    @staticmethod
+    def _iter_xml_from_json_events(events: Iterator[Tuple[str, str, Any]], chunk_size: int) -> Iterator[bytes]:
+        sink = io.BytesIO()
+        with _etree.xmlfile(sink, encoding="utf-8", buffered=False) as xf:
+            open_items: List[Any] = []
+            # attributes of a container not written yet, written as an empty
+            # element if it ends before its first child
+            pending: Optional[Dict[str, str]] = None
+            key: Optional[str] = None
+
+            for _, event, value in events:
+                if event == "map_key":
+                    key = value
+                    continue
+
+                if event in ("end_map", "end_array"):
+                    if pending is None:
+                        open_items.pop().__exit__(None, None, None)
+                    else:
+                        xf.write(_etree.Element("ITEM", pending))
+                    pending = None
+                    continue
+
+                if pending is not None:
+                    item = xf.element("ITEM", pending)
+                    item.__enter__()
+                    open_items.append(item)
+                    pending = None
+                if event in ("start_map", "start_array"):
+                    etype = XMLElementType.OBJECT if event == "start_map" else XMLElementType.LIST
+                    pending = {"type": etype.value}
+                    if key is not None:
+                        pending["key"] = key
+                else:
+                    attrib, _ = XMLParser._json_item_attrib(value, key)
+                    xf.write(_etree.Element("ITEM", attrib))
+                key = None
+
+                if sink.tell() >= chunk_size:
+                    yield sink.getvalue()
+                    sink.seek(0)
+                    sink.truncate()
+
+        if sink.tell():
+            yield sink.getvalue()
+
+    @staticmethod
+    @XML_PARSER_SECONDS.timed(operation="parse_xml_to_document")
+    def parse_xml_to_document(
+        xml_bytes: BytesLike,
+        progress: Optional[Callable[[int], None]] = None,
+        options: ParseOptions = DEFAULT_PARSE_OPTIONS,
+    ) -> Document:
+        """
+        Parse XML bytes straight into a Document, without building an element tree.
+        The input is fed to the parser in slices, so buffers such as a memory-mapped
+        upload are never copied whole and input breaking `options` is rejected
+        as soon as the offending ITEM is reached.
+
+        `progress` is called with the number of bytes parsed after each slice;
+        an exception it raises aborts the parse.
+        """
+        parser = _etree.XMLParser(target=_DocumentBuilder(options), **_PARSER_OPTIONS)
+        for offset in range(0, len(xml_bytes), FEED_CHUNK_SIZE):
+            parser.feed(bytes(xml_bytes[offset:offset + FEED_CHUNK_SIZE]))
+            if progress is not None:
+                progress(min(offset + FEED_CHUNK_SIZE, len(xml_bytes)))
+        return parser.close()
+
+    @staticmethod
+    @XML_PARSER_SECONDS.timed(operation="document_to_xml")
+    def document_to_xml(document: Document, encoding: str = "utf-8") -> bytes:
+        """
+        Serialize a Document to a compact XML byte string, as `_etree.tostring` would
+        serialize the equivalent element tree, without building one.
+        """
+        kinds, parents, keys = document.kinds, document.parents, document.keys
+        value_attribute = document._value_attribute
+        key_attributes = [f' key="{_escape_attribute(key)}"' for key in document.key_table]
+        count = len(kinds)
+        parts: List[str] = []
+        open_items: List[int] = []
+
+        for index in range(count):
+            parent = parents[index]
+            while open_items and open_items[-1] != parent:
+                open_items.pop()
+                parts.append("</ITEM>")
+
+            parts.append(f'<ITEM type="{_KIND_NAMES[kinds[index]]}"')
+            parts.append(value_attribute(index))
+            if keys[index] >= 0:
+                parts.append(key_attributes[keys[index]])
+
+            if index + 1 < count and parents[index + 1] == index:
+                parts.append(">")
+                open_items.append(index)
+            else:
+                parts.append("/>")
+
+        parts.extend("</ITEM>" for _ in open_items)
+        xml = "".join(parts)
+        if encoding.lower().replace("-", "") in ("utf8", "ascii", "usascii"):
+            return xml.encode(encoding, "xmlcharrefreplace")
+        return f"<?xml version='1.0' encoding='{encoding}'?>\n{xml}".encode(encoding, "xmlcharrefreplace")
+
+    @staticmethod
+    @XML_PARSER_SECONDS.timed(operation="parse_json_to_element")
+    def parse_json_to_element(data: JSONType) -> "_Element":
         """
         Convert JSONType object to an lxml Element.
         """
         return XMLParser._parse_json_data_to_etree(data)
 
     @staticmethod
-    def to_pretty_xml(element: _Element, encoding: str = "utf-8") -> bytes:
+    @XML_PARSER_SECONDS.timed(operation="json_bytes_to_xml")
+    def json_bytes_to_xml(
+        json_bytes: BytesLike,
+        encoding: str = "utf-8",
+        loads: Callable[[BytesLike], JSONType] = json_loads,
+    ) -> bytes:
+        """
+        Convert a JSON document to a compact XML byte string.
+        Pass another `loads` for documents in an equivalent format such as MessagePack,
+        or one reading buffers other than bytes.
+        """
+        return XMLParser.document_to_xml(Document.from_json(loads(json_bytes)), encoding)
+
+    @staticmethod
+    @XML_PARSER_SECONDS.timed(operation="to_pretty_xml")
+    def to_pretty_xml(element: "_Element", encoding: str = "utf-8") -> bytes:
         """
         Return a pretty-printed XML byte string.
         """
-        return etree.tostring(
+        return _etree.tostring(
             element,
             pretty_print=True,
             xml_declaration=True,
@@ -1,25 +1,41 @@
+import asyncio
 import logging
+from functools import partial
+from typing import List
 
-import uvicorn
 from fastapi import FastAPI
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import Response
 from starlette import status
 from starlette.middleware.cors import CORSMiddleware
 from starlette.requests import Request
 
 from src.config.settings import get_settings
-from src.core.database import DatabaseConnection
-from src.core.responses import error_response
-from src.routers import api_router
+from src.core.batch import ArchiveLimits
+from src.core.cache import EntityCache
+from src.core.compression import CompressionMiddleware, ContentCodings
+from src.core.conversion_cache import ConversionCache
+from src.core.database import AsyncDatabaseConnectionPool, DatabaseConnectionPool, PoolTimeoutError
+from src.core.executor import ConversionExecutor, ExecutorRejectedError
+from src.core.jobs import JobQueue, JobQueueFullError
+from src.core.metrics import MetricsMiddleware
+from src.core.profiler import PROFILER, ProfilingMiddleware
+from src.core.responses import FastJSONResponse, error_response
+from src.core.startup import StartupProfile, WarmUpStep, load_openapi, warm_up
+from src.core.uploads import configure_spooling
+from src.core.xml_parser import ParseOptions, item_schema, load_converter
+from src.routers import include_routers
+from src.routers.template import load_templates
 
 settings = get_settings()
+configure_spooling(settings.uploads.spool_max_size)
 
 app = FastAPI(
     title=settings.api_config.title,
     description=settings.api_config.description,
     version=settings.api_config.version,
     docs_url=settings.api_config.docs_url,
+    default_response_class=FastJSONResponse,
 )
 
 app.add_middleware(
@@ -28,39 +44,142 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+compression = settings.compression
+if compression.enabled:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=compression.minimum_size,
+        gzip_level=compression.gzip_level,
+        brotli_quality=compression.brotli_quality,
+        zstd_level=compression.zstd_level,
+        offload_min_bytes=compression.offload_min_bytes,
+        encodings=compression.encodings,
+    )
+app.add_middleware(ProfilingMiddleware)
+# outermost, so the recorded latency covers every other middleware
+app.add_middleware(MetricsMiddleware)
 
 
 @app.on_event("startup")
 async def startup_event() -> None:
+    profile = StartupProfile()
+    app.state.startup_profile = profile
     # setup logger
     logger = logging.getLogger("uvicorn.access")
     handler = logging.StreamHandler()
     handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
     logger.addHandler(handler)
     app.state.logger = logger
-    # setup db connection
-    db_connection = DatabaseConnection(dsn=settings.db_connection.postgres_uri)
-    app.state.db_connection = db_connection
+    # setup db connection pool
+    db_settings = settings.db_connection
+    db_pool = AsyncDatabaseConnectionPool(
+        dsn=db_settings.postgres_uri,
+        min_size=db_settings.pool_min_size,
+        max_size=db_settings.pool_max_size,
+        timeout=db_settings.pool_timeout,
+        health_check=db_settings.pool_health_check,
+        statement_cache_size=db_settings.statement_cache_size,
+    )
+    # opened after start-up by default, so the worker can answer health checks at once
+    startup = settings.startup
+    if not startup.background_pool_warmup:
+        await profile.run_async("db_pool", db_pool.open())
+    app.state.db_pool = db_pool
+    # blocking pool for server-side cursors; connections are only opened on demand
+    app.state.sync_db_pool = DatabaseConnectionPool(
+        dsn=db_settings.postgres_uri,
+        min_size=0,
+        max_size=db_settings.pool_max_size,
+        timeout=db_settings.pool_timeout,
+        health_check=db_settings.pool_health_check,
+        statement_cache_size=db_settings.statement_cache_size,
+    )
+    # setup entity cache
+    app.state.cache = EntityCache.from_settings(settings.cache)
+    # setup conversion executor
+    app.state.executor = ConversionExecutor.from_settings(settings.executor)
+    # setup conversion result cache
+    app.state.conversion_cache = ConversionCache.from_settings(settings.conversion_cache)
+    app.state.content_codings = ContentCodings.from_settings(settings.compression)
+
+    app.state.parse_options = ParseOptions.from_settings(settings.xml_parsing)
+    app.state.archive_limits = ArchiveLimits.from_settings(settings.uploads)
+
+    app.state.job_queue = JobQueue.from_settings(settings.jobs)
+    if app.state.job_queue is not None:
+        await app.state.job_queue.start()
+    # the /admin endpoints answer 404 without a token
+    admin_token = settings.admin.token
+    app.state.admin_token = admin_token.get_secret_value() if admin_token is not None else None
+    # setup profiler; it can also be switched on later through /admin/profiler
+    PROFILER.load_settings(settings.profiler)
+    if settings.profiler.enabled:
+        PROFILER.start()
+
+    # everything else is loaded after start-up, or by the first request needing it
+    steps: List[WarmUpStep] = []
+    if startup.preload_converter:
+        steps.append(("converter", load_converter))
+    if app.state.parse_options.validate:
+        steps.append(("item_schema", item_schema))
+    if startup.precompile_templates or startup.template_cache_dir:
+        steps.append(("templates", partial(load_templates, startup.template_cache_dir, startup.precompile_templates)))
+    if startup.precompile_openapi or startup.openapi_cache_file:
+        steps.append(("openapi", partial(load_openapi, app, startup.openapi_cache_file)))
+    pool_open = db_pool.open() if startup.background_pool_warmup else None
+    app.state.warm_up = asyncio.create_task(warm_up(profile, pool_open, steps))
+    profile.mark_ready()
 
 
 @app.on_event("shutdown")
 async def shutdown_event() -> None:
-    db_connection = app.state.db_connection
-    db_connection.close()
+    app.state.warm_up.cancel()
+    db_pool = app.state.db_pool
+    await db_pool.close()
+    app.state.sync_db_pool.close()
+    app.state.executor.shutdown()
+    if app.state.job_queue is not None:
+        await app.state.job_queue.stop()
+    PROFILER.stop()
 
 
 # exception handling
+@app.exception_handler(PoolTimeoutError)
+async def pool_timeout_handler(request: Request, exc: PoolTimeoutError) -> Response:
+    return error_response(errors=str(exc), status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+@app.exception_handler(ExecutorRejectedError)
+async def executor_rejected_handler(request: Request, exc: ExecutorRejectedError) -> Response:
+    return error_response(
+        errors=str(exc),
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={"Retry-After": "1"},
+    )
+
+
+@app.exception_handler(JobQueueFullError)
+async def job_queue_full_handler(request: Request, exc: JobQueueFullError) -> Response:
+    return error_response(
+        errors=str(exc),
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        headers={"Retry-After": "5"},
+    )
+
+
 @app.exception_handler(RequestValidationError)
 @app.exception_handler(Exception)
-async def exception_handler(request: Request, exc: Exception) -> JSONResponse:
+async def exception_handler(request: Request, exc: Exception) -> Response:
     logger = request.app.state.logger
     logger.error(f"{exc}")
     return error_response(errors=str(exc), status_code=status.HTTP_400_BAD_REQUEST)
 
 
-app.include_router(api_router)
+include_routers(app)
 
 if __name__ == "__main__":
+    import uvicorn
+
     settings = get_settings()
     server = settings.uvicorn
     uvicorn.run(
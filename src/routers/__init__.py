@@ -1,48 +1,74 @@
-from fastapi import APIRouter
+from enum import Enum
+from typing import List, Tuple, Union
 
-from src.routers import template, user, xml_json, products, orders
+from fastapi import APIRouter, Depends, FastAPI
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
+
+from src.core.cache import EntityCache
+from src.core.dependencies import get_entity_cache
+from src.core.metrics import CONTENT_TYPE, REGISTRY, runtime_families
+
+from src.routers import admin, template, user, xml_json, products, orders
 
 api_router = APIRouter(
     prefix="/api/v1",
     responses={404: {"description": "Not Found"}},
 )
 
+
 # Health check
 @api_router.get("/health", summary="Service health check")
 async def health_check():
     return {"status": "ok"}
 
-# XML/JSON conversion routes
-api_router.include_router(
-    xml_json.router,
-    prefix="/convert",
-    tags=["XML/JSON Conversion"],
-)
 
-# User routes
-api_router.include_router(
-    user.router,
-    prefix="/users",
-    tags=["Users"],
-)
+# Cache counters
+@api_router.get("/cache/stats", summary="Entity cache hit/miss/eviction counters")
+async def cache_stats(cache: EntityCache = Depends(get_entity_cache)):
+    return cache.stats()
 
-# Product routes
-api_router.include_router(
-    products.router,
-    prefix="/products",
-    tags=["Products"],
-)
 
-# Order routes
-api_router.include_router(
-    orders.router,
-    prefix="/orders",
-    tags=["Orders"],
+# Prometheus metrics
+@api_router.get(
+    "/metrics",
+    summary="Latency histograms and pool, cache and in-flight gauges",
+    response_class=PlainTextResponse,
 )
+async def metrics(request: Request):
+    state = request.app.state
+    families = runtime_families(
+        pools={"async": getattr(state, "db_pool", None), "sync": getattr(state, "sync_db_pool", None)},
+        cache=getattr(state, "cache", None),
+        executor=getattr(state, "executor", None),
+        conversion_cache=getattr(state, "conversion_cache", None),
+        jobs=getattr(state, "job_queue", None),
+    )
+    return PlainTextResponse(REGISTRY.render(families), media_type=CONTENT_TYPE)
+
 
-# Form template routes
-api_router.include_router(
-    template.router,
-    prefix="/templates",
-    tags=["Form Templates"],
+# (router, prefix under api_router's, tags); see `include_routers`
+SUBROUTERS: Tuple[Tuple[APIRouter, str, List[Union[str, Enum]]], ...] = (
+    (xml_json.router, "/convert", ["XML/JSON Conversion"]),
+    (user.router, "/users", ["Users"]),
+    (products.router, "/products", ["Products"]),
+    (orders.router, "/orders", ["Orders"]),
+    (template.router, "/templates", ["Form Templates"]),
+    (admin.router, "/admin", ["Admin"]),
 )
+
+
+def include_routers(app: FastAPI) -> None:
+    """
+    Add every route to `app`. FastAPI rebuilds each route it includes, so the
+    sub-routers are included into the application directly, under api_router's
+    prefix, rather than through api_router, which would build them once more.
+    """
+    app.include_router(api_router)
+    for router, prefix, tags in SUBROUTERS:
+        app.include_router(
+            router,
+            prefix=api_router.prefix + prefix,
+            tags=tags,
+            responses=api_router.responses,
+        )
@@ -0,0 +1,45 @@
+from fastapi import APIRouter, Depends
+from starlette.concurrency import run_in_threadpool
+
+from src.core.dependencies import get_startup_profile, require_admin_token
+from src.core.profiler import PROFILER
+from src.core.responses import success_response
+from src.core.startup import StartupProfile
+from src.schemas.requests import ProfilerUpdateRequest
+
+router = APIRouter(dependencies=[Depends(require_admin_token)])
+
+
+@router.get("/profiler", summary="Sampling profiler state and thresholds")
+async def get_profiler():
+    return success_response(data=PROFILER.status())
+
+
+@router.post("/profiler", summary="Switch the sampling profiler on or off and tune its thresholds")
+async def update_profiler(payload: ProfilerUpdateRequest):
+    """
+    Update the profiler at runtime, without a restart.
+
+    While enabled, requests slower than `slow_request_seconds` leave a collapsed-stack
+    profile in the configured output directory, and read-only queries slower than
+    `slow_query_seconds` have their `EXPLAIN (ANALYZE, BUFFERS)` plan logged.
+    """
+    options = payload.dict(exclude_none=True)
+    enabled = options.pop("enabled", None)
+    PROFILER.configure(**options)
+    if enabled is True:
+        PROFILER.start()
+    elif enabled is False:
+        # joins the sampler thread
+        await run_in_threadpool(PROFILER.stop)
+    return success_response(data=PROFILER.status())
+
+
+@router.get("/startup", summary="Start offset and duration of this worker's start-up phases")
+async def get_startup_profile_report(profile: StartupProfile = Depends(get_startup_profile)):
+    """
+    `ready_seconds` is when the worker began accepting requests; phases with a
+    later offset, such as `db_pool` when it is warmed up in the background, ran
+    while it already did. A failed phase has its `error` set.
+    """
+    return success_response(data=profile.to_dict())
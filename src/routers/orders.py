@@ -1,9 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from starlette.requests import Request
+from typing import List, Optional
 from uuid import UUID
 
-from src.core.database import DatabaseConnection
-from src.core.dependencies import get_db_connection
+from src.core.bulk import (
+    DEFAULT_CHUNK_SIZE,
+    MAX_CHUNK_SIZE,
+    BulkRowError,
+    bulk_apply,
+    bulk_result,
+    read_bulk_payload,
+    validate_bulk_rows,
+)
+from src.core.cache import EntityCache
+from src.core.conditional import ROW_VERSION, Validators, without_row_version
+from src.core.database import AsyncDatabaseConnection, DatabaseConnectionPool, ResultRow
+from src.core.dependencies import get_db_connection, get_entity_cache, get_response_codec, get_sync_db_pool
+from src.core.formats import CodecRoute
+from src.core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, Keyset, keyset_export_response
 from src.schemas.requests import OrderCreateRequest
 from src.schemas.responses import OrderListResponse, OrderResponse
 from src.core.responses import success_response
@@ -11,27 +25,100 @@ from src.core.responses import success_response
 router = APIRouter(
     prefix="/orders",
     tags=["orders"],
-    responses={404: {"description": "Not found"}}
+    responses={404: {"description": "Not found"}},
+    route_class=CodecRoute,
+    dependencies=[Depends(get_response_codec)],
+)
+
+
+class ProductsUnavailableError(BulkRowError):
+    """Raised when some product of an order is unknown or short of stock."""
+    pass
+
+
+ORDERS_KEYSET = Keyset("orders", ("created_at", "id"), descending=True)
+
+# Resolves every product of the order in one statement: duplicate ids are grouped
+# into quantities, stock is decremented only where enough is left, and the order
+# row is inserted only when all requested products could be reserved. A single
+# row is always returned so a rejected order still reports what was unavailable.
+CREATE_ORDER_QUERY = """
+WITH requested AS (
+    SELECT product_id, count(*) AS quantity
+    FROM unnest(%(product_ids)s::uuid[]) AS product_id
+    GROUP BY product_id
+),
+reserved AS (
+    UPDATE products AS p
+    SET in_stock = p.in_stock - r.quantity
+    FROM requested AS r
+    WHERE p.id = r.product_id AND p.in_stock >= r.quantity
+    RETURNING p.*
+),
+created AS (
+    INSERT INTO orders (user_email, product_ids)
+    SELECT %(user_email)s, %(product_ids)s::uuid[]
+    WHERE (SELECT count(*) FROM reserved) = (SELECT count(*) FROM requested)
+    RETURNING *
 )
+SELECT
+    (SELECT to_json(created) FROM created) AS "order",
+    (
+        SELECT coalesce(json_agg(to_json(reserved) ORDER BY ids.position), '[]'::json)
+        FROM unnest(%(product_ids)s::uuid[]) WITH ORDINALITY AS ids (product_id, position)
+        JOIN reserved ON reserved.id = ids.product_id
+    ) AS products,
+    (
+        SELECT sum(reserved.price * requested.quantity)
+        FROM reserved
+        JOIN requested ON requested.product_id = reserved.id
+    ) AS total_amount,
+    ARRAY(
+        SELECT requested.product_id
+        FROM requested
+        WHERE requested.product_id NOT IN (SELECT id FROM reserved)
+    ) AS unavailable
+"""
 
 
 @router.get("", response_model=OrderListResponse, summary="List orders")
 async def list_orders(
-    db: DatabaseConnection = Depends(get_db_connection),
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncDatabaseConnection = Depends(get_db_connection),
+):
+    query, params = ORDERS_KEYSET.page_query(cursor, limit)
+    rows = await db.query_all(query, params)
+    validators = Validators.for_rows(rows, ORDERS_KEYSET.columns)
+    if validators.not_modified(request.headers):
+        return validators.not_modified_response()
+    orders, next_cursor = ORDERS_KEYSET.page(rows, limit)
+    return success_response(data=orders, next_cursor=next_cursor, headers=validators.headers())
+
+
+@router.get("/export", summary="Stream all orders as NDJSON")
+async def export_orders(
+    cursor: Optional[str] = None,
+    pool: DatabaseConnectionPool = Depends(get_sync_db_pool),
 ):
-    orders = db.query_all("SELECT * FROM orders ORDER BY created_at DESC")
-    return success_response(data=orders)
+    return await keyset_export_response(pool, ORDERS_KEYSET, cursor)
 
 
 @router.get("/{order_id}", response_model=OrderResponse, summary="Get an order")
 async def get_order(
     order_id: UUID,
-    db: DatabaseConnection = Depends(get_db_connection),
+    request: Request,
+    db: AsyncDatabaseConnection = Depends(get_db_connection),
 ):
-    order = db.query_one("SELECT * FROM orders WHERE id = %s", (order_id,))
+    order = await db.query_one(f"SELECT *, {ROW_VERSION} FROM orders WHERE id = %s", (order_id,))
     if not order:
         raise HTTPException(status.HTTP_404_NOT_FOUND, detail="Order not found")
-    return success_response(data=order)
+    # orders are never updated through the API, their creation time is their last change
+    validators = Validators.for_rows((order,), ("id",), modified_column="created_at")
+    if validators.not_modified(request.headers):
+        return validators.not_modified_response()
+    return success_response(data=without_row_version(order), headers=validators.headers())
 
 
 @router.post(
@@ -42,11 +129,58 @@ async def get_order(
 )
 async def create_order(
     payload: OrderCreateRequest,
-    db: DatabaseConnection = Depends(get_db_connection),
+    db: AsyncDatabaseConnection = Depends(get_db_connection),
+    cache: EntityCache = Depends(get_entity_cache),
 ):
-    # flatten items into a DB insert — you’ll need your own SQL here
-    created = db.query_one(
-        "INSERT INTO orders (user_email, product_ids) VALUES (%s, %s) RETURNING *",
-        (payload.user_email, payload.product_ids),
+    # reserve stock and insert the order atomically; a partial reservation is
+    # rolled back by leaving the transaction with the 409
+    try:
+        async with db.transaction():
+            result = await _create_order_row(db, payload)
+    except ProductsUnavailableError as e:
+        raise HTTPException(status.HTTP_409_CONFLICT, detail=str(e))
+    # their stock and row version changed; once committed, so no reader caches the old row again
+    for product in result["products"]:
+        await cache.invalidate("product", product["id"])
+    order = {**result["order"], "products": result["products"], "total_amount": result["total_amount"]}
+    return success_response(data=order)
+
+
+async def _create_order_row(db: AsyncDatabaseConnection, payload: OrderCreateRequest) -> ResultRow:
+    """Reserve the products and insert the order; the caller's transaction or savepoint is rolled back on errors"""
+    result = await db.query_one(
+        CREATE_ORDER_QUERY,
+        {"user_email": payload.user_email, "product_ids": payload.product_ids},
     )
-    return success_response(data=created)
+    if result is None:
+        # the statement always returns one row
+        raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Order could not be created")
+    if result["order"] is None:
+        unavailable = ", ".join(str(product_id) for product_id in result["unavailable"])
+        raise ProductsUnavailableError(f"Products unavailable or out of stock: {unavailable}")
+    return result
+
+
+@router.post(
+    "/bulk",
+    summary="Create orders in bulk",
+)
+async def create_orders_bulk(
+    request: Request,
+    chunk_size: int = Query(DEFAULT_CHUNK_SIZE, ge=1, le=MAX_CHUNK_SIZE),
+    db: AsyncDatabaseConnection = Depends(get_db_connection),
+    cache: EntityCache = Depends(get_entity_cache),
+):
+    """
+    Create orders from a JSON array or an NDJSON body (`application/x-ndjson`).
+
+    Each order reserves the stock of its products like a single order does, one
+    transaction per chunk of `chunk_size` orders, in the order they are given.
+    Returns the number of created orders and the errors of the rejected ones by index,
+    including those whose products are unavailable or out of stock.
+    """
+    rows, errors = validate_bulk_rows(await read_bulk_payload(request), OrderCreateRequest)
+    created, create_errors = await bulk_apply(db, rows, _create_order_row, chunk_size)
+    for product_id in {product["id"] for result in created for product in result["products"]}:
+        await cache.invalidate("product", product_id)
+    return success_response(data=bulk_result(len(created), errors + create_errors))
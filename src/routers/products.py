@@ -1,9 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from typing import Any, List, Optional, Sequence
 from uuid import UUID
 
-from src.core.database import DatabaseConnection
-from src.core.dependencies import get_db_connection
+from src.core.bulk import (
+    DEFAULT_CHUNK_SIZE,
+    MAX_CHUNK_SIZE,
+    bulk_insert,
+    bulk_result,
+    copy_bulk_rows,
+    read_bulk_payload,
+    validate_bulk_rows,
+)
+from src.core.cache import EntityCache
+from src.core.conditional import ROW_VERSION, Validators, without_row_version
+from src.core.database import AsyncDatabaseConnection, DatabaseConnectionPool
+from src.core.dependencies import get_db_connection, get_entity_cache, get_response_codec, get_sync_db_pool
+from src.core.formats import CodecRoute
+from src.core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, Keyset, keyset_export_response
 from src.core.responses import error_response, success_response
 from src.schemas.requests import ProductCreateRequest
 from src.schemas.responses import ProductListResponse, ProductResponse
@@ -11,27 +26,57 @@ from src.schemas.responses import ProductListResponse, ProductResponse
 router = APIRouter(
     prefix="/products",
     tags=["products"],
-    responses={404: {"description": "Not found"}}
+    responses={404: {"description": "Not found"}},
+    route_class=CodecRoute,
+    dependencies=[Depends(get_response_codec)],
 )
 
+PRODUCTS_KEYSET = Keyset("products", ("name", "id"))
+
 
 @router.get("", response_model=ProductListResponse, summary="List products")
 async def list_products(
-    db: DatabaseConnection = Depends(get_db_connection),
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncDatabaseConnection = Depends(get_db_connection),
+):
+    query, params = PRODUCTS_KEYSET.page_query(cursor, limit)
+    rows = await db.query_all(query, params)
+    validators = Validators.for_rows(rows, PRODUCTS_KEYSET.columns)
+    if validators.not_modified(request.headers):
+        return validators.not_modified_response()
+    prods, next_cursor = PRODUCTS_KEYSET.page(rows, limit)
+    return success_response(data=prods, next_cursor=next_cursor, headers=validators.headers())
+
+
+@router.get("/export", summary="Stream all products as NDJSON")
+async def export_products(
+    cursor: Optional[str] = None,
+    pool: DatabaseConnectionPool = Depends(get_sync_db_pool),
 ):
-    prods = db.query_all("SELECT * FROM products ORDER BY name")
-    return success_response(data=prods)
+    return await keyset_export_response(pool, PRODUCTS_KEYSET, cursor)
 
 
 @router.get("/{product_id}", response_model=ProductResponse, summary="Get a product")
 async def get_product(
     product_id: UUID,
-    db: DatabaseConnection = Depends(get_db_connection),
+    request: Request,
+    db: AsyncDatabaseConnection = Depends(get_db_connection),
+    cache: EntityCache = Depends(get_entity_cache),
 ):
-    prod = db.query_one("SELECT * FROM products WHERE id = %s", (product_id,))
+    # a cached row answers conditional requests without touching the database
+    prod = await cache.get_or_load(
+        "product",
+        product_id,
+        lambda: db.query_one(f"SELECT *, {ROW_VERSION} FROM products WHERE id = %s", (product_id,)),
+    )
     if not prod:
         raise HTTPException(status.HTTP_404_NOT_FOUND, detail="Product not found")
-    return success_response(data=prod)
+    validators = Validators.for_rows((prod,), ("id",))
+    if validators.not_modified(request.headers):
+        return validators.not_modified_response()
+    return success_response(data=without_row_version(prod), headers=validators.headers())
 
 
 @router.post(
@@ -42,10 +87,56 @@ async def get_product(
 )
 async def create_product(
     payload: ProductCreateRequest,
-    db: DatabaseConnection = Depends(get_db_connection),
+    db: AsyncDatabaseConnection = Depends(get_db_connection),
+    cache: EntityCache = Depends(get_entity_cache),
 ):
-    new = db.query_one(
+    new = await db.query_one(
         "INSERT INTO products (name, description, price, in_stock) VALUES (%s, %s, %s, %s) RETURNING *",
         (payload.name, payload.description, payload.price, payload.in_stock),
     )
+    if new is not None:
+        await cache.invalidate("product", new["id"])
     return success_response(data=new)
+
+
+PRODUCT_COLUMNS = ("name", "description", "price", "in_stock")
+
+
+def _product_values(payload: ProductCreateRequest) -> Sequence[Any]:
+    return (payload.name, payload.description, payload.price, payload.in_stock)
+
+
+@router.post(
+    "/bulk",
+    summary="Create products in bulk",
+)
+async def create_products_bulk(
+    request: Request,
+    chunk_size: int = Query(DEFAULT_CHUNK_SIZE, ge=1, le=MAX_CHUNK_SIZE),
+    copy: bool = False,
+    db: AsyncDatabaseConnection = Depends(get_db_connection),
+    pool: DatabaseConnectionPool = Depends(get_sync_db_pool),
+):
+    """
+    Create products from a JSON array or an NDJSON body (`application/x-ndjson`).
+
+    Rows are inserted in chunks of `chunk_size`, one transaction per chunk. With `copy`,
+    chunks are loaded with COPY FROM STDIN instead, which is faster but fails whole chunks.
+    Returns the number of inserted rows and the errors of the rejected ones by index.
+    """
+    rows, errors = validate_bulk_rows(await read_bulk_payload(request), ProductCreateRequest)
+    if copy:
+        copied, copy_errors = await run_in_threadpool(
+            copy_bulk_rows, pool, "products", PRODUCT_COLUMNS, rows, _product_values, chunk_size,
+        )
+        return success_response(data=bulk_result(copied, errors + copy_errors))
+
+    inserted, insert_errors = await bulk_insert(
+        db,
+        rows,
+        _product_values,
+        "INSERT INTO products (name, description, price, in_stock) VALUES %s RETURNING id",
+        "(%s, %s, %s, %s)",
+        chunk_size,
+    )
+    return success_response(data=bulk_result(len(inserted), errors + insert_errors))
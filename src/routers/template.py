@@ -1,11 +1,45 @@
+import os
+from typing import TYPE_CHECKING, Optional
+
 from fastapi import APIRouter
 from starlette.requests import Request
 from starlette.responses import HTMLResponse, Response
-from starlette.templating import Jinja2Templates
+
+if TYPE_CHECKING:
+    from starlette.templating import Jinja2Templates
 
 router = APIRouter()
 
-templates = Jinja2Templates(directory="src/templates")
+TEMPLATE_DIRECTORY = "src/templates"
+TEMPLATE_NAMES = ("index.html",)
+
+_templates: Optional["Jinja2Templates"] = None
+
+
+def load_templates(cache_dir: Optional[str] = None, precompile: bool = False) -> "Jinja2Templates":
+    """
+    Build the template loader used by the form routes. With `cache_dir`, compiled
+    templates are kept there as bytecode and reused by other workers; with
+    `precompile`, every template is compiled now instead of on its first request.
+    """
+    global _templates
+    from jinja2 import FileSystemBytecodeCache
+    from starlette.templating import Jinja2Templates
+
+    templates = Jinja2Templates(directory=TEMPLATE_DIRECTORY)
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        templates.env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+    if precompile:
+        for name in TEMPLATE_NAMES:
+            templates.get_template(name)
+    _templates = templates
+    return templates
+
+
+def get_templates() -> "Jinja2Templates":
+    """Return the template loader, built on first use so jinja2 is only imported by workers that render forms"""
+    return _templates if _templates is not None else load_templates()
 
 
 @router.get("/", response_class=HTMLResponse)
@@ -21,4 +55,4 @@ def get_basic_form(request: Request) -> Response:
     :param request: Request object
     :return: TemplateResponse with index html webpage
     """
-    return templates.TemplateResponse("index.html", {"request": request})
+    return get_templates().TemplateResponse("index.html", {"request": request})
@@ -1,10 +1,23 @@
 # src/api/users.py
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from starlette.requests import Request
+from typing import List, Optional
 
-from src.core.database import DatabaseConnection
-from src.core.dependencies import get_db_connection
+from src.core.bulk import (
+    DEFAULT_CHUNK_SIZE,
+    MAX_CHUNK_SIZE,
+    bulk_insert,
+    bulk_result,
+    read_bulk_payload,
+    validate_bulk_rows,
+)
+from src.core.cache import EntityCache
+from src.core.conditional import ROW_VERSION, Validators, without_row_version
+from src.core.database import AsyncDatabaseConnection, DatabaseConnectionPool
+from src.core.dependencies import get_db_connection, get_entity_cache, get_response_codec, get_sync_db_pool
+from src.core.formats import CodecRoute
+from src.core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, Keyset, keyset_export_response
 from src.core.responses import error_response, success_response
 from src.schemas.requests import UserCreateRequest
 from src.schemas.responses import UserListResponse, UserResponse
@@ -12,9 +25,13 @@ from src.schemas.responses import UserListResponse, UserResponse
 router = APIRouter(
     prefix="/users",
     tags=["users"],
-    responses={404: {"description": "Not found"}}
+    responses={404: {"description": "Not found"}},
+    route_class=CodecRoute,
+    dependencies=[Depends(get_response_codec)],
 )
 
+USERS_KEYSET = Keyset("users", ("email",))
+
 
 @router.get(
     "",
@@ -22,15 +39,29 @@ router = APIRouter(
     summary="List users",
 )
 async def list_users(
-    offset: int = 0,
-    limit: int = 10,
-    db: DatabaseConnection = Depends(get_db_connection),
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncDatabaseConnection = Depends(get_db_connection),
 ):
-    users = db.query_all(
-        "SELECT * FROM users ORDER BY email LIMIT %s OFFSET %s",
-        (limit, offset),
-    )
-    return success_response(data=users)
+    query, params = USERS_KEYSET.page_query(cursor, limit)
+    rows = await db.query_all(query, params)
+    validators = Validators.for_rows(rows, USERS_KEYSET.columns)
+    if validators.not_modified(request.headers):
+        return validators.not_modified_response()
+    users, next_cursor = USERS_KEYSET.page(rows, limit)
+    return success_response(data=users, next_cursor=next_cursor, headers=validators.headers())
+
+
+@router.get(
+    "/export",
+    summary="Stream all users as NDJSON",
+)
+async def export_users(
+    cursor: Optional[str] = None,
+    pool: DatabaseConnectionPool = Depends(get_sync_db_pool),
+):
+    return await keyset_export_response(pool, USERS_KEYSET, cursor)
 
 
 @router.get(
@@ -40,12 +71,22 @@ async def list_users(
 )
 async def get_user(
     email: str,
-    db: DatabaseConnection = Depends(get_db_connection),
+    request: Request,
+    db: AsyncDatabaseConnection = Depends(get_db_connection),
+    cache: EntityCache = Depends(get_entity_cache),
 ):
-    user = db.query_one("SELECT * FROM users WHERE email = %s", (email,))
+    # a cached row answers conditional requests without touching the database
+    user = await cache.get_or_load(
+        "user",
+        email,
+        lambda: db.query_one(f"SELECT *, {ROW_VERSION} FROM users WHERE email = %s", (email,)),
+    )
     if not user:
         raise HTTPException(status.HTTP_404_NOT_FOUND, detail="User not found")
-    return success_response(data=user)
+    validators = Validators.for_rows((user,), ("email",), modified_column="updated_at")
+    if validators.not_modified(request.headers):
+        return validators.not_modified_response()
+    return success_response(data=without_row_version(user), headers=validators.headers())
 
 
 @router.post(
@@ -56,21 +97,58 @@ async def get_user(
 )
 async def create_user(
     payload: UserCreateRequest,
-    db: DatabaseConnection = Depends(get_db_connection),
+    db: AsyncDatabaseConnection = Depends(get_db_connection),
+    cache: EntityCache = Depends(get_entity_cache),
 ):
-    # upsert and return the full user record
-    db.execute(
+    # upsert and return the full user record in a single round-trip
+    user = await db.query_one(
         """
         INSERT INTO users (email, value)
         VALUES (%s, %s)
-        ON CONFLICT (email) DO UPDATE SET value = EXCLUDED.value
+        ON CONFLICT (email) DO UPDATE SET value = EXCLUDED.value, updated_at = now()
+        RETURNING *
         """,
         (payload.email, payload.value),
     )
-    user = db.query_one("SELECT * FROM users WHERE email = %s", (payload.email,))
+    await cache.invalidate("user", payload.email)
     return success_response(data=user)
 
 
+@router.post(
+    "/bulk",
+    summary="Create or update users in bulk",
+)
+async def create_users_bulk(
+    request: Request,
+    chunk_size: int = Query(DEFAULT_CHUNK_SIZE, ge=1, le=MAX_CHUNK_SIZE),
+    db: AsyncDatabaseConnection = Depends(get_db_connection),
+    cache: EntityCache = Depends(get_entity_cache),
+):
+    """
+    Upsert users from a JSON array or an NDJSON body (`application/x-ndjson`).
+
+    Rows are written in chunks of `chunk_size`, one transaction per chunk.
+    Returns the number of written rows and the errors of the rejected ones by index.
+    """
+    rows, errors = validate_bulk_rows(await read_bulk_payload(request), UserCreateRequest)
+    written, write_errors = await bulk_insert(
+        db,
+        rows,
+        lambda payload: (payload.email, payload.value),
+        """
+        INSERT INTO users (email, value)
+        VALUES %s
+        ON CONFLICT (email) DO UPDATE SET value = EXCLUDED.value, updated_at = now()
+        RETURNING email
+        """,
+        "(%s, %s)",
+        chunk_size,
+    )
+    for user in written:
+        await cache.invalidate("user", user["email"])
+    return success_response(data=bulk_result(len(written), errors + write_errors))
+
+
 @router.delete(
     "/{email}",
     status_code=status.HTTP_204_NO_CONTENT,
@@ -78,7 +156,9 @@ async def create_user(
 )
 async def delete_user(
     email: str,
-    db: DatabaseConnection = Depends(get_db_connection),
+    db: AsyncDatabaseConnection = Depends(get_db_connection),
+    cache: EntityCache = Depends(get_entity_cache),
 ):
-    db.execute("DELETE FROM users WHERE email = %s", (email,))
+    await db.execute("DELETE FROM users WHERE email = %s", (email,))
+    await cache.invalidate("user", email)
     return success_response()
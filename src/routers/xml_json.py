@@ -1,30 +1,123 @@
+import codecs
+import itertools
 import json
-from typing import Optional, Union
+from functools import partial
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterator, Optional, Tuple, Union
 
 from fastapi import APIRouter, Depends, File, UploadFile
-from lxml import etree
 from starlette import status
-from starlette.responses import JSONResponse, Response
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import UploadFile as StarletteUploadFile
+from starlette.requests import Request
+from starlette.responses import Response, StreamingResponse
 
 from src.config.annotations import JSONType
-from src.core.dependencies import get_accept_request_header
-from src.core.responses import error_response, success_response
-from src.core.xml_parser import XMLParser
+from src.core.batch import (
+    ArchiveLimits,
+    BatchDocument,
+    decode_ndjson_string,
+    iter_batch_results,
+    iter_ndjson_documents,
+    iter_upload_documents,
+    spool_request_body,
+)
+from src.core.compression import ContentCoding
+from src.core.dependencies import (
+    RESPONSE_MEDIA_TYPES,
+    get_accept_request_header,
+    get_archive_limits,
+    get_content_coding,
+    get_conversion_cache,
+    get_conversion_executor,
+    get_job_queue,
+    get_parse_options,
+    get_response_codec,
+    negotiate,
+)
+from src.core.conversion_cache import ConversionCache, cached_response
+from src.core.executor import ConversionExecutor
+from src.core.formats import JSON_CODEC, RESPONSE_CODEC, Codec, UnsupportedMediaTypeError, codec_for, media_type_of
+from src.core.jobs import Job, JobQueue, JobStatus
+from src.core.responses import error_response, streaming_success_response, success_response
+from src.core.uploads import upload_buffer
+from src.core.xml_parser import BytesLike, Document, ParseOptions, XMLParser, json_loads
 
-router = APIRouter()
+router = APIRouter(dependencies=[Depends(get_response_codec)])
+
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonlines")
+
+XML_MEDIA_TYPES = ("text/xml", "application/xml")
+
+# the JSON envelope stays the default, XML comes before the binary envelopes
+JSON2XML_MEDIA_TYPES = RESPONSE_MEDIA_TYPES[:1] + XML_MEDIA_TYPES + RESPONSE_MEDIA_TYPES[1:]
+
+
+def _iter_json_string(chunks: Iterator[bytes]) -> Iterator[str]:
+    """Encode a stream of UTF-8 byte chunks as a single JSON string literal."""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    yield '"'
+    for chunk in chunks:
+        yield json.dumps(decoder.decode(chunk), ensure_ascii=False)[1:-1]
+    yield json.dumps(decoder.decode(b"", final=True), ensure_ascii=False)[1:-1]
+    yield '"'
+
+
+async def _cached_conversion(
+    conversions: Optional[ConversionCache],
+    coding: Optional[ContentCoding],
+    data: BytesLike,
+    key_parts: Tuple[Any, ...],
+    media_type: str,
+    produce: Callable[[], Awaitable[Response]],
+) -> Response:
+    """
+    Answer a conversion of `data` from the conversion cache, keyed on `data`,
+    `key_parts` and `coding`, or with the response of `produce`, whose body is then
+    cached. Bodies are compressed in `coding` once, before they are cached, instead
+    of by `CompressionMiddleware` on every hit.
+    """
+    if conversions is None:
+        return await produce()
+    encoding = coding.name if coding is not None else None
+    key = await conversions.key(data, *key_parts, encoding)
+    cached = conversions.get(key)
+    if cached is not None:
+        return cached_response(cached, media_type, encoding)
+    response = await produce()
+    if coding is None:
+        await conversions.put(key, response.body)
+        return response
+    body = await coding.compress(response.body)
+    await conversions.put(key, body)
+    return cached_response(body, media_type, encoding)
 
 
 @router.post("/xml2json")
-async def convert_xml2json_request(file: UploadFile = File(...)) -> JSONResponse:
+async def convert_xml2json_request(
+    file: UploadFile = File(...),
+    stream: bool = False,
+    codec: Codec = Depends(get_response_codec),
+    executor: ConversionExecutor = Depends(get_conversion_executor),
+    conversions: Optional[ConversionCache] = Depends(get_conversion_cache),
+    coding: Optional[ContentCoding] = Depends(get_content_coding),
+    options: ParseOptions = Depends(get_parse_options),
+) -> Union[Response, StreamingResponse]:
     """
     Convert XML to JSON
 
     Parameters:
     - **file**: XML file as multipart/form-data**: input JSON file as multipart/form-data
+    - **stream**: convert incrementally and stream the JSON body, for large documents
 
-    Returns JSON as a response.
+    Returns JSON as a response, or MessagePack or CBOR when the `accept` header prefers them.
+    Documents converted before are answered from the conversion cache, except when streaming.
     \f
     :param file: XML file as multipart/form-data
+    :param stream: convert incrementally and stream the JSON body; ignored for binary responses
+    :param codec: response format negotiated from the `accept` header
+    :param conversions: cache of converted bodies, None when disabled
+    :param coding: content coding cached bodies are compressed in, None to store them as they are
+    :param options: validation and limits applied while parsing
     """
     if file.content_type != "text/xml":
         return error_response(
@@ -32,43 +125,376 @@ async def convert_xml2json_request(file: UploadFile = File(...)) -> JSONResponse
             status_code=status.HTTP_400_BAD_REQUEST,
         )
 
-    xml_data: JSONType = XMLParser.parse_xml_from_file(file.file)
-    return success_response(xml_data)
+    if stream and codec is JSON_CODEC:
+        chunks = XMLParser.iter_json_from_file(file.file, options=options)
+        # convert the first chunk up front so malformed documents still get an error response
+        first = await run_in_threadpool(next, chunks, "")
+        return streaming_success_response(itertools.chain((first,), chunks))
+
+    # large uploads are parsed straight from their memory-mapped temporary file
+    async with upload_buffer(file) as file_data:
+
+        async def convert() -> Response:
+            xml_data: JSONType = await executor.run(
+                XMLParser.parse_xml_from_bytes, file_data, options, size=len(file_data),
+            )
+            return success_response(xml_data)
+
+        return await _cached_conversion(
+            conversions, coding, file_data, ("xml2json", codec.name, options), codec.media_type, convert
+        )
 
 
 @router.post("/json2xml")
 async def convert_json2xml_request(
     file: UploadFile = File(...),
+    stream: bool = False,
     accept_header: Optional[str] = Depends(get_accept_request_header),
-) -> Union[Response, JSONResponse]:
+    codec: Codec = Depends(get_response_codec),
+    executor: ConversionExecutor = Depends(get_conversion_executor),
+    conversions: Optional[ConversionCache] = Depends(get_conversion_cache),
+    coding: Optional[ContentCoding] = Depends(get_content_coding),
+) -> Union[Response, StreamingResponse]:
     """
     Endpoint that converts JSON to XML.
-    When `accept` request header is set to `text/xml`, returns XML as response.
-    Otherwise, returns JSON as response.
+    The input file may also be MessagePack or CBOR. The response format is
+    negotiated from the `accept` request header: XML when it prefers `text/xml`
+    or `application/xml`, otherwise the XML string in a JSON, MessagePack or CBOR envelope.
+    Documents converted before are answered from the conversion cache, except when streaming.
 
     Request Path parameters:
-    - **file**: input JSON file as multipart/form-data
+    - **file**: input JSON, MessagePack or CBOR file as multipart/form-data
+    - **stream**: convert incrementally and stream the body, for large JSON documents
     - **accept_header**: request header `accept`
 
     \f
-    :param file: input JSON file as multipart/form-data
+    :param file: input JSON, MessagePack or CBOR file as multipart/form-data
+    :param stream: convert incrementally and stream the body; JSON input and JSON or XML output only
     :param accept_header: request header `accept`
+    :param codec: envelope format negotiated from the `accept` header
+    :param conversions: cache of converted bodies, None when disabled
+    :param coding: content coding cached bodies are compressed in, None to store them as they are
     :returns: XML in data JSON key by default.
     """
-    if file.content_type != "application/json":
+    try:
+        input_codec = codec_for(file.content_type)
+    except UnsupportedMediaTypeError as e:
+        return error_response(str(e), status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+    if input_codec is None:
+        return error_response(
+            "'application/json', MessagePack or CBOR file's content type is required",
+            status_code=status.HTTP_400_BAD_REQUEST,
+        )
+    media_type = negotiate(accept_header, JSON2XML_MEDIA_TYPES)
+    if media_type is None:
+        return error_response(
+            f"Acceptable response types are {', '.join(JSON2XML_MEDIA_TYPES)}",
+            status_code=status.HTTP_406_NOT_ACCEPTABLE,
+        )
+    as_xml = media_type in XML_MEDIA_TYPES
+
+    if stream and input_codec is JSON_CODEC and (as_xml or media_type == JSON_CODEC.media_type):
+        chunks = XMLParser.iter_xml_from_json_file(file.file)
+        # convert the first chunk up front so malformed documents still get an error response
+        first = await run_in_threadpool(next, chunks, b"")
+        chunks = itertools.chain((first,), chunks)
+        if as_xml:
+            return StreamingResponse(chunks, media_type=media_type)
+        return streaming_success_response(_iter_json_string(chunks))
+
+    # convert the file to xml, off the event loop when it is large; large uploads
+    # are read straight from their memory-mapped temporary file
+    response_media_type = media_type if as_xml else codec.media_type
+    async with upload_buffer(file) as file_data:
+
+        async def convert() -> Response:
+            xml_data_str = await executor.run(
+                XMLParser.json_bytes_to_xml, file_data, "utf-8", _conversion_loads(input_codec), size=len(file_data),
+            )
+            if as_xml:
+                return Response(content=xml_data_str, media_type=media_type)
+            # a text string, not MessagePack/CBOR binary, in every envelope format
+            return success_response(xml_data_str.decode("utf-8"))
+
+        return await _cached_conversion(
+            conversions,
+            coding,
+            file_data,
+            ("json2xml", input_codec.name, response_media_type),
+            response_media_type,
+            convert,
+        )
+
+
+def _batch_media_type(request: Request) -> str:
+    return media_type_of(request.headers.get("content-type"))
+
+
+async def _get_batch_documents(
+    request: Request,
+    limits: ArchiveLimits,
+) -> Optional[AsyncIterator[BatchDocument]]:
+    """Return the batch documents of a multipart (`files` fields) or NDJSON request."""
+    media_type = _batch_media_type(request)
+    if media_type == "multipart/form-data":
+        form = await request.form()
+        files = [f for f in form.getlist("files") if isinstance(f, StarletteUploadFile)]
+        return iter_upload_documents(files, limits)
+    if media_type in NDJSON_CONTENT_TYPES:
+        return iter_ndjson_documents(await spool_request_body(request.stream()))
+    return None
+
+
+def _convert_json_document_to_xml(content: bytes) -> str:
+    return XMLParser.json_bytes_to_xml(content).decode("utf-8")
+
+
+def _convert_ndjson_xml_document_to_json(content: bytes, options: ParseOptions) -> JSONType:
+    return XMLParser.parse_xml_from_bytes(decode_ndjson_string(content), options)
+
+
+@router.post("/xml2json/batch")
+async def convert_xml2json_batch_request(
+    request: Request,
+    options: ParseOptions = Depends(get_parse_options),
+    limits: ArchiveLimits = Depends(get_archive_limits),
+) -> Union[Response, StreamingResponse]:
+    """
+    Convert many XML documents to JSON in one request.
+
+    Accepts either multipart/form-data with one or more `files` fields (zip and tar
+    archives are expanded), or an NDJSON body with one JSON-encoded XML string per line.
+
+    Streams back one NDJSON line per document with `index`, `name`, `success` and
+    either `data` or `errors`, so one bad document does not fail the batch.
+    \f
+    :param request: multipart or NDJSON request
+    :param options: validation and limits applied while parsing
+    :param limits: bounds on what uploaded archives may expand to
+    """
+    documents = await _get_batch_documents(request, limits)
+    if documents is None:
+        return error_response(
+            "'multipart/form-data' or 'application/x-ndjson' content type is required",
+            status_code=status.HTTP_400_BAD_REQUEST,
+        )
+    is_ndjson = _batch_media_type(request) in NDJSON_CONTENT_TYPES
+    convert = partial(
+        _convert_ndjson_xml_document_to_json if is_ndjson else XMLParser.parse_xml_from_bytes,
+        options=options,
+    )
+    return StreamingResponse(iter_batch_results(documents, convert), media_type="application/x-ndjson")
+
+
+@router.post("/json2xml/batch")
+async def convert_json2xml_batch_request(
+    request: Request,
+    limits: ArchiveLimits = Depends(get_archive_limits),
+) -> Union[Response, StreamingResponse]:
+    """
+    Convert many JSON documents to XML in one request.
+
+    Accepts either multipart/form-data with one or more `files` fields (zip and tar
+    archives are expanded), or an NDJSON body with one JSON document per line.
+
+    Streams back one NDJSON line per document with `index`, `name`, `success` and
+    either `data` (the XML string) or `errors`, so one bad document does not fail the batch.
+    \f
+    :param request: multipart or NDJSON request
+    :param limits: bounds on what uploaded archives may expand to
+    """
+    documents = await _get_batch_documents(request, limits)
+    if documents is None:
+        return error_response(
+            "'multipart/form-data' or 'application/x-ndjson' content type is required",
+            status_code=status.HTTP_400_BAD_REQUEST,
+        )
+    return StreamingResponse(
+        iter_batch_results(documents, _convert_json_document_to_xml),
+        media_type="application/x-ndjson",
+    )
+
+
+def _envelope(data: JSONType, codec: Codec) -> bytes:
+    """Return the body `success_response(data)` has when `codec` was negotiated, outside a request."""
+    token = RESPONSE_CODEC.set(codec)
+    try:
+        return success_response(data).body
+    finally:
+        RESPONSE_CODEC.reset(token)
+
+
+def _convert_xml2json_job(
+    codec: Codec,
+    options: ParseOptions,
+    source: BytesLike,
+    report: Callable[[float], None],
+) -> bytes:
+    # parsing is most of the work, and the only step that reports as it goes
+    size = len(source) or 1
+    document = XMLParser.parse_xml_to_document(source, lambda done: report(0.9 * done / size), options)
+    data = document.to_json()
+    report(0.95)
+    return _envelope(data, codec)
+
+
+def _conversion_loads(codec: Codec) -> Callable[[BytesLike], JSONType]:
+    """Loader of JSON to XML input, which has to keep the numbers the JSON codec would round"""
+    return json_loads if codec is JSON_CODEC else codec.loads
+
+
+def _convert_json2xml_job(
+    input_codec: Codec,
+    envelope: Optional[Codec],
+    source: BytesLike,
+    report: Callable[[float], None],
+) -> bytes:
+    document = Document.from_json(_conversion_loads(input_codec)(source))
+    report(0.5)
+    xml_data = XMLParser.document_to_xml(document)
+    report(0.9)
+    if envelope is None:
+        return xml_data
+    return _envelope(xml_data.decode("utf-8"), envelope)
+
+
+def _job_response(request: Request, job: Job, status_code: int = status.HTTP_200_OK) -> Response:
+    return success_response(
+        job.to_dict(),
+        status_code=status_code,
+        headers={"Location": request.url_for("get_conversion_job", job_id=job.id)},
+    )
+
+
+@router.post("/xml2json/jobs", status_code=status.HTTP_202_ACCEPTED)
+async def submit_xml2json_job(
+    request: Request,
+    file: UploadFile = File(...),
+    codec: Codec = Depends(get_response_codec),
+    jobs: JobQueue = Depends(get_job_queue),
+    options: ParseOptions = Depends(get_parse_options),
+) -> Response:
+    """
+    Queue an XML to JSON conversion and return its job right away.
+
+    Poll the job (its URL is in the `Location` header) for `status` and `progress`,
+    then fetch the result, in the format the `accept` header of this request preferred.
+    Answers 429 when too many jobs are waiting. A job is only known to the worker
+    process that accepted it, so with several workers, polls have to reach that one.
+    \f
+    :param file: XML file as multipart/form-data
+    :param codec: result format negotiated from the `accept` header
+    :param jobs: queue of background conversion jobs
+    :param options: validation and limits applied while parsing
+    """
+    if file.content_type != "text/xml":
         return error_response(
-            "'application/json' file's content type is required",
+            "'text/xml' file's content type is required",
             status_code=status.HTTP_400_BAD_REQUEST,
         )
-    # read the file and parse it to json
-    file_data = await file.read()
-    json_data = json.loads(file_data)
+    job = await jobs.submit(file, "xml2json", codec.media_type, partial(_convert_xml2json_job, codec, options))
+    return _job_response(request, job, status.HTTP_202_ACCEPTED)
+
 
-    # parse the xml from the json
-    xml_data = XMLParser.parse_xml_from_json(json_data)
-    xml_data_str = etree.tostring(xml_data, encoding="utf-8")
+@router.post("/json2xml/jobs", status_code=status.HTTP_202_ACCEPTED)
+async def submit_json2xml_job(
+    request: Request,
+    file: UploadFile = File(...),
+    accept_header: Optional[str] = Depends(get_accept_request_header),
+    codec: Codec = Depends(get_response_codec),
+    jobs: JobQueue = Depends(get_job_queue),
+) -> Response:
+    """
+    Queue a JSON, MessagePack or CBOR to XML conversion and return its job right away.
 
-    if accept_header == "text/xml":
-        return Response(content=xml_data_str, media_type="text/xml")
+    The result is XML when the `accept` header of this request prefers `text/xml` or
+    `application/xml`, otherwise the XML string in a JSON, MessagePack or CBOR envelope.
+    Answers 429 when too many jobs are waiting. A job is only known to the worker
+    process that accepted it, so with several workers, polls have to reach that one.
+    \f
+    :param file: input JSON, MessagePack or CBOR file as multipart/form-data
+    :param accept_header: request header `accept`
+    :param codec: envelope format negotiated from the `accept` header
+    :param jobs: queue of background conversion jobs
+    """
+    try:
+        input_codec = codec_for(file.content_type)
+    except UnsupportedMediaTypeError as e:
+        return error_response(str(e), status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+    if input_codec is None:
+        return error_response(
+            "'application/json', MessagePack or CBOR file's content type is required",
+            status_code=status.HTTP_400_BAD_REQUEST,
+        )
+    media_type = negotiate(accept_header, JSON2XML_MEDIA_TYPES)
+    if media_type is None:
+        return error_response(
+            f"Acceptable response types are {', '.join(JSON2XML_MEDIA_TYPES)}",
+            status_code=status.HTTP_406_NOT_ACCEPTABLE,
+        )
+
+    if media_type in XML_MEDIA_TYPES:
+        convert = partial(_convert_json2xml_job, input_codec, None)
     else:
-        return success_response(xml_data_str)
+        media_type = codec.media_type
+        convert = partial(_convert_json2xml_job, input_codec, codec)
+    job = await jobs.submit(file, "json2xml", media_type, convert)
+    return _job_response(request, job, status.HTTP_202_ACCEPTED)
+
+
+@router.get("/jobs/{job_id}", name="get_conversion_job")
+async def get_conversion_job(request: Request, job_id: str, jobs: JobQueue = Depends(get_job_queue)) -> Response:
+    """
+    Return the status and progress of a conversion job.
+    \f
+    :param job_id: id returned on submission
+    :param jobs: queue of background conversion jobs
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        return error_response("Job not found", status_code=status.HTTP_404_NOT_FOUND)
+    return _job_response(request, job)
+
+
+@router.get("/jobs/{job_id}/result")
+async def get_conversion_job_result(job_id: str, jobs: JobQueue = Depends(get_job_queue)) -> Response:
+    """
+    Return the result of a succeeded conversion job, streamed from the result store.
+
+    Answers 409 while the job is queued or running, 422 with the conversion
+    errors when it failed and 410 when it was cancelled or has expired.
+    \f
+    :param job_id: id returned on submission
+    :param jobs: queue of background conversion jobs
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        return error_response("Job not found", status_code=status.HTTP_404_NOT_FOUND)
+    if not job.finished:
+        return error_response(f"Job is {job.status.value}", status_code=status.HTTP_409_CONFLICT)
+    if job.status is JobStatus.FAILED:
+        return error_response(errors=job.error, status_code=status.HTTP_422_UNPROCESSABLE_ENTITY)
+    if job.status is JobStatus.CANCELLED:
+        return error_response("Job was cancelled", status_code=status.HTTP_410_GONE)
+
+    body = jobs.open_result(job)
+    if body is None:
+        if job.result_bytes == 0:
+            return Response(b"", media_type=job.media_type)
+        return error_response("Job result has expired", status_code=status.HTTP_410_GONE)
+    return cached_response(body, job.media_type)
+
+
+@router.delete("/jobs/{job_id}")
+async def cancel_conversion_job(job_id: str, jobs: JobQueue = Depends(get_job_queue)) -> Response:
+    """
+    Cancel a queued or running conversion job, or delete a finished one and its result.
+    A running job stops at its next progress report.
+    \f
+    :param job_id: id returned on submission
+    :param jobs: queue of background conversion jobs
+    """
+    job = jobs.cancel(job_id)
+    if job is None:
+        return error_response("Job not found", status_code=status.HTTP_404_NOT_FOUND)
+    return success_response(job.to_dict())
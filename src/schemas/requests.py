@@ -1,9 +1,10 @@
 from typing import List, Optional
 from uuid import UUID
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 
 
 class UserCreateRequest(BaseModel):
+    email: EmailStr
     value: str
 
 
@@ -16,4 +17,11 @@ class ProductCreateRequest(BaseModel):
 
 class OrderCreateRequest(BaseModel):
     user_email: EmailStr
-    product_ids: List[UUID]
\ No newline at end of file
+    product_ids: List[UUID] = Field(..., min_items=1)
+
+
+class ProfilerUpdateRequest(BaseModel):
+    enabled: Optional[bool] = None
+    sample_interval: Optional[float] = Field(None, gt=0)
+    slow_request_seconds: Optional[float] = Field(None, ge=0)
+    slow_query_seconds: Optional[float] = Field(None, ge=0)
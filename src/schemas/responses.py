@@ -11,7 +11,11 @@ class ServiceBaseResponse(BaseModel):
     errors: Optional[List[str]] = None
 
 
-class UserListResponse(ServiceBaseResponse):
+class PaginatedResponse(ServiceBaseResponse):
+    next_cursor: Optional[str] = None
+
+
+class UserListResponse(PaginatedResponse):
     data: List[User]
 
 
@@ -19,7 +23,7 @@ class UserResponse(ServiceBaseResponse):
     data: User
 
 
-class ProductListResponse(ServiceBaseResponse):
+class ProductListResponse(PaginatedResponse):
     data: List[Product]
 
 
@@ -27,7 +31,7 @@ class ProductResponse(ServiceBaseResponse):
     data: Product
 
 
-class OrderListResponse(ServiceBaseResponse):
+class OrderListResponse(PaginatedResponse):
     data: List[Order]
 
 
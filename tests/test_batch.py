@@ -0,0 +1,100 @@
+import asyncio
+import io
+import json
+import tarfile
+import zipfile
+from typing import Any, AsyncIterator, Dict, Iterator, List
+
+import pytest
+
+from src.core.batch import (
+    ArchiveLimits,
+    BatchDocument,
+    BatchError,
+    iter_batch_results,
+    iter_tar_documents,
+    iter_zip_documents,
+)
+
+MEMBERS = {"a.xml": b"<ITEM/>" * 200, "b.xml": b"<ITEM/>" * 300}
+# size of a zip local file header before its name and extra field
+ZIP_LOCAL_HEADER_SIZE = 30
+
+
+def _zip(members: Dict[str, bytes] = MEMBERS) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, content in members.items():
+            archive.writestr(name, content)
+    return buffer.getvalue()
+
+
+def _tar(members: Dict[str, bytes] = MEMBERS, mode: Any = "w:gz") -> bytes:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode=mode) as archive:
+        for name, content in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            archive.addfile(info, io.BytesIO(content))
+    return buffer.getvalue()
+
+
+def _corrupt_last_member(data: bytes) -> bytes:
+    """Flip a byte of the last member's compressed data, so only its CRC check fails"""
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        info = archive.infolist()[-1]
+    start = info.header_offset + ZIP_LOCAL_HEADER_SIZE + len(info.filename.encode()) + len(info.extra)
+    corrupt = bytearray(data)
+    corrupt[start + info.compress_size // 2] ^= 0xFF
+    return bytes(corrupt)
+
+
+def test_archives_yield_their_files() -> None:
+    assert dict(iter_zip_documents(io.BytesIO(_zip()))) == MEMBERS
+    for mode in ("w", "w:gz", "w:bz2", "w:xz"):
+        assert dict(iter_tar_documents(io.BytesIO(_tar(mode=mode)))) == MEMBERS
+
+
+@pytest.mark.parametrize(
+    "limits, message",
+    [
+        (ArchiveLimits(max_members=1), "more than 1 files"),
+        (ArchiveLimits(max_member_bytes=len(MEMBERS["a.xml"])), "'b.xml' is larger than"),
+        (ArchiveLimits(max_total_bytes=len(MEMBERS["a.xml"]) + 1), "expands to more than"),
+    ],
+)
+def test_archive_limits(limits: ArchiveLimits, message: str) -> None:
+    for documents in (iter_zip_documents(io.BytesIO(_zip()), limits), iter_tar_documents(io.BytesIO(_tar()), limits)):
+        with pytest.raises(BatchError, match=message):
+            list(documents)
+
+
+def _documents(documents: Iterator[BatchDocument]) -> AsyncIterator[BatchDocument]:
+    async def iterate() -> AsyncIterator[BatchDocument]:
+        for document in documents:
+            yield document
+
+    return iterate()
+
+
+def _results(documents: Iterator[BatchDocument]) -> List[Any]:
+    async def collect() -> List[Any]:
+        return [json.loads(line) async for line in iter_batch_results(_documents(documents), bytes.upper)]
+
+    return asyncio.run(collect())
+
+
+@pytest.mark.parametrize(
+    "documents",
+    [
+        lambda: iter_zip_documents(io.BytesIO(_corrupt_last_member(_zip()))),
+        lambda: iter_zip_documents(io.BytesIO(b"not a zip archive")),
+        lambda: iter_tar_documents(io.BytesIO(_tar()[:-100])),
+        lambda: iter_tar_documents(io.BytesIO(_tar(mode="w")[:600])),
+    ],
+)
+def test_corrupt_archives_end_with_an_error_line(documents: Any) -> None:
+    results = _results(documents())
+    assert [result["success"] for result in results[:-1]] == [True] * (len(results) - 1)
+    assert results[-1]["success"] is False
+    assert results[-1]["errors"][0].startswith("Invalid ")
@@ -0,0 +1,114 @@
+import asyncio
+import csv
+import io
+from contextlib import contextmanager
+from decimal import Decimal
+from typing import Any, Iterable, Iterator, List, Optional, Sequence, cast
+
+import psycopg2
+from pydantic import BaseModel
+
+from benchmarks.fakes import FakeDatabaseConnection
+from src.core.bulk import IndexedRow, bulk_insert, copy_bulk_rows
+from src.core.database import DatabaseConnection, ResultRow
+
+
+class Row(BaseModel):
+    name: Optional[str]
+    price: Decimal = Decimal("1.50")
+
+
+def _values(row: Row) -> Sequence[Any]:
+    return (row.name, row.price)
+
+
+def _rows(*names: Optional[str]) -> List[IndexedRow[Row]]:
+    return [(index, Row(name=name)) for index, name in enumerate(names)]
+
+
+class FailingDatabaseConnection(FakeDatabaseConnection):
+    """Fails every statement holding a row named "bad", recording the size of each attempt"""
+
+    def __init__(self) -> None:
+        super().__init__({})
+        self.attempts: List[int] = []
+
+    async def bulk_execute(
+        self,
+        query: str,
+        rows: Iterable[Sequence[Any]],
+        template: Optional[str] = None,
+        page_size: int = 1000,
+        fetch: bool = False,
+    ) -> List[ResultRow]:
+        rows = list(rows)
+        self.attempts.append(len(rows))
+        if any(row[0] == "bad" for row in rows):
+            raise psycopg2.IntegrityError("bad row")
+        return [{"name": row[0]} for row in rows]
+
+
+def test_bulk_insert_bisects_failing_chunks() -> None:
+    db = FailingDatabaseConnection()
+    rows = _rows("a", "b", "c", "d", "e", "bad", "g", "h", "i")
+    inserted, errors = asyncio.run(
+        bulk_insert(cast(Any, db), rows, _values, "INSERT INTO t VALUES %s", "(%s, %s)", chunk_size=4)
+    )
+
+    assert [row["name"] for row in inserted] == ["a", "b", "c", "d", "e", "g", "h", "i"]
+    assert errors == [{"index": 5, "errors": "bad row"}]
+    # the failing chunk is halved down to the bad row; the other chunks go in one statement
+    assert db.attempts == [4, 4, 2, 1, 1, 2, 1]
+
+
+class CopyConnection:
+    """Stands in for a psycopg2 connection, keeping the CSV each COPY sends"""
+
+    autocommit = False
+
+    def __init__(self) -> None:
+        self.copied: List[str] = []
+        self.rowcount = 0
+
+    def cursor(self) -> "CopyConnection":
+        return self
+
+    def __enter__(self) -> "CopyConnection":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        pass
+
+    def copy_expert(self, query: Any, buffer: io.StringIO) -> None:
+        data = buffer.read()
+        if '"bad"' in data:
+            raise psycopg2.DataError("bad row")
+        self.copied.append(data)
+        self.rowcount = len(list(csv.reader(io.StringIO(data))))
+
+
+class CopyPool:
+    def __init__(self) -> None:
+        self.conn = CopyConnection()
+
+    @contextmanager
+    def connection(self) -> Iterator[DatabaseConnection]:
+        yield DatabaseConnection(cast(Any, self.conn), statement_cache_size=0)
+
+
+def test_copy_bulk_rows_quotes_every_string() -> None:
+    pool = CopyPool()
+    rows = _rows(None, "", "\\N", 'say "hi"', "a,b\nc")
+    copied, errors = copy_bulk_rows(cast(Any, pool), "t", ("name", "price"), rows, _values)
+
+    assert (copied, errors) == (5, [])
+    assert pool.conn.copied == ['\\N,1.50\n"",1.50\n"\\N",1.50\n"say ""hi""",1.50\n"a,b\nc",1.50\n']
+
+
+def test_copy_bulk_rows_reports_every_row_of_a_failing_chunk() -> None:
+    pool = CopyPool()
+    rows = _rows("a", "bad", "c")
+    copied, errors = copy_bulk_rows(cast(Any, pool), "t", ("name", "price"), rows, _values, chunk_size=2)
+
+    assert copied == 1
+    assert errors == [{"index": 0, "errors": "bad row"}, {"index": 1, "errors": "bad row"}]
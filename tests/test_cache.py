@@ -0,0 +1,63 @@
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from src.config.settings import CacheSettings
+from src.core.cache import EntityCache
+from src.core.database import ResultRow
+
+
+class CountingLoader:
+    def __init__(self, row: Optional[Dict[str, Any]]) -> None:
+        self.row = row
+        self.calls: List[int] = []
+
+    async def __call__(self) -> Optional[ResultRow]:
+        self.calls.append(1)
+        return None if self.row is None else dict(self.row)
+
+
+def _load(cache: EntityCache, loader: CountingLoader, key: Any = 1) -> Optional[ResultRow]:
+    return asyncio.run(cache.get_or_load("product", key, loader))
+
+
+def test_rows_are_cached_until_invalidated() -> None:
+    cache = EntityCache.from_settings(CacheSettings())
+    loader = CountingLoader({"id": 1, "in_stock": 3})
+
+    assert _load(cache, loader) == {"id": 1, "in_stock": 3}
+    loader.row = {"id": 1, "in_stock": 2}
+    assert _load(cache, loader) == {"id": 1, "in_stock": 3}
+    assert len(loader.calls) == 1
+
+    asyncio.run(cache.invalidate("product", 1))
+    assert _load(cache, loader) == {"id": 1, "in_stock": 2}
+    assert len(loader.calls) == 2
+
+
+def test_invalidation_is_per_key() -> None:
+    cache = EntityCache.from_settings(CacheSettings())
+    loader = CountingLoader({"id": 1})
+    _load(cache, loader, 1)
+    _load(cache, loader, 2)
+
+    asyncio.run(cache.invalidate("product", 2))
+    _load(cache, loader, 1)
+    _load(cache, loader, 2)
+    assert len(loader.calls) == 3
+
+
+def test_missing_rows_are_not_cached() -> None:
+    cache = EntityCache.from_settings(CacheSettings())
+    loader = CountingLoader(None)
+    assert _load(cache, loader) is None
+    assert _load(cache, loader) is None
+    assert len(loader.calls) == 2
+
+
+def test_disabled_cache_always_loads() -> None:
+    for settings in (CacheSettings(enabled=False), CacheSettings(product_ttl=0)):
+        cache = EntityCache.from_settings(settings)
+        loader = CountingLoader({"id": 1})
+        _load(cache, loader)
+        _load(cache, loader)
+        assert len(loader.calls) == 2
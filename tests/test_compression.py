@@ -0,0 +1,75 @@
+import asyncio
+import gzip
+from typing import Any, Dict
+
+import pytest
+from starlette.responses import Response
+from starlette.testclient import TestClient
+from starlette.types import Receive, Scope, Send
+
+from src.core.compression import CompressionMiddleware, ContentCodings, choose_encoding
+
+BODY = b"<ITEM>value</ITEM>" * 100
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        (None, None),
+        ("", None),
+        ("identity", None),
+        ("gzip", "gzip"),
+        ("GZIP;q=0.5, br", "br"),
+        ("gzip;q=1, br;q=0.5", "gzip"),
+        ("gzip, br", "br"),
+        ("*", "zstd"),
+        ("*, zstd;q=0", "br"),
+        ("gzip;q=0", None),
+        ("gzip;q=abc", "gzip"),
+    ],
+)
+def test_choose_encoding(header: str, expected: str) -> None:
+    assert choose_encoding(header, ("zstd", "br", "gzip")) == expected
+
+
+def _client(body: bytes, headers: Dict[str, str], **options: Any) -> TestClient:
+    async def app(scope: Scope, receive: Receive, send: Send) -> None:
+        await Response(body, media_type="text/xml", headers=headers)(scope, receive, send)
+
+    return TestClient(CompressionMiddleware(app, encodings=("gzip",), **options))
+
+
+def test_bodies_below_minimum_size_are_sent_as_is() -> None:
+    response = _client(BODY, {}, minimum_size=len(BODY) + 1).get("/", headers={"accept-encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert response.content == BODY
+
+    response = _client(BODY, {}, minimum_size=len(BODY)).get("/", headers={"accept-encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) < len(BODY)
+    assert response.content == BODY
+
+
+def test_strong_etags_are_weakened() -> None:
+    client = _client(BODY, {"ETag": '"abc"'})
+    assert client.get("/", headers={"accept-encoding": "gzip"}).headers["etag"] == 'W/"abc"'
+    assert client.get("/", headers={"accept-encoding": "identity"}).headers["etag"] == '"abc"'
+    weak = _client(BODY, {"ETag": 'W/"abc"'})
+    assert weak.get("/", headers={"accept-encoding": "gzip"}).headers["etag"] == 'W/"abc"'
+
+
+def test_encoded_bodies_pass_through() -> None:
+    compressed = gzip.compress(BODY)
+    client = _client(compressed, {"Content-Encoding": "gzip"})
+    response = client.get("/", headers={"accept-encoding": "gzip"})
+    assert response.headers["content-length"] == str(len(compressed))
+    assert response.content == BODY
+
+
+def test_content_codings_compress_complete_bodies() -> None:
+    codings = ContentCodings(encodings=("gzip",), offload_min_bytes=0)
+    assert codings.negotiate("br") is None
+    coding = codings.negotiate("gzip, br")
+    assert coding is not None and coding.name == "gzip"
+    assert gzip.decompress(asyncio.run(coding.compress(BODY))) == BODY
@@ -0,0 +1,93 @@
+import datetime
+from email.utils import format_datetime
+from typing import AsyncIterator, Dict, Iterator
+
+import pytest
+from fastapi import FastAPI
+from starlette.datastructures import Headers
+from starlette.testclient import TestClient
+
+from benchmarks.fakes import FakeDatabaseConnection, fake_tables
+from src.config.settings import CacheSettings
+from src.core.cache import EntityCache
+from src.core.conditional import ROW_VERSION_COLUMN, Validators
+from src.core.dependencies import get_db_connection
+from src.core.formats import JSON_CODEC, RESPONSE_CODEC
+from src.core.responses import FastJSONResponse
+from src.routers import include_routers
+
+MODIFIED = datetime.datetime(2024, 1, 1, 12, 0, 0, 500_000, tzinfo=datetime.timezone.utc)
+
+
+def _validators(version: str = "1") -> Validators:
+    rows = [{"id": 1, ROW_VERSION_COLUMN: version, "updated_at": MODIFIED}]
+    token = RESPONSE_CODEC.set(JSON_CODEC)
+    try:
+        return Validators.for_rows(rows, ("id",), "updated_at")
+    finally:
+        RESPONSE_CODEC.reset(token)
+
+
+def test_etag_follows_row_version() -> None:
+    assert _validators("1").etag == _validators("1").etag
+    assert _validators("1").etag != _validators("2").etag
+
+
+@pytest.mark.parametrize(
+    "headers, expected",
+    [
+        ({}, False),
+        ({"if-none-match": "*"}, True),
+        ({"if-none-match": '"other", {etag}'}, True),
+        ({"if-none-match": "W/{etag}"}, True),
+        ({"if-none-match": '"other"'}, False),
+        # If-None-Match wins over If-Modified-Since
+        ({"if-none-match": '"other"', "if-modified-since": "{modified}"}, False),
+        ({"if-modified-since": "{modified}"}, True),
+        ({"if-modified-since": "Mon, 01 Jan 2024 11:59:59 GMT"}, False),
+        ({"if-modified-since": "not a date"}, False),
+    ],
+)
+def test_not_modified(headers: Dict[str, str], expected: bool) -> None:
+    validators = _validators()
+    modified = format_datetime(MODIFIED, usegmt=True)
+    request_headers = Headers({
+        name: value.format(etag=validators.etag, modified=modified) for name, value in headers.items()
+    })
+    assert validators.not_modified(request_headers) is expected
+
+
+@pytest.fixture
+def client() -> Iterator[TestClient]:
+    app = FastAPI(default_response_class=FastJSONResponse)
+    include_routers(app)
+    app.state.cache = EntityCache.from_settings(CacheSettings())
+    db = FakeDatabaseConnection(fake_tables(rows=3))
+
+    async def fake_db_connection() -> AsyncIterator[FakeDatabaseConnection]:
+        yield db
+
+    app.dependency_overrides[get_db_connection] = fake_db_connection
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.mark.parametrize("path", ["/api/v1/products/products", "/api/v1/products/products/{id}"])
+def test_conditional_get(client: TestClient, path: str) -> None:
+    product_id = client.get("/api/v1/products/products").json()["data"][0]["id"]
+    url = path.format(id=product_id)
+
+    response = client.get(url)
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+
+    revalidated = client.get(url, headers={"If-None-Match": etag})
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+    assert revalidated.headers["etag"] == etag
+
+    assert client.get(url, headers={"If-None-Match": '"stale"'}).status_code == 200
+    # the ETag is per response format
+    other = client.get(url, headers={"Accept": "application/msgpack"})
+    assert other.status_code == 200
+    assert other.headers["etag"] != etag
@@ -0,0 +1,82 @@
+import asyncio
+import mmap
+import os
+from typing import Any
+
+from src.core.conversion_cache import ConversionCache, DiskTier, cached_response
+from src.core.xml_parser import BytesLike
+
+
+def _key(cache: ConversionCache, data: BytesLike, *options: Any) -> str:
+    return asyncio.run(cache.key(data, *options))
+
+
+def _put(cache: ConversionCache, key: str, body: bytes) -> None:
+    asyncio.run(cache.put(key, body))
+
+
+def test_keys_depend_on_data_and_options() -> None:
+    cache = ConversionCache()
+    key = _key(cache, b"<ITEM/>", "xml2json", "json")
+    assert key == _key(cache, bytearray(b"<ITEM/>"), "xml2json", "json")
+    assert key != _key(cache, b"<ITEM/>", "xml2json", "msgpack")
+    assert key != _key(cache, b"<ITEM />", "xml2json", "json")
+
+
+def test_memory_tier_evicts_least_recently_used() -> None:
+    cache = ConversionCache(max_bytes=25, max_entry_bytes=20)
+    for key in "abc":
+        _put(cache, key, key.encode() * 10)
+    assert cache.get("a") is None
+    assert cache.get("b") == b"b" * 10
+    _put(cache, "d", b"d" * 10)
+    # b was used after c
+    assert cache.get("c") is None
+    assert cache.get("b") is not None
+    _put(cache, "big", b"x" * 21)
+    assert cache.get("big") is None
+
+    stats = cache.stats()
+    assert stats["evictions"] == 2
+    assert stats["memory_bytes"] == 20
+    assert (stats["memory_hits"], stats["misses"]) == (2, 3)
+
+
+def test_disk_tier(tmp_path: Any) -> None:
+    cache = ConversionCache(disk=DiskTier(str(tmp_path), max_bytes=250), disk_min_bytes=100)
+    _put(cache, "small", b"s" * 10)
+    for key in ("one", "two", "six"):
+        _put(cache, key, key.encode() * 40)
+    assert sorted(os.listdir(tmp_path)) == ["six.bin", "two.bin"]
+    assert cache.stats()["memory_entries"] == 1
+
+    body = cache.get("two")
+    assert isinstance(body, mmap.mmap) and body[:] == b"two" * 40
+    body.close()
+    assert cache.stats()["disk_hits"] == 1
+
+    # a restarted process indexes the files left in the directory
+    reopened = DiskTier(str(tmp_path), max_bytes=250)
+    assert len(reopened) == 2 and reopened.bytes == 240
+    os.remove(tmp_path / "six.bin")
+    assert reopened.open("six") is None
+    assert reopened.bytes == 120
+
+
+def test_cached_response_streams_mapped_bodies(tmp_path: Any) -> None:
+    disk = DiskTier(str(tmp_path), max_bytes=1024)
+    asyncio.run(disk.put("key", b"<ITEM/>"))
+    body = disk.open("key")
+    assert body is not None
+    response = cached_response(body, "text/xml")
+    assert response.headers["content-length"] == "7"
+    assert response.media_type == "text/xml"
+    body.close()
+    assert cached_response(b"{}", "application/json").body == b"{}"
+
+
+def test_cached_response_names_the_coding_of_precompressed_bodies() -> None:
+    response = cached_response(b"\x1f\x8b", "text/xml", "gzip")
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert "content-encoding" not in cached_response(b"<ITEM/>", "text/xml").headers
@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+from src.core.database import AsyncDatabaseConnectionPool, PoolTimeoutError, PreparedStatement, PreparedStatementCache
+
+
+def _pool() -> AsyncDatabaseConnectionPool:
+    # never connects: only its slots are used
+    return AsyncDatabaseConnectionPool("postgresql://unused", min_size=0, max_size=1)
+
+
+def test_slot_granted_to_a_cancelled_waiter_is_returned() -> None:
+    async def main() -> None:
+        pool = _pool()
+        await pool._acquire_slot(1)
+        waiter = asyncio.ensure_future(pool._acquire_slot(10))
+        await asyncio.sleep(0)
+        # hand the slot to the waiter, and cancel it before it resumes
+        pool._slots.release()
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert not pool._slots.locked()
+
+    asyncio.run(main())
+
+
+def test_slot_wait_times_out() -> None:
+    async def main() -> None:
+        pool = _pool()
+        await pool._acquire_slot(1)
+        with pytest.raises(PoolTimeoutError):
+            await pool.acquire(timeout=0.01)
+        pool._slots.release()
+        await asyncio.wait_for(pool._acquire_slot(1), 1)
+
+    asyncio.run(main())
+
+
+def _prepared(cache: PreparedStatementCache, query: str) -> PreparedStatement:
+    statement = cache.get(query, ())
+    assert statement is not None
+    cache.prepare_sql(statement)
+    statement.prepared = True
+    return statement
+
+
+def test_statement_placeholders() -> None:
+    cache = PreparedStatementCache()
+    positional = cache.get("SELECT * FROM t WHERE a = %s AND b LIKE 'x%%' AND c = %s", ())
+    assert positional is not None
+    assert positional.text == "SELECT * FROM t WHERE a = $1 AND b LIKE 'x%' AND c = $2"
+    assert positional.execute_sql == f"EXECUTE {positional.name}(%s, %s)"
+
+    named = cache.get("UPDATE t SET a = %(a)s WHERE id = %(id)s OR a = %(a)s", {})
+    assert named is not None
+    assert named.text == "UPDATE t SET a = $1 WHERE id = $2 OR a = $1"
+    assert named.execute_sql == f"EXECUTE {named.name}(%(a)s, %(id)s)"
+
+    # sent verbatim without parameters, so `%` is not an escape
+    verbatim = cache.get("SELECT '100%'", None)
+    assert verbatim is not None and verbatim.text == "SELECT '100%'"
+
+    assert cache.get("SELECT %s, %(a)s", ()) is None
+    assert cache.get("SET search_path TO public", None) is None
+
+
+def test_statement_cache_evicts_least_recently_used() -> None:
+    cache = PreparedStatementCache(max_size=2)
+    first = _prepared(cache, "SELECT 1")
+    second = _prepared(cache, "SELECT 2")
+    assert cache.get("SELECT 1", ()) is first
+    assert (cache.hits, cache.misses) == (1, 2)
+
+    third = cache.get("SELECT 3", ())
+    assert third is not None and len(cache) == 2
+    # the evicted statement is deallocated ahead of the next PREPARE
+    assert cache.prepare_sql(third) == (f"DEALLOCATE {second.name}; PREPARE {third.name} AS SELECT 3", True)
+    assert cache.prepare_sql(third) == (f"PREPARE {third.name} AS SELECT 3", False)
+    assert cache.get("SELECT 2", ()) is not second
+
+
+def test_statement_cache_invalidate_and_reject() -> None:
+    cache = PreparedStatementCache()
+    statement = _prepared(cache, "SELECT 1")
+    name = statement.name
+    cache.invalidate(statement, deallocate=True)
+    assert not statement.prepared and statement.name != name
+    assert cache.prepare_sql(statement)[0] == f"DEALLOCATE {name}; PREPARE {statement.name} AS SELECT 1"
+
+    cache.reject(statement)
+    assert cache.get("SELECT 1", ()) is None
+    assert len(cache) == 1
+
+    with pytest.raises(ValueError):
+        PreparedStatementCache(max_size=0)
@@ -0,0 +1,41 @@
+import pytest
+
+from src.core.dependencies import MediaRange, negotiate, parse_accept
+
+OFFERS = ("application/json", "text/xml", "application/xml", "application/msgpack")
+
+
+def test_parse_accept() -> None:
+    assert parse_accept("Text/XML;q=0.5, */*;q=abc, application/*; charset=utf-8; q=2") == (
+        MediaRange("text", "xml", 0.5),
+        MediaRange("*", "*", 1.0),
+        MediaRange("application", "*", 1.0),
+    )
+    assert parse_accept("xml, /json, text/, ;q=1") == ()
+
+
+@pytest.mark.parametrize(
+    "accept, expected",
+    [
+        (None, "application/json"),
+        ("", "application/json"),
+        ("*/*", "application/json"),
+        ("text/xml", "text/xml"),
+        ("application/xml, text/xml", "text/xml"),
+        ("text/xml;q=0.5, application/xml", "application/xml"),
+        ("application/*;q=0.5, text/*", "text/xml"),
+        # the most specific range decides, even with a lower q-value
+        ("*/*, application/json;q=0.1", "text/xml"),
+        ("application/*, application/json;q=0", "application/xml"),
+        ("image/png", None),
+        ("text/xml;q=0", None),
+        ("garbage", "application/json"),
+    ],
+)
+def test_negotiate(accept: str, expected: str) -> None:
+    assert negotiate(accept, OFFERS) == expected
+
+
+def test_negotiate_without_offers() -> None:
+    assert negotiate(None, ()) is None
+    assert negotiate("*/*", ()) is None
@@ -0,0 +1,57 @@
+import asyncio
+import threading
+
+import pytest
+
+from src.core.executor import ConversionExecutor, ExecutionTier, ExecutorRejectedError
+
+
+def _thread_name(*args: object) -> str:
+    return threading.current_thread().name
+
+
+def test_tier_for() -> None:
+    executor = ConversionExecutor(inline_max_bytes=10, process_min_bytes=100)
+    assert executor.tier_for(10) is ExecutionTier.INLINE
+    assert executor.tier_for(11) is ExecutionTier.THREAD
+    assert executor.tier_for(99) is ExecutionTier.THREAD
+    assert executor.tier_for(100) is ExecutionTier.PROCESS
+    assert ConversionExecutor(process_min_bytes=100, process_workers=0).tier_for(1 << 30) is ExecutionTier.THREAD
+
+
+def test_run_offloads_by_size() -> None:
+    async def main() -> None:
+        executor = ConversionExecutor(inline_max_bytes=10, process_min_bytes=100)
+        try:
+            assert await executor.run(_thread_name, size=10) == threading.current_thread().name
+            assert (await executor.run(_thread_name, size=11)).startswith("conversion")
+            # buffers would be copied whole into the process pool, so they stay in a thread
+            assert (await executor.run(_thread_name, memoryview(b"x"), size=100)).startswith("conversion")
+            assert executor.pending == 0
+        finally:
+            executor.shutdown()
+
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize("queue_timeout, message", [(0.0, "is full"), (0.01, "still full after 0.01s")])
+def test_full_queue_rejects(queue_timeout: float, message: str) -> None:
+    async def main() -> None:
+        executor = ConversionExecutor(inline_max_bytes=0, max_pending=1, queue_timeout=queue_timeout)
+        release = threading.Event()
+        try:
+            running = asyncio.ensure_future(executor.run(release.wait, size=1))
+            await asyncio.sleep(0.01)
+            assert executor.pending == 1
+            with pytest.raises(ExecutorRejectedError, match=message):
+                await executor.run(_thread_name, size=1)
+            assert executor.rejected == 1
+            release.set()
+            assert await running is True
+            # the slot is free again
+            await executor.run(_thread_name, size=1)
+        finally:
+            release.set()
+            executor.shutdown()
+
+    asyncio.run(main())
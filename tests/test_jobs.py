@@ -0,0 +1,149 @@
+import asyncio
+import io
+import os
+import threading
+from typing import Any, Awaitable, Callable
+
+from starlette.datastructures import UploadFile
+
+from src.core.jobs import Job, JobQueue, JobStatus
+
+Report = Callable[[float], None]
+
+
+def _upload(content: bytes = b"<ITEM/>") -> UploadFile:
+    return UploadFile(filename="input.xml", file=io.BytesIO(content))
+
+
+def _run(test: Callable[[JobQueue], Awaitable[None]], directory: str, workers: int = 1) -> None:
+    async def main() -> None:
+        queue = JobQueue(directory, workers=workers, ttl=60)
+        await queue.start()
+        try:
+            await test(queue)
+        finally:
+            await queue.stop()
+
+    asyncio.run(main())
+
+
+async def _finished(job: Job) -> None:
+    while not job.finished:
+        await asyncio.sleep(0.01)
+
+
+async def _wait(event: threading.Event) -> None:
+    while not event.is_set():
+        await asyncio.sleep(0.01)
+
+
+def _files(queue: JobQueue) -> Any:
+    return sorted(os.listdir(queue.directory))
+
+
+def test_job_succeeds(tmp_path: Any) -> None:
+    async def test(queue: JobQueue) -> None:
+        job = await queue.submit(_upload(b"abc"), "upper", "text/plain", lambda data, report: bytes(data).upper())
+        await _finished(job)
+        assert job.status is JobStatus.SUCCEEDED
+        assert job.progress == 1.0
+        result = queue.open_result(job)
+        assert result is not None and result[:] == b"ABC"
+        result.close()
+
+    _run(test, str(tmp_path))
+
+
+def test_cancel_queued_job(tmp_path: Any) -> None:
+    release = threading.Event()
+
+    def blocking(data: Any, report: Report) -> bytes:
+        release.wait(5)
+        return b"done"
+
+    async def test(queue: JobQueue) -> None:
+        running = await queue.submit(_upload(), "block", "text/plain", blocking)
+        queued = await queue.submit(_upload(), "block", "text/plain", blocking)
+        assert queue.cancel(queued.id) is queued
+        assert queued.status is JobStatus.CANCELLED
+        assert f"{queued.id}.input" not in _files(queue)
+
+        release.set()
+        await _finished(running)
+        assert running.status is JobStatus.SUCCEEDED
+        # the worker skips the cancelled job left in the queue
+        await asyncio.sleep(0.05)
+        assert queued.status is JobStatus.CANCELLED
+
+    _run(test, str(tmp_path))
+
+
+def test_cancel_running_job_at_progress_report(tmp_path: Any) -> None:
+    started = threading.Event()
+
+    def reporting(data: Any, report: Report) -> bytes:
+        started.set()
+        for _ in range(500):
+            report(0.5)
+            threading.Event().wait(0.01)
+        return b"done"
+
+    async def test(queue: JobQueue) -> None:
+        job = await queue.submit(_upload(), "report", "text/plain", reporting)
+        await _wait(started)
+        queue.cancel(job.id)
+        await _finished(job)
+        assert job.status is JobStatus.CANCELLED
+        assert _files(queue) == []
+
+    _run(test, str(tmp_path))
+
+
+def test_cancel_after_last_progress_report(tmp_path: Any) -> None:
+    reported = threading.Event()
+    release = threading.Event()
+
+    def late(data: Any, report: Report) -> bytes:
+        report(0.9)
+        reported.set()
+        release.wait(5)
+        return b"done"
+
+    async def test(queue: JobQueue) -> None:
+        job = await queue.submit(_upload(), "late", "text/plain", late)
+        await _wait(reported)
+        queue.cancel(job.id)
+        release.set()
+        await _finished(job)
+        assert job.status is JobStatus.CANCELLED
+        assert job.result_bytes is None
+        assert queue.open_result(job) is None
+        assert _files(queue) == []
+
+    _run(test, str(tmp_path))
+
+
+def test_cancel_finished_job_removes_it(tmp_path: Any) -> None:
+    async def test(queue: JobQueue) -> None:
+        job = await queue.submit(_upload(), "copy", "text/plain", lambda data, report: bytes(data))
+        await _finished(job)
+        assert queue.cancel(job.id) is job
+        assert queue.get(job.id) is None
+        assert _files(queue) == []
+
+    _run(test, str(tmp_path))
+
+
+def test_workers_sharing_a_directory_keep_their_files(tmp_path: Any) -> None:
+    async def test(queue: JobQueue) -> None:
+        job = await queue.submit(_upload(), "copy", "text/plain", lambda data, report: bytes(data))
+        await _finished(job)
+        # another worker starting on the same directory
+        other = JobQueue(str(tmp_path))
+        await other.start()
+        await other.stop()
+        result = queue.open_result(job)
+        assert result is not None
+        result.close()
+
+    _run(test, str(tmp_path))
@@ -0,0 +1,41 @@
+from typing import Dict, List
+
+from src.config.settings import CacheSettings
+from src.core.cache import EntityCache
+from src.core.metrics import MetricsRegistry, runtime_families
+
+
+def _types(text: str) -> Dict[str, str]:
+    return dict(line.split()[2:4] for line in text.splitlines() if line.startswith("# TYPE"))
+
+
+def _sample_names(text: str) -> List[str]:
+    return [line.split("{")[0].split()[0] for line in text.splitlines() if not line.startswith("#")]
+
+
+def test_counter_samples_are_named_after_their_family() -> None:
+    registry = MetricsRegistry()
+    requests = registry.counter("requests", "Requests", ("method",))
+    requests.inc(method="GET")
+    requests.inc(2, method="GET")
+
+    text = registry.render(runtime_families({}, cache=EntityCache.from_settings(CacheSettings())))
+    types = _types(text)
+    assert types["requests_total"] == "counter"
+    assert 'requests_total{method="GET"} 3' in text.splitlines()
+    for name in _sample_names(text):
+        assert types[name] in ("counter", "gauge")
+
+
+def test_histogram_samples() -> None:
+    registry = MetricsRegistry()
+    latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+    latency.observe(0.05)
+    latency.observe(0.5)
+
+    lines = registry.render().splitlines()
+    assert "# TYPE latency_seconds histogram" in lines
+    assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{le="1"} 2' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 2' in lines
+    assert "latency_seconds_count 2" in lines
@@ -0,0 +1,60 @@
+import asyncio
+import base64
+import datetime
+import uuid
+
+import pytest
+
+from benchmarks.fakes import FakeDatabaseConnection, fake_tables
+from src.core.conditional import ROW_VERSION_COLUMN
+from src.core.pagination import InvalidCursorError, Keyset, decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip() -> None:
+    created = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    id_ = uuid.UUID(int=1)
+    token = encode_cursor([created, id_, 3, None])
+    assert "=" not in token
+    assert decode_cursor(token, 4) == [created.isoformat(), str(id_), 3, None]
+
+
+@pytest.mark.parametrize(
+    "token",
+    [
+        "",
+        "not a cursor!",
+        base64.urlsafe_b64encode(b"[1, ").decode(),
+        base64.urlsafe_b64encode(b'{"id": 1}').decode(),
+        encode_cursor([1]),
+        encode_cursor([1, 2, 3]),
+    ],
+)
+def test_invalid_cursors(token: str) -> None:
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(token, 2)
+
+
+def test_keyset_query() -> None:
+    keyset = Keyset("orders", ("created_at", "id"), descending=True)
+    assert keyset.query() == ("SELECT * FROM orders ORDER BY created_at DESC, id DESC", [])
+    query, params = keyset.query(encode_cursor(["2024-01-01", "a"]), limit=10)
+    assert query == (
+        "SELECT * FROM orders WHERE (created_at, id) < (%s, %s) ORDER BY created_at DESC, id DESC LIMIT %s"
+    )
+    assert params == ["2024-01-01", "a", 10]
+    with pytest.raises(InvalidCursorError):
+        keyset.query(encode_cursor(["2024-01-01"]))
+
+
+def test_keyset_pages() -> None:
+    db = FakeDatabaseConnection(fake_tables(rows=5))
+    keyset = Keyset("products", ("id",))
+
+    rows = asyncio.run(db.query_all(*keyset.page_query(None, 3)))
+    page, cursor = keyset.page(rows, 3)
+    assert [row["id"] for row in page] == [uuid.UUID(int=i) for i in (1, 2, 3)]
+    assert all(ROW_VERSION_COLUMN not in row for row in page)
+    assert cursor is not None and decode_cursor(cursor, 1) == [str(uuid.UUID(int=3))]
+
+    rows = asyncio.run(db.query_all(*keyset.page_query(None, 5)))
+    assert keyset.page(rows, 5)[1] is None
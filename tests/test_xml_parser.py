@@ -0,0 +1,172 @@
+import io
+from typing import Any, List
+
+import pytest
+from lxml import etree
+
+from src.core.xml_parser import Document, ParseOptions, XMLParseError, XMLParser
+
+DOCUMENTS: List[Any] = [
+    {"a": 1, "b": [1, 2.5, True, False, None, "text"], "c": {"d": {"e": "f"}}},
+    [{}, [{}], [[1]]],
+    {},
+    {"big": 2 ** 70, "negative": -(2 ** 64), "max": 2 ** 63 - 1, "min": -(2 ** 63)},
+    {"escaped": 'x<&>"\n\r\t\' é 中', 'key "&<>': "value"},
+    {"floats": [0.1, -1.5e300, 1e-300, 3.0]},
+    "string",
+    12,
+    None,
+    True,
+]
+
+
+# written, but read back as an invalid leaf: a list needs a child
+EMPTY_LISTS: List[Any] = [[], [[]], {"l": []}]
+# read back as a keyed leaf, {"k": {"k": {}}}
+KEYED_EMPTY_OBJECTS: List[Any] = [{"k": {}}, [{"a": 1, "k": {}}]]
+
+
+def _etree_xml(data: Any, encoding: str = "utf-8") -> bytes:
+    return etree.tostring(XMLParser.parse_json_to_element(data), encoding=encoding)
+
+
+@pytest.mark.parametrize("data", DOCUMENTS + EMPTY_LISTS + KEYED_EMPTY_OBJECTS)
+def test_document_to_xml_matches_etree(data: Any) -> None:
+    assert XMLParser.document_to_xml(Document.from_json(data)) == _etree_xml(data)
+
+
+@pytest.mark.parametrize("encoding", ["ascii", "ISO-8859-1"])
+def test_document_to_xml_matches_etree_in_other_encodings(encoding: str) -> None:
+    data = DOCUMENTS[4]
+    assert XMLParser.document_to_xml(Document.from_json(data), encoding) == _etree_xml(data, encoding)
+
+
+@pytest.mark.parametrize("data", DOCUMENTS + KEYED_EMPTY_OBJECTS)
+def test_parse_xml_matches_etree(data: Any) -> None:
+    xml = _etree_xml(data)
+    expected = XMLParser._parse_etree_to_json_type(etree.fromstring(xml))
+    assert XMLParser.parse_xml_from_bytes(xml) == expected
+    assert "".join(XMLParser.iter_json_from_file(io.BytesIO(xml))) == XMLParser._dump_json(expected)
+
+
+# past the 64-bit integers and doubles of ijson's C backend
+BIG_NUMBERS: List[bytes] = [b'{"a": 18446744073709551616}', b"[1e400, -1e400, 1e-400]", b"-9223372036854775809"]
+
+
+@pytest.mark.parametrize(
+    "json_bytes",
+    [XMLParser._dump_json(data).encode() for data in DOCUMENTS + EMPTY_LISTS + KEYED_EMPTY_OBJECTS] + BIG_NUMBERS,
+)
+def test_streaming_json_to_xml_matches_buffered(json_bytes: bytes) -> None:
+    expected = XMLParser.json_bytes_to_xml(json_bytes)
+    assert b"".join(XMLParser.iter_xml_from_json_file(io.BytesIO(json_bytes))) == expected
+
+
+def test_streaming_json_to_xml_restarts_after_sent_chunks() -> None:
+    json_bytes = b"[" + b'"abcdefgh",' * 1000 + str(2 ** 64).encode() + b"]"
+    chunks = list(XMLParser.iter_xml_from_json_file(io.BytesIO(json_bytes), chunk_size=1024))
+    assert len(chunks) > 10
+    assert b"".join(chunks) == XMLParser.json_bytes_to_xml(json_bytes)
+
+
+@pytest.mark.parametrize("data", DOCUMENTS)
+def test_json_round_trip(data: Any) -> None:
+    assert XMLParser.parse_xml_from_bytes(XMLParser.json_bytes_to_xml(XMLParser._dump_json(data).encode())) == data
+
+
+def test_empty_containers() -> None:
+    assert XMLParser.document_to_xml(Document.from_json({"o": {}, "l": []})) == (
+        b'<ITEM type="object"><ITEM type="object" key="o"/><ITEM type="list" key="l"/></ITEM>'
+    )
+    # childless, both read back as leaves
+    assert XMLParser.parse_xml_from_bytes(b'<ITEM type="object"/>') == {}
+    assert XMLParser.parse_xml_from_bytes(XMLParser.json_bytes_to_xml(b'{"k": {}}')) == {"k": {"k": {}}}
+    with pytest.raises(XMLParseError, match="non-leaf"):
+        XMLParser.parse_xml_from_bytes(b'<ITEM type="list"/>')
+
+
+def test_big_integers_keep_their_digits() -> None:
+    xml = XMLParser.document_to_xml(Document.from_json([2 ** 100]))
+    assert xml == f'<ITEM type="list"><ITEM type="integer" value="{2 ** 100}"/></ITEM>'.encode()
+    assert XMLParser.parse_xml_from_bytes(xml) == [2 ** 100]
+
+
+@pytest.mark.parametrize("value", ["\x00", "a\x1fb", "\ud800", "\uffff"])
+def test_invalid_characters_are_rejected(value: str) -> None:
+    with pytest.raises(ValueError):
+        XMLParser.document_to_xml(Document.from_json({"k": value}))
+    with pytest.raises(ValueError):
+        XMLParser.parse_json_to_element({"k": value})
+
+
+@pytest.mark.parametrize(
+    "xml, message",
+    [
+        (b'<ITEM type="integer" value="x"/>', "Invalid integer"),
+        (b'<ITEM type="wat" value="x"/>', "wat"),
+        (b'<ITEM type="object"><ITEM type="integer" value="1" key="a"/><ITEM type="null"/></ITEM>', "Expected 'key'"),
+    ],
+)
+def test_invalid_documents(xml: bytes, message: str) -> None:
+    with pytest.raises((XMLParseError, ValueError), match=message):
+        XMLParser.parse_xml_from_bytes(xml)
+
+
+def _nested(depth: int) -> bytes:
+    return b'<ITEM type="list">' * (depth - 1) + b'<ITEM type="null"/>' + b"</ITEM>" * (depth - 1)
+
+
+def _parse_both(xml: bytes, options: ParseOptions) -> None:
+    """Parse with the tree-free and the streaming parser, which have to agree on every check."""
+    with pytest.raises(XMLParseError) as tree_free:
+        XMLParser.parse_xml_from_bytes(xml, options)
+    with pytest.raises(XMLParseError) as streaming:
+        "".join(XMLParser.iter_json_from_file(io.BytesIO(xml), options=options))
+    assert str(tree_free.value) == str(streaming.value)
+
+
+def test_max_depth() -> None:
+    options = ParseOptions(max_depth=3)
+    assert XMLParser.parse_xml_from_bytes(_nested(3), options) == [[None]]
+    _parse_both(_nested(4), options)
+
+
+def test_max_nodes() -> None:
+    xml = b'<ITEM type="list">' + b'<ITEM type="integer" value="1"/>' * 4 + b"</ITEM>"
+    assert XMLParser.parse_xml_from_bytes(xml, ParseOptions(max_nodes=5)) == [1, 1, 1, 1]
+    _parse_both(xml, ParseOptions(max_nodes=4))
+
+
+def test_max_attribute_length() -> None:
+    options = ParseOptions(max_attribute_length=4)
+    assert XMLParser.parse_xml_from_bytes(b'<ITEM type="string" value="abcd"/>', options) == "abcd"
+    _parse_both(b'<ITEM type="string" value="abcde"/>', options)
+    _parse_both(b'<ITEM type="object"><ITEM type="null" key="abcde"/></ITEM>', options)
+
+
+@pytest.mark.parametrize(
+    "xml",
+    [
+        b'<ITEM type="list"><ELEMENT type="null"/></ITEM>',
+        b'<ITEM type="list"><ITEM type="null" extra="1"/></ITEM>',
+        b'<ITEM type="list">text<ITEM type="null"/></ITEM>',
+    ],
+)
+def test_validation(xml: bytes) -> None:
+    options = ParseOptions(validate=True)
+    _parse_both(xml, options)
+    # without validation the same documents are converted
+    XMLParser.parse_xml_from_bytes(xml)
+
+
+@pytest.mark.parametrize(
+    "xml",
+    [
+        b'<!DOCTYPE ITEM><ITEM type="null"/>',
+        b'<!DOCTYPE ITEM [<!ENTITY a "aaaaaaaaaa"><!ENTITY b "&a;&a;&a;&a;&a;&a;&a;&a;&a;&a;">]>'
+        b'<ITEM type="string" value="&b;"/>',
+        b'<!DOCTYPE ITEM SYSTEM "file:///etc/passwd"><ITEM type="null"/>',
+    ],
+)
+def test_doctype_is_rejected(xml: bytes) -> None:
+    _parse_both(xml, ParseOptions())